@@ -47,9 +47,7 @@ def convert_deferred_expense_to_expense(start_date=None, end_date=None):
 	''', (end_date, start_date))
 
 	# For each invoice, book deferred expense
-	for invoice in invoices:
-		doc = frappe.get_doc("Purchase Invoice", invoice)
-		book_deferred_income_or_expense(doc, end_date)
+	book_deferred_income_or_expense_for_invoices("Purchase Invoice", invoices, end_date)
 
 def convert_deferred_revenue_to_income(start_date=None, end_date=None):
 	# book the expense/income on the last day, but it will be trigger on the 1st of month at 12:00 AM
@@ -65,26 +63,67 @@ def convert_deferred_revenue_to_income(start_date=None, end_date=None):
 		and enable_deferred_revenue = 1 and docstatus = 1 and ifnull(amount, 0) > 0
 	''', (end_date, start_date))
 
-	for invoice in invoices:
-		doc = frappe.get_doc("Sales Invoice", invoice)
-		book_deferred_income_or_expense(doc, end_date)
+	book_deferred_income_or_expense_for_invoices("Sales Invoice", invoices, end_date)
 
-def get_booking_dates(doc, item, posting_date=None):
+def book_deferred_income_or_expense_for_invoices(doctype, invoices, posting_date, chunk_size=500):
+	'''Book deferred income / expense for a list of invoices.
+
+	Invoices, their deferred items and the amounts already booked are fetched for
+	a whole chunk of invoices at once and each invoice is committed separately,
+	so an interrupted run resumes from what has been booked in the ledger'''
+	for i in range(0, len(invoices), chunk_size):
+		chunk = invoices[i:i + chunk_size]
+		booked_details = get_booked_details(doctype, chunk)
+
+		for doc in get_invoices_with_deferred_items(doctype, chunk):
+			book_deferred_income_or_expense(doc, posting_date, booked_details)
+
+def get_invoices_with_deferred_items(doctype, invoices):
+	'''Returns the invoices with only their deferred items, in one query for the invoices
+	and one for the items instead of loading each invoice'''
+	if not invoices:
+		return []
+
+	enable_check = "enable_deferred_revenue" \
+		if doctype=="Sales Invoice" else "enable_deferred_expense"
+
+	items = {}
+	for d in frappe.get_all("{0} Item".format(doctype), fields=["*"],
+		filters={"parent": ["in", invoices], "parenttype": doctype, enable_check: 1}, order_by="idx"):
+		items.setdefault(d.parent, []).append(d)
+
+	docs = dict((d.name, d) for d in frappe.get_all(doctype, fields=["*"],
+		filters={"name": ["in", invoices], "docstatus": 1}))
+
+	return [frappe.get_doc(dict(docs[invoice], doctype=doctype, items=items.get(invoice, [])))
+		for invoice in invoices if invoice in docs]
+
+def get_booked_details(doctype, invoices):
+	'''Returns last booking date and amounts booked so far per invoice item and account'''
+	if not invoices:
+		return {}
+
+	booked_details = {}
+	for d in frappe.db.sql('''
+		select voucher_detail_no, account, max(posting_date) as posting_date,
+			sum(debit) as debit, sum(debit_in_account_currency) as debit_in_account_currency,
+			sum(credit) as credit, sum(credit_in_account_currency) as credit_in_account_currency
+		from `tabGL Entry`
+		where voucher_type=%s and voucher_no in ({0}) and ifnull(voucher_detail_no, '') != ''
+		group by voucher_detail_no, account
+	'''.format(', '.join(['%s'] * len(invoices))), tuple([doctype] + list(invoices)), as_dict=True):
+		booked_details[(d.voucher_detail_no, d.account)] = d
+
+	return booked_details
+
+def get_booking_dates(doc, item, posting_date=None, prev_posting_date=None):
 	if not posting_date:
 		posting_date = add_days(today(), -1)
 
 	last_gl_entry = False
 
-	deferred_account = "deferred_revenue_account" if doc.doctype=="Sales Invoice" else "deferred_expense_account"
-
-	prev_gl_entry = frappe.db.sql('''
-		select name, posting_date from `tabGL Entry` where company=%s and account=%s and
-		voucher_type=%s and voucher_no=%s and voucher_detail_no=%s
-		order by posting_date desc limit 1
-	''', (doc.company, item.get(deferred_account), doc.doctype, doc.name, item.name), as_dict=True)
-
-	if prev_gl_entry:
-		start_date = getdate(add_days(prev_gl_entry[0].posting_date, 1))
+	if prev_posting_date:
+		start_date = getdate(add_days(prev_posting_date, 1))
 	else:
 		start_date = item.service_start_date
 
@@ -104,13 +143,11 @@ def get_booking_dates(doc, item, posting_date=None):
 	else:
 		return None, None, None
 
-def calculate_amount(doc, item, last_gl_entry, total_days, total_booking_days, account_currency):
+def calculate_amount(doc, item, last_gl_entry, total_days, total_booking_days, account_currency, booked):
 	if doc.doctype == "Sales Invoice":
 		total_credit_debit, total_credit_debit_currency = "debit", "debit_in_account_currency"
-		deferred_account = "deferred_revenue_account"
 	else:
 		total_credit_debit, total_credit_debit_currency = "credit", "credit_in_account_currency"
-		deferred_account = "deferred_expense_account"
 
 	amount, base_amount = 0, 0
 	if not last_gl_entry:
@@ -120,61 +157,79 @@ def calculate_amount(doc, item, last_gl_entry, total_days, total_booking_days, a
 		else:
 			amount = flt(item.net_amount*total_booking_days/flt(total_days), item.precision("net_amount"))
 	else:
-		gl_entries_details = frappe.db.sql('''
-			select sum({0}) as total_credit, sum({1}) as total_credit_in_account_currency, voucher_detail_no
-			from `tabGL Entry` where company=%s and account=%s and voucher_type=%s and voucher_no=%s and voucher_detail_no=%s
-			group by voucher_detail_no
-		'''.format(total_credit_debit, total_credit_debit_currency),
-			(doc.company, item.get(deferred_account), doc.doctype, doc.name, item.name), as_dict=True)
-		already_booked_amount = gl_entries_details[0].total_credit if gl_entries_details else 0
+		already_booked_amount = flt(booked.get(total_credit_debit))
 		base_amount = flt(item.base_net_amount - already_booked_amount, item.precision("base_net_amount"))
 		if account_currency==doc.company_currency:
 			amount = base_amount
 		else:
-			already_booked_amount_in_account_currency = gl_entries_details[0].total_credit_in_account_currency if gl_entries_details else 0
+			already_booked_amount_in_account_currency = flt(booked.get(total_credit_debit_currency))
 			amount = flt(item.net_amount - already_booked_amount_in_account_currency, item.precision("net_amount"))
 
 	return amount, base_amount
 
-def book_deferred_income_or_expense(doc, posting_date=None):
+def book_deferred_income_or_expense(doc, posting_date=None, booked_details=None):
 	enable_check = "enable_deferred_revenue" \
 		if doc.doctype=="Sales Invoice" else "enable_deferred_expense"
 
-	def _book_deferred_revenue_or_expense(item):
-		start_date, end_date, last_gl_entry = get_booking_dates(doc, item, posting_date=posting_date)
-		if not (start_date and end_date): return
+	if booked_details is None:
+		booked_details = get_booked_details(doc.doctype, [doc.name])
+
+	if doc.doctype == "Sales Invoice":
+		total_credit_debit, total_credit_debit_currency = "debit", "debit_in_account_currency"
+	else:
+		total_credit_debit, total_credit_debit_currency = "credit", "credit_in_account_currency"
+
+	gl_entries = []
+	account_currencies = {}
 
-		account_currency = get_account_currency(item.expense_account)
+	def _book_deferred_revenue_or_expense(item):
 		if doc.doctype == "Sales Invoice":
 			against, project = doc.customer, doc.project
 			credit_account, debit_account = item.income_account, item.deferred_revenue_account
+			deferred_account = item.deferred_revenue_account
 		else:
 			against, project = doc.supplier, item.project
 			credit_account, debit_account = item.deferred_expense_account, item.expense_account
+			deferred_account = item.deferred_expense_account
+
+		if item.expense_account not in account_currencies:
+			account_currencies[item.expense_account] = get_account_currency(item.expense_account)
+		account_currency = account_currencies[item.expense_account]
 
+		booked = frappe._dict(booked_details.get((item.name, deferred_account)) or {})
 		total_days = date_diff(item.service_end_date, item.service_start_date) + 1
-		total_booking_days = date_diff(end_date, start_date) + 1
 
-		amount, base_amount = calculate_amount(doc, item, last_gl_entry,
-			total_days, total_booking_days, account_currency)
+		# book each period till the posting date, keeping track of what has been booked
+		while True:
+			start_date, end_date, last_gl_entry = get_booking_dates(doc, item,
+				posting_date=posting_date, prev_posting_date=booked.posting_date)
+			if not (start_date and end_date): break
 
-		make_gl_entries(doc, credit_account, debit_account, against,
-			amount, base_amount, end_date, project, account_currency, item.cost_center, item.name)
+			total_booking_days = date_diff(end_date, start_date) + 1
 
-		if getdate(end_date) < getdate(posting_date) and not last_gl_entry:
-			_book_deferred_revenue_or_expense(item)
+			amount, base_amount = calculate_amount(doc, item, last_gl_entry,
+				total_days, total_booking_days, account_currency, booked)
+
+			gl_entries.extend(get_gl_entries(doc, credit_account, debit_account, against,
+				amount, base_amount, end_date, project, account_currency, item.cost_center, item.name))
 
+			booked.posting_date = end_date
+			booked[total_credit_debit] = flt(booked.get(total_credit_debit)) + base_amount
+			booked[total_credit_debit_currency] = flt(booked.get(total_credit_debit_currency)) + amount
+
+			if last_gl_entry or getdate(end_date) >= getdate(posting_date):
+				break
 
 	for item in doc.get('items'):
 		if item.get(enable_check):
 			_book_deferred_revenue_or_expense(item)
 
-def make_gl_entries(doc, credit_account, debit_account, against,
-	amount, base_amount, posting_date, project, account_currency, cost_center, voucher_detail_no):
-	# GL Entry for crediting the amount in the deferred expense
-	from erpnext.accounts.general_ledger import make_gl_entries
+	make_gl_entries(doc, gl_entries)
 
+def get_gl_entries(doc, credit_account, debit_account, against,
+	amount, base_amount, posting_date, project, account_currency, cost_center, voucher_detail_no):
 	gl_entries = []
+	# GL Entry for crediting the amount in the deferred expense
 	gl_entries.append(
 		doc.get_gl_dict({
 			"account": credit_account,
@@ -201,13 +256,22 @@ def make_gl_entries(doc, credit_account, debit_account, against,
 		}, account_currency)
 	)
 
+	return gl_entries
+
+def make_gl_entries(doc, gl_entries):
+	from erpnext.accounts.general_ledger import make_gl_entries
+
+	# entries of all items and periods of the invoice are posted together,
+	# they are not merged since each keeps its own posting date and item row
+	gl_entries = [d for d in gl_entries if flt(d.debit, 9) or flt(d.credit, 9)]
+
 	if gl_entries:
 		try:
-			make_gl_entries(gl_entries, cancel=(doc.docstatus == 2), merge_entries=True)
+			make_gl_entries(gl_entries, cancel=(doc.docstatus == 2), merge_entries=False)
 			frappe.db.commit()
 		except:
 			frappe.db.rollback()
 			title = _("Error while processing deferred accounting for {0}").format(doc.name)
 			traceback = frappe.get_traceback()
 			frappe.log_error(message=traceback , title=title)
-			sendmail_to_system_managers(title, traceback)
\ No newline at end of file
+			sendmail_to_system_managers(title, traceback)
@@ -8,6 +8,9 @@ from erpnext.controllers.status_updater import StatusUpdater
 from frappe.utils import flt
 from six.moves import reduce
 from frappe import _
+from erpnext.accounts.doctype.bank_transaction_term.bank_transaction_term import (update_bank_transaction_terms,
+	delete_bank_transaction_terms)
+from erpnext.accounts.doctype.bank_transaction_suggestion.bank_transaction_suggestion import delete_bank_transaction_suggestions
 
 class BankTransaction(StatusUpdater):
 	def after_insert(self):
@@ -22,6 +25,10 @@ class BankTransaction(StatusUpdater):
 		self.clear_linked_payment_entries()
 		self.set_status(update=True)
 
+	def on_cancel(self):
+		delete_bank_transaction_terms(self)
+		delete_bank_transaction_suggestions(self.name)
+
 	def update_allocations(self):
 		if self.payment_entries:
 			allocated_amount = reduce(lambda x, y: flt(x) + flt(y), [x.allocated_amount for x in self.payment_entries])
@@ -42,6 +49,9 @@ class BankTransaction(StatusUpdater):
 
 		self.reload()
 
+		# reconciled descriptions are matched against new transactions
+		update_bank_transaction_terms(self)
+
 	def clear_linked_payment_entries(self):
 		for payment_entry in self.payment_entries:
 			allocated_amount = get_total_allocated_amount(payment_entry)
@@ -8,6 +8,7 @@ import json
 from frappe.utils import getdate
 from frappe.utils.dateutils import parse_date
 from six import iteritems
+from erpnext.accounts.doctype.bank_transaction_suggestion.bank_transaction_suggestion import enqueue_match_bank_statement
 
 @frappe.whitelist()
 def upload_bank_statement():
@@ -38,6 +39,7 @@ def create_bank_entries(columns, data, bank_account):
 
 	success = 0
 	errors = 0
+	bank_transactions = []
 	for d in json.loads(data):
 		if all(item is None for item in d) is True:
 			continue
@@ -54,11 +56,16 @@ def create_bank_entries(columns, data, bank_account):
 			bank_transaction.bank_account = bank_account
 			bank_transaction.insert()
 			bank_transaction.submit()
+			bank_transactions.append(bank_transaction.name)
 			success += 1
 		except Exception:
 			frappe.log_error(frappe.get_traceback())
 			errors += 1
 
+	if bank_transactions:
+		# payments are suggested for the whole statement at once
+		enqueue_match_bank_statement(bank_account, bank_transactions)
+
 	return {"success": success, "errors": errors}
 
 def get_header_mapping(columns, bank_account):
@@ -8,7 +8,10 @@ import unittest
 from erpnext.accounts.doctype.sales_invoice.test_sales_invoice import create_sales_invoice
 from erpnext.accounts.doctype.purchase_invoice.test_purchase_invoice import make_purchase_invoice
 from erpnext.accounts.doctype.payment_entry.test_payment_entry import get_payment_entry
-from erpnext.accounts.page.bank_reconciliation.bank_reconciliation import reconcile, get_linked_payments
+from erpnext.accounts.page.bank_reconciliation.bank_reconciliation import (reconcile, get_linked_payments,
+	get_statement_description_matches)
+from erpnext.accounts.doctype.bank_transaction_suggestion.bank_transaction_suggestion import match_bank_statement
+from frappe.utils import nowdate
 
 test_dependencies = ["Item", "Cost Center"]
 
@@ -48,6 +51,51 @@ class TestBankTransaction(unittest.TestCase):
 		clearance_date = frappe.db.get_value("Payment Entry", payment.name, "clearance_date")
 		self.assertTrue(clearance_date is not None)
 
+	# Check if reconciled transactions are found by the description of new ones, from the description index
+	def test_statement_description_matches(self):
+		bank_transaction = frappe.get_doc("Bank Transaction", dict(description="1512567 BG/000002918 OPSKATTUZWXXX AT776000000098709837 Herr G"))
+		payment = frappe.get_doc("Payment Entry", dict(party="Mr G", paid_amount=1200))
+		reconcile(bank_transaction.name, "Payment Entry", payment.name)
+
+		new_transaction = frappe.get_doc("Bank Transaction", dict(description="1512567 BG/000003025 OPSKATTUZWXXX AT776000000098709849 Herr G"))
+		matches = get_statement_description_matches([new_transaction.name])
+		self.assertEqual(matches[new_transaction.name][0].bank_transaction, bank_transaction.name)
+		self.assertTrue(matches[new_transaction.name][0].ratio > 0.6)
+
+	# Check if payments are suggested for a whole statement and read back as linked payments
+	def test_match_bank_statement(self):
+		doc = frappe.get_doc({
+			"doctype": "Bank Transaction",
+			"description": "Re 95282925234 Conrad Oct 18 Conrad Electronic",
+			"date": nowdate(),
+			"debit": 690,
+			"currency": "INR",
+			"bank_account": "Checking Account - Citi Bank"
+		}).insert()
+		doc.submit()
+
+		match_bank_statement("Checking Account - Citi Bank", [doc.name])
+
+		payment = frappe.get_doc("Payment Entry", dict(party="Conrad Electronic", paid_amount=690))
+		linked_payments = get_linked_payments(doc.name)
+		self.assertEqual([d.name for d in linked_payments], [payment.name])
+
+		# payments submitted after the import are suggested too
+		pi = make_purchase_invoice(supplier="Conrad Electronic", qty=1, rate=690)
+		new_payment = get_payment_entry("Purchase Invoice", pi.name, bank_account="_Test Bank - _TC")
+		new_payment.reference_no = "95282925234"
+		new_payment.reference_date = nowdate()
+		new_payment.insert()
+		new_payment.submit()
+
+		linked_payments = get_linked_payments(doc.name)
+		self.assertEqual([d.name for d in linked_payments], [new_payment.name, payment.name])
+
+		# and cleared ones are not
+		frappe.db.set_value("Payment Entry", new_payment.name, "clearance_date", nowdate())
+		linked_payments = get_linked_payments(doc.name)
+		self.assertEqual([d.name for d in linked_payments], [payment.name])
+
 	# Check if ERPNext can correctly fetch a linked payment based on the party
 	def test_linked_payments_based_on_party(self):
 		bank_transaction = frappe.get_doc("Bank Transaction", dict(description="1512567 BG/000003025 OPSKATTUZWXXX AT776000000098709849 Herr G"))
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2019, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import json
+from six import iteritems, string_types
+from frappe.utils import flt, cstr, getdate, add_days, date_diff
+from frappe.model.document import Document
+from erpnext import get_company_currency
+
+# days before the first and after the last transaction of a statement to look for payments in
+DATE_WINDOW = 30
+# suggestions kept per bank transaction
+MAX_SUGGESTIONS = 5
+
+class BankTransactionSuggestion(Document):
+	pass
+
+@frappe.whitelist()
+def enqueue_match_bank_statement(bank_account, bank_transactions=None):
+	frappe.has_permission("Bank Transaction", "write", throw=True)
+	frappe.has_permission("Bank Account", doc=bank_account, throw=True)
+
+	if isinstance(bank_transactions, string_types):
+		bank_transactions = json.loads(bank_transactions)
+
+	frappe.enqueue("erpnext.accounts.doctype.bank_transaction_suggestion.bank_transaction_suggestion.match_bank_statement",
+		queue="long", timeout=1500, bank_account=bank_account, bank_transactions=bank_transactions,
+		now=frappe.flags.in_test)
+
+def match_bank_statement(bank_account, bank_transactions=None):
+	'''Suggest payments for the unreconciled transactions of a bank account, or the given ones.
+
+	The unreconciled payments of the account in the period of the statement are loaded once,
+	indexed by direction and amount, and ranked for each transaction by reference and date.'''
+	filters = {"bank_account": bank_account, "docstatus": 1, "unallocated_amount": [">", 0]}
+	if bank_transactions:
+		filters["name"] = ["in", bank_transactions]
+
+	transactions = frappe.get_all("Bank Transaction", filters=filters,
+		fields=["name", "date", "debit", "credit", "description", "reference_number"])
+	if not transactions:
+		return
+
+	account, company = frappe.db.get_value("Bank Account", bank_account, ["account", "company"])
+	from_date = add_days(min(d.date for d in transactions), -DATE_WINDOW)
+	to_date = add_days(max(d.date for d in transactions), DATE_WINDOW)
+
+	payments_by_amount = {}
+	for payment in get_unreconciled_payments(account, company, from_date, to_date):
+		payments_by_amount.setdefault((payment.direction, flt(payment.paid_amount, 2)), []).append(payment)
+
+	frappe.db.sql("""delete from `tabBank Transaction Suggestion` where bank_transaction in %s""",
+		(tuple(d.name for d in transactions),))
+
+	for transaction in transactions:
+		direction, amount = ("in", transaction.credit) if transaction.credit > 0 else ("out", transaction.debit)
+
+		suggestions = []
+		for payment in payments_by_amount.get((direction, flt(amount, 2)), []):
+			suggestions.append((get_score(transaction, payment), payment))
+
+		suggestions.sort(key=lambda d: d[0], reverse=True)
+		for score, payment in suggestions[:MAX_SUGGESTIONS]:
+			frappe.get_doc({
+				"doctype": "Bank Transaction Suggestion",
+				"bank_transaction": transaction.name,
+				"payment_document": payment.doctype,
+				"payment_entry": payment.name,
+				"score": score,
+				"posting_date": payment.posting_date,
+				"party": payment.party,
+				"reference_no": payment.reference_no,
+				"reference_date": payment.reference_date,
+				"paid_amount": payment.paid_amount,
+				"currency": payment.currency
+			}).db_insert()
+
+def get_score(transaction, payment):
+	'''Payments with their reference in the transaction score higher, then the ones closest in date'''
+	score = 0.0
+
+	reference_no = cstr(payment.reference_no).strip().lower()
+	if reference_no and (reference_no == cstr(transaction.reference_number).strip().lower()
+		or reference_no in cstr(transaction.description).lower()):
+		score += 0.5
+
+	days = abs(date_diff(getdate(transaction.date), getdate(payment.reference_date or payment.posting_date)))
+	score += 0.5 * max(DATE_WINDOW - days, 0) / DATE_WINDOW
+
+	return score
+
+def get_unreconciled_payments(account, company, from_date, to_date):
+	'''Returns the uncleared payments to and from a bank account posted between the dates,
+	with the direction of the money: "in" to match credits of the bank, "out" to match debits'''
+	values = {"account": account, "from_date": from_date, "to_date": to_date}
+
+	payments = frappe.db.sql("""
+		select
+			'Payment Entry' as doctype, name, paid_amount, reference_no, reference_date, party, posting_date,
+			if(paid_to = %(account)s, 'in', 'out') as direction,
+			if(paid_to = %(account)s, paid_to_account_currency, paid_from_account_currency) as currency
+		from `tabPayment Entry`
+		where docstatus = 1 and ifnull(clearance_date, '') = ''
+			and (paid_to = %(account)s or paid_from = %(account)s)
+			and posting_date between %(from_date)s and %(to_date)s
+	""", values, as_dict=True)
+
+	payments += frappe.db.sql("""
+		select
+			'Journal Entry' as doctype, je.name, je.posting_date, je.cheque_no as reference_no,
+			je.pay_to_recd_from as party, je.cheque_date as reference_date, jea.account_currency as currency,
+			if(jea.debit_in_account_currency > 0, 'in', 'out') as direction,
+			if(jea.debit_in_account_currency > 0, jea.debit_in_account_currency,
+				jea.credit_in_account_currency) as paid_amount
+		from `tabJournal Entry Account` as jea
+		join `tabJournal Entry` as je on jea.parent = je.name
+		where je.docstatus = 1 and (je.clearance_date is null or je.clearance_date='0000-00-00')
+			and jea.account = %(account)s
+			and je.posting_date between %(from_date)s and %(to_date)s
+	""", values, as_dict=True)
+
+	payments += frappe.db.sql("""
+		select
+			'Sales Invoice' as doctype, si.name, si.customer as party, si.posting_date,
+			sip.amount as paid_amount, si.currency, 'in' as direction
+		from `tabSales Invoice Payment` as sip
+		join `tabSales Invoice` as si on sip.parent = si.name
+		where si.docstatus = 1 and (sip.clearance_date is null or sip.clearance_date='0000-00-00')
+			and sip.account = %(account)s
+			and si.posting_date between %(from_date)s and %(to_date)s
+	""", values, as_dict=True)
+
+	payments += frappe.db.sql("""
+		select
+			'Purchase Invoice' as doctype, name, paid_amount, supplier as party, posting_date, currency,
+			'out' as direction
+		from `tabPurchase Invoice`
+		where docstatus = 1 and is_paid = 1 and ifnull(clearance_date, '') = ''
+			and cash_bank_account = %(account)s
+			and posting_date between %(from_date)s and %(to_date)s
+	""", values, as_dict=True)
+
+	mode_of_payments = frappe.db.sql_list("""select parent from `tabMode of Payment Account`
+		where default_account = %s""", account)
+
+	if mode_of_payments:
+		payments += frappe.db.sql("""
+			select
+				'Expense Claim' as doctype, name, total_sanctioned_amount as paid_amount,
+				employee as party, posting_date, %(currency)s as currency, 'out' as direction
+			from `tabExpense Claim`
+			where docstatus = 1 and is_paid = 1 and ifnull(clearance_date, '') = ''
+				and mode_of_payment in %(mode_of_payments)s
+				and posting_date between %(from_date)s and %(to_date)s
+		""", dict(values, currency=get_company_currency(company),
+			mode_of_payments=tuple(mode_of_payments)), as_dict=True)
+
+	return payments
+
+def get_bank_transaction_suggestions(bank_transaction):
+	'''Returns the suggested payments of a bank transaction that are neither cleared
+	nor allocated yet, best first'''
+	return frappe.db.sql("""
+		select
+			s.payment_document as doctype, s.payment_entry as name, s.posting_date, s.party,
+			s.reference_no, ifnull(s.reference_date, s.posting_date) as reference_date, s.paid_amount, s.currency
+		from `tabBank Transaction Suggestion` s
+		join `tabBank Transaction` bt on bt.name = s.bank_transaction
+		join `tabBank Account` ba on ba.name = bt.bank_account
+		where s.bank_transaction = %s
+			and ifnull(case s.payment_document
+				when 'Payment Entry' then
+					(select clearance_date from `tabPayment Entry` where name = s.payment_entry)
+				when 'Journal Entry' then
+					(select clearance_date from `tabJournal Entry` where name = s.payment_entry)
+				when 'Sales Invoice' then
+					(select max(clearance_date) from `tabSales Invoice Payment`
+						where parent = s.payment_entry and account = ba.account)
+				when 'Purchase Invoice' then
+					(select clearance_date from `tabPurchase Invoice` where name = s.payment_entry)
+				when 'Expense Claim' then
+					(select clearance_date from `tabExpense Claim` where name = s.payment_entry)
+				end, '0000-00-00') = '0000-00-00'
+			and not exists(select btp.name from `tabBank Transaction Payments` btp
+				join `tabBank Transaction` t on t.name = btp.parent
+				where t.docstatus = 1 and btp.payment_document = s.payment_document
+					and btp.payment_entry = s.payment_entry)
+		order by s.score desc
+	""", bank_transaction, as_dict=True)
+
+def delete_bank_transaction_suggestions(bank_transaction):
+	frappe.db.sql("""delete from `tabBank Transaction Suggestion`
+		where bank_transaction = %s""", bank_transaction)
+
+def match_bank_statement_for_payment(doc, method=None):
+	'''Suggest a Payment Entry or Journal Entry submitted after the bank statement was imported
+	for the unreconciled transactions of the same amount around its date'''
+	if doc.doctype == "Payment Entry":
+		amounts = [(doc.paid_to, "credit", doc.paid_amount), (doc.paid_from, "debit", doc.paid_amount)]
+	else:
+		amounts = [(d.account, "credit", d.debit_in_account_currency) if flt(d.debit_in_account_currency) > 0
+			else (d.account, "debit", d.credit_in_account_currency) for d in doc.accounts]
+
+	transactions_by_bank_account = {}
+	for account, amount_field, amount in amounts:
+		for d in frappe.db.sql("""
+			select bt.name, bt.bank_account
+			from `tabBank Transaction` bt
+			join `tabBank Account` ba on ba.name = bt.bank_account
+			where ba.account = %(account)s and bt.docstatus = 1 and bt.unallocated_amount > 0
+				and bt.{0} = %(amount)s and bt.date between %(from_date)s and %(to_date)s
+		""".format(amount_field), {
+			"account": account,
+			"amount": flt(amount, 2),
+			"from_date": add_days(doc.posting_date, -DATE_WINDOW),
+			"to_date": add_days(doc.posting_date, DATE_WINDOW)
+		}, as_dict=True):
+			transactions_by_bank_account.setdefault(d.bank_account, []).append(d.name)
+
+	for bank_account, bank_transactions in iteritems(transactions_by_bank_account):
+		frappe.enqueue("erpnext.accounts.doctype.bank_transaction_suggestion.bank_transaction_suggestion.match_bank_statement",
+			queue="long", timeout=1500, bank_account=bank_account, bank_transactions=bank_transactions,
+			now=frappe.flags.in_test)
+
+def delete_payment_suggestions(doc, method=None):
+	frappe.db.sql("""delete from `tabBank Transaction Suggestion`
+		where payment_document = %s and payment_entry = %s""", (doc.doctype, doc.name))
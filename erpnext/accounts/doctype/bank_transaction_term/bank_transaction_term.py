@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2019, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import difflib
+import hashlib
+import math
+from frappe.model.document import Document
+from erpnext.stock.doctype.item_search_term.item_search_term import get_terms
+
+# share of the trigrams of a description a reconciled transaction must have to be compared with it
+MIN_TERM_OVERLAP = 0.3
+# reconciled transactions compared with a description, the ones sharing the most trigrams
+CANDIDATE_LIMIT = 50
+# similarity of descriptions above which they match
+MIN_RATIO = 0.6
+
+class BankTransactionTerm(Document):
+	pass
+
+def on_doctype_update():
+	frappe.db.add_index("Bank Transaction Term", ["term", "bank_transaction"])
+
+def update_bank_transaction_terms(bank_transaction):
+	'''Index the description of a Bank Transaction while it is submitted and allocated to payments'''
+	delete_bank_transaction_terms(bank_transaction)
+
+	if bank_transaction.docstatus == 1 and bank_transaction.allocated_amount > 0:
+		insert_terms(bank_transaction.name, get_terms(bank_transaction.description))
+
+def delete_bank_transaction_terms(bank_transaction, method=None):
+	frappe.db.sql("delete from `tabBank Transaction Term` where bank_transaction=%s", bank_transaction.name)
+
+def insert_terms(bank_transaction, terms):
+	if not terms:
+		return
+
+	values = []
+	for term in terms:
+		name = hashlib.md5(frappe.safe_encode(bank_transaction + "\0" + term)).hexdigest()
+		values.append("({0}, {1}, {2})".format(frappe.db.escape(name, percent=False),
+			frappe.db.escape(bank_transaction, percent=False), frappe.db.escape(term, percent=False)))
+
+	frappe.db.sql("""insert into `tabBank Transaction Term` (name, bank_transaction, term)
+		values {0}""".format(", ".join(values)))
+
+def rebuild_bank_transaction_terms(batch_size=1000):
+	'''Rebuild the terms of all reconciled Bank Transactions'''
+	frappe.db.sql("delete from `tabBank Transaction Term`")
+
+	start = 0
+	while True:
+		bank_transactions = frappe.get_all("Bank Transaction", fields=["name", "description"],
+			filters={"docstatus": 1, "allocated_amount": [">", 0]},
+			order_by="name", start=start, page_length=batch_size)
+		if not bank_transactions:
+			break
+
+		for d in bank_transactions:
+			insert_terms(d.name, get_terms(d.description))
+
+		frappe.db.commit()
+		start += batch_size
+
+def get_description_matches(descriptions, top_k=10):
+	'''Returns the reconciled Bank Transactions with a description similar to each of `descriptions`,
+	as `{description: [{"bank_transaction", "description", "ratio"}]}` best first
+
+	Only transactions sharing enough trigrams with a description are compared with it,
+	so that the cost does not grow with the number of reconciled transactions.'''
+	candidates = {}
+	for description in set(filter(None, descriptions)):
+		terms = get_terms(description)
+		if not terms:
+			continue
+
+		candidates[description] = frappe.db.sql_list("""
+			select bank_transaction
+			from `tabBank Transaction Term`
+			where term in %s
+			group by bank_transaction
+			having count(*) >= %s
+			order by count(*) desc
+			limit %s""", (tuple(terms), int(math.ceil(len(terms) * MIN_TERM_OVERLAP)), CANDIDATE_LIMIT))
+
+	candidate_descriptions = {}
+	names = set(name for names in candidates.values() for name in names)
+	if names:
+		candidate_descriptions = dict(frappe.db.sql("""select name, description
+			from `tabBank Transaction` where name in %s""", (tuple(names),)))
+
+	matches = {}
+	for description, names in candidates.items():
+		result = []
+		for name in names:
+			seq = difflib.SequenceMatcher(lambda x: x == " ", description, candidate_descriptions.get(name) or "")
+
+			if seq.ratio() > MIN_RATIO:
+				result.append(frappe._dict(bank_transaction=name,
+					description=candidate_descriptions.get(name), ratio=seq.ratio()))
+
+		matches[description] = sorted(result, key=lambda d: d.ratio, reverse=True)[:top_k]
+
+	return matches
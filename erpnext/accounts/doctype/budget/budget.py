@@ -8,6 +8,7 @@ from frappe import _
 from frappe.utils import flt, getdate, add_months, get_last_day, fmt_money, nowdate
 from frappe.model.naming import make_autoname
 from erpnext.accounts.utils import get_fiscal_year
+from erpnext.accounts.doctype.budget_consumption.budget_consumption import get_budget_consumption
 from frappe.model.document import Document
 
 class BudgetError(frappe.ValidationError): pass
@@ -84,6 +85,16 @@ class Budget(Document):
 			or self.applicable_on_purchase_order or self.applicable_on_booking_actual_expenses):
 			self.applicable_on_booking_actual_expenses = 1
 
+def validate_voucher_against_budget(gl_entries):
+	'''Validate the expense of a voucher once per account, cost center and project
+	instead of once per GL Entry, the budget is checked against the totals booked so far'''
+	validated = set()
+	for entry in gl_entries:
+		key = (entry.get("account"), entry.get("cost_center"), entry.get("project"))
+		if key not in validated:
+			validated.add(key)
+			validate_expense_against_budget(entry)
+
 def validate_expense_against_budget(args):
 	args = frappe._dict(args)
 
@@ -103,7 +114,7 @@ def validate_expense_against_budget(args):
 
 	for budget_against in ['project', 'cost_center']:
 		if (args.get(budget_against) and args.account
-				and frappe.db.get_value("Account", {"name": args.account, "root_type": "Expense"})):
+				and frappe.get_cached_value("Account", args.account, "root_type") == "Expense"):
 
 			if args.project and budget_against == 'project':
 				condition = "and b.project=%s" % frappe.db.escape(args.project)
@@ -247,28 +258,7 @@ def get_other_condition(args, budget, for_doc):
 	return condition
 
 def get_actual_expense(args):
-	condition1 = " and gle.posting_date <= %(month_end_date)s" \
-		if args.get("month_end_date") else ""
-	if args.budget_against_field == "Cost Center":
-		lft_rgt = frappe.db.get_value(args.budget_against_field,
-			args.budget_against, ["lft", "rgt"], as_dict=1)
-		args.update(lft_rgt)
-		condition2 = """and exists(select name from `tabCost Center`
-			where lft>=%(lft)s and rgt<=%(rgt)s and name=gle.cost_center)"""
-
-	elif args.budget_against_field == "Project":
-		condition2 = "and exists(select name from `tabProject` where name=gle.project and gle.project = %(budget_against)s)"
-
-	return flt(frappe.db.sql("""
-		select sum(gle.debit) - sum(gle.credit)
-		from `tabGL Entry` gle
-		where gle.account=%(account)s
-			{condition1}
-			and gle.fiscal_year=%(fiscal_year)s
-			and gle.company=%(company)s
-			and gle.docstatus=1
-			{condition2}
-	""".format(condition1=condition1, condition2=condition2), (args))[0][0])
+	return get_budget_consumption(args)
 
 def get_accumulated_monthly_budget(monthly_distribution, posting_date, fiscal_year, annual_budget):
 	distribution = {}
@@ -242,6 +242,25 @@ class TestBudget(unittest.TestCase):
 		frappe.delete_doc('Journal Entry', jv.name)
 		frappe.delete_doc('Cost Center', cost_center)
 
+	def test_budget_consumption(self):
+		args = frappe._dict({
+			"account": "_Test Account Cost for Goods Sold - _TC",
+			"company": "_Test Company",
+			"fiscal_year": "_Test Fiscal Year 2013",
+			"budget_against_field": "Cost Center",
+			"budget_against": "_Test Company - _TC"
+		})
+		existing_expense = get_actual_expense(args)
+		expense_upto_march = get_actual_expense(frappe._dict(args, month_end_date="2013-03-31"))
+
+		jv = make_journal_entry("_Test Account Cost for Goods Sold - _TC",
+			"_Test Bank - _TC", 500, "_Test Cost Center - _TC", posting_date="2013-04-15", submit=True)
+		self.assertEqual(get_actual_expense(args), existing_expense + 500)
+		self.assertEqual(get_actual_expense(frappe._dict(args, month_end_date="2013-03-31")), expense_upto_march)
+
+		jv.cancel()
+		self.assertEqual(get_actual_expense(args), existing_expense)
+
 def set_total_expense_zero(posting_date, budget_against_field=None, budget_against_CC=None):
 	if budget_against_field == "Project":
 		budget_against = "_Test Project"
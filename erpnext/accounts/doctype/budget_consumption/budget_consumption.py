@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2019, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import hashlib
+from frappe.utils import cstr, flt, getdate, get_first_day
+from frappe.model.document import Document
+
+class BudgetConsumption(Document):
+	pass
+
+def on_doctype_update():
+	frappe.db.add_index("Budget Consumption", ["account", "fiscal_year", "company"])
+
+def update_budget_consumption(gl_entries, cancel=False):
+	'''Add the expense booked by GL Entries to the running totals of their account,
+	cost center, project and month, or take it out if `cancel`'''
+	consumption = {}
+	for entry in gl_entries:
+		if frappe.get_cached_value("Account", entry.get("account"), "root_type") != "Expense":
+			continue
+
+		key = (entry.get("company"), entry.get("fiscal_year"), get_first_day(entry.get("posting_date")),
+			entry.get("account"), entry.get("cost_center"), entry.get("project"))
+		amount = flt(entry.get("debit")) - flt(entry.get("credit"))
+		consumption[key] = consumption.get(key, 0.0) + (-amount if cancel else amount)
+
+	insert_budget_consumption(consumption)
+
+def cancel_budget_consumption(voucher_type, voucher_no):
+	'''Take the GL Entries of a voucher out of the running totals, before they are deleted'''
+	update_budget_consumption(frappe.db.sql("""
+		select company, fiscal_year, posting_date, account, cost_center, project,
+			sum(debit) as debit, sum(credit) as credit
+		from `tabGL Entry`
+		where voucher_type=%s and voucher_no=%s
+		group by company, fiscal_year, posting_date, account, cost_center, project
+	""", (voucher_type, voucher_no), as_dict=True), cancel=True)
+
+def insert_budget_consumption(consumption):
+	values = []
+	for (company, fiscal_year, month_start_date, account, cost_center, project), amount in consumption.items():
+		if not flt(amount, 9):
+			continue
+
+		name = hashlib.md5(frappe.safe_encode("\0".join([cstr(company), cstr(fiscal_year),
+			cstr(month_start_date), cstr(account), cstr(cost_center), cstr(project)]))).hexdigest()
+
+		values.append("({0}, {1}, {2}, {3}, {4}, {5}, {6}, {7})".format(
+			*[frappe.db.escape(cstr(value), percent=False) for value in
+				(name, company, fiscal_year, getdate(month_start_date), account, cost_center)]
+			+ [frappe.db.escape(project, percent=False) if project else "null", cstr(amount)]))
+
+	if values:
+		frappe.db.sql("""insert into `tabBudget Consumption` (name, company, fiscal_year,
+			month_start_date, account, cost_center, project, actual_amount)
+			values {0}
+			on duplicate key update actual_amount = actual_amount + values(actual_amount)
+		""".format(", ".join(values)))
+
+def get_budget_consumption(args):
+	'''Returns the expense booked in the account against the cost center (with its children)
+	or project of `args.budget_against` in the fiscal year, upto `args.month_end_date` if set'''
+	conditions = []
+	if args.get("month_end_date"):
+		conditions.append("bc.month_start_date <= %(month_end_date)s")
+
+	if args.budget_against_field == "Cost Center":
+		lft, rgt = frappe.db.get_value("Cost Center", args.budget_against, ["lft", "rgt"])
+		conditions.append("""exists(select name from `tabCost Center`
+			where lft>={0} and rgt<={1} and name=bc.cost_center)""".format(lft, rgt))
+
+	elif args.budget_against_field == "Project":
+		conditions.append("bc.project = %(budget_against)s")
+
+	return flt(frappe.db.sql("""
+		select sum(bc.actual_amount)
+		from `tabBudget Consumption` bc
+		where bc.account=%(account)s
+			and bc.fiscal_year=%(fiscal_year)s
+			and bc.company=%(company)s
+			{conditions}
+	""".format(conditions="".join(" and " + d for d in conditions)), args)[0][0])
+
+def rebuild_budget_consumption():
+	'''Rebuild the running totals from the GL Entries of expense accounts'''
+	frappe.db.sql("delete from `tabBudget Consumption`")
+
+	for fiscal_year in frappe.get_all("Fiscal Year", order_by="year_start_date"):
+		gl_entries = frappe.db.sql("""
+			select gle.company, gle.fiscal_year, min(gle.posting_date) as posting_date,
+				gle.account, gle.cost_center, gle.project,
+				sum(gle.debit) as debit, sum(gle.credit) as credit
+			from `tabGL Entry` gle, `tabAccount` acc
+			where gle.account = acc.name and acc.root_type = 'Expense'
+				and gle.fiscal_year = %s and gle.docstatus = 1
+			group by gle.company, gle.account, gle.cost_center, gle.project,
+				year(gle.posting_date), month(gle.posting_date)
+		""", fiscal_year.name, as_dict=True)
+
+		update_budget_consumption(gl_entries)
+		frappe.db.commit()
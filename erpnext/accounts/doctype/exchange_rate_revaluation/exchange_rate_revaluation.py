@@ -17,10 +17,17 @@ class ExchangeRateRevaluation(Document):
 
 	def set_total_gain_loss(self):
 		total_gain_loss = 0
+		if self.accounts:
+			# rows share the currency of the company, so their precisions are looked up once
+			row = self.accounts[0]
+			new_balance_precision = row.precision("new_balance_in_base_currency")
+			balance_precision = row.precision("balance_in_base_currency")
+			gain_loss_precision = row.precision("gain_loss")
+
 		for d in self.accounts:
-			d.gain_loss = flt(d.new_balance_in_base_currency, d.precision("new_balance_in_base_currency")) \
-				- flt(d.balance_in_base_currency, d.precision("balance_in_base_currency"))
-			total_gain_loss += flt(d.gain_loss, d.precision("gain_loss"))
+			d.gain_loss = flt(d.new_balance_in_base_currency, new_balance_precision) \
+				- flt(d.balance_in_base_currency, balance_precision)
+			total_gain_loss += flt(d.gain_loss, gain_loss_precision)
 		self.total_gain_loss = flt(total_gain_loss, self.precision("total_gain_loss"))
 
 	def validate_mandatory(self):
@@ -35,10 +42,13 @@ class ExchangeRateRevaluation(Document):
 			.get_field("new_balance_in_base_currency"), company_currency)
 
 		account_details = self.get_accounts_from_gle()
+		exchange_rates = get_exchange_rates(set(d.account_currency for d in account_details),
+			company_currency, self.posting_date)
+
 		for d in account_details:
 			current_exchange_rate = d.balance / d.balance_in_account_currency \
 				if d.balance_in_account_currency else 0
-			new_exchange_rate = get_exchange_rate(d.account_currency, company_currency, self.posting_date)
+			new_exchange_rate = exchange_rates.get(d.account_currency)
 			new_balance_in_base_currency = flt(d.balance_in_account_currency * new_exchange_rate)
 			gain_loss = flt(new_balance_in_base_currency, precision) - flt(d.balance, precision)
 			if gain_loss:
@@ -60,33 +70,7 @@ class ExchangeRateRevaluation(Document):
 		return accounts
 
 	def get_accounts_from_gle(self):
-		company_currency = erpnext.get_company_currency(self.company)
-		accounts = frappe.db.sql_list("""
-			select name
-			from tabAccount
-			where is_group = 0
-				and report_type = 'Balance Sheet'
-				and root_type in ('Asset', 'Liability', 'Equity')
-				and account_type != 'Stock'
-				and company=%s
-				and account_currency != %s
-			order by name""",(self.company, company_currency))
-
-		account_details = []
-		if accounts:
-			account_details = frappe.db.sql("""
-				select
-					account, party_type, party, account_currency,
-					sum(debit_in_account_currency) - sum(credit_in_account_currency) as balance_in_account_currency,
-					sum(debit) - sum(credit) as balance
-				from `tabGL Entry`
-				where account in (%s)
-				group by account, party_type, party
-				having sum(debit) != sum(credit)
-				order by account
-			""" % ', '.join(['%s']*len(accounts)), tuple(accounts), as_dict=1)
-
-		return account_details
+		return get_balances(self.company, self.posting_date)
 
 	def throw_invalid_response_message(self, account_details):
 		if account_details:
@@ -157,8 +141,49 @@ class ExchangeRateRevaluation(Document):
 		journal_entry.set_total_debit_credit()
 		return journal_entry.as_dict()
 
+def get_balances(company, posting_date, account=None, party_type=None, party=None):
+	'''Returns the balances in account and company currency upto the posting date, per account and
+	party, in one grouped query. Balances of all the foreign currency balance sheet accounts of the
+	company are returned unless an `account` is given'''
+	if account:
+		conditions = ["gle.account = %(account)s"]
+	else:
+		conditions = ["acc.is_group = 0", "acc.report_type = 'Balance Sheet'",
+			"acc.root_type in ('Asset', 'Liability', 'Equity')", "acc.account_type != 'Stock'",
+			"acc.company = %(company)s", "acc.account_currency != %(company_currency)s"]
+
+	if party_type and party:
+		conditions.append("gle.party_type = %(party_type)s and gle.party = %(party)s")
+
+	return frappe.db.sql("""
+		select
+			gle.account, gle.party_type, gle.party, acc.account_currency,
+			sum(gle.debit_in_account_currency) - sum(gle.credit_in_account_currency) as balance_in_account_currency,
+			sum(gle.debit) - sum(gle.credit) as balance
+		from `tabGL Entry` gle, `tabAccount` acc
+		where gle.account = acc.name
+			and gle.posting_date <= %(posting_date)s
+			{conditions}
+		group by gle.account, gle.party_type, gle.party
+		having sum(gle.debit) != sum(gle.credit)
+		order by gle.account
+	""".format(conditions="".join(" and " + d for d in conditions)), {
+		"company": company,
+		"company_currency": erpnext.get_company_currency(company),
+		"posting_date": posting_date,
+		"account": account,
+		"party_type": party_type,
+		"party": party
+	}, as_dict=1)
+
+def get_exchange_rates(currencies, company_currency, posting_date):
+	return dict((currency, get_exchange_rate(currency, company_currency, posting_date))
+		for currency in currencies)
+
 @frappe.whitelist()
 def get_account_details(account, company, posting_date, party_type=None, party=None):
+	frappe.has_permission("Account", "read", account, throw=True)
+
 	account_currency, account_type = frappe.db.get_value("Account", account,
 		["account_currency", "account_type"])
 	if account_type in ["Receivable", "Payable"] and not (party_type and party):
@@ -166,9 +191,10 @@ def get_account_details(account, company, posting_date, party_type=None, party=N
 
 	account_details = {}
 	company_currency = erpnext.get_company_currency(company)
-	balance = get_balance_on(account, party_type=party_type, party=party, in_account_currency=False)
+	balances = get_balances(company, posting_date, account, party_type, party)
+	balance = sum(flt(d.balance) for d in balances)
 	if balance:
-		balance_in_account_currency = get_balance_on(account, party_type=party_type, party=party)
+		balance_in_account_currency = sum(flt(d.balance_in_account_currency) for d in balances)
 		current_exchange_rate = balance / balance_in_account_currency if balance_in_account_currency else 0
 		new_exchange_rate = get_exchange_rate(account_currency, company_currency, posting_date)
 		new_balance_in_base_currency = balance_in_account_currency * new_exchange_rate
@@ -5,6 +5,22 @@ from __future__ import unicode_literals
 
 import frappe
 import unittest
+from frappe.utils import flt, nowdate
+from erpnext.accounts.utils import get_balance_on
+from erpnext.accounts.doctype.sales_invoice.test_sales_invoice import create_sales_invoice
+from erpnext.accounts.doctype.exchange_rate_revaluation.exchange_rate_revaluation import get_balances
 
 class TestExchangeRateRevaluation(unittest.TestCase):
-	pass
+	def test_balances(self):
+		create_sales_invoice(customer="_Test Customer USD", debit_to="_Test Receivable USD - _TC",
+			currency="USD", conversion_rate=50)
+
+		balances = get_balances("_Test Company", nowdate())
+		party_balances = [d for d in balances if d.account == "_Test Receivable USD - _TC"
+			and d.party == "_Test Customer USD"]
+		self.assertEqual(len(party_balances), 1)
+
+		for in_account_currency, fieldname in ((True, "balance_in_account_currency"), (False, "balance")):
+			self.assertEqual(flt(party_balances[0].get(fieldname), 2),
+				flt(get_balance_on("_Test Receivable USD - _TC", nowdate(), party_type="Customer",
+					party="_Test Customer USD", in_account_currency=in_account_currency), 2))
@@ -6,6 +6,8 @@ import frappe, unittest
 from frappe.model.naming import parse_naming_series
 from erpnext.accounts.doctype.journal_entry.test_journal_entry import make_journal_entry
 from erpnext.accounts.doctype.gl_entry.gl_entry import rename_gle_sle_docs
+from erpnext.accounts.doctype.sales_invoice.test_sales_invoice import create_sales_invoice
+from erpnext.accounts.general_ledger import start_bulk_voucher_import, stop_bulk_voucher_import
 
 class TestGLEntry(unittest.TestCase):
 	def test_round_off_entry(self):
@@ -26,6 +28,39 @@ class TestGLEntry(unittest.TestCase):
 
 		self.assertTrue(round_off_entry)
 
+	def test_bulk_voucher_import(self):
+		si = create_sales_invoice(rate=100)
+
+		jv = make_journal_entry("_Test Bank - _TC", "Debtors - _TC", 40, save=False)
+		jv.get("accounts")[1].update({
+			"party_type": "Customer",
+			"party": si.customer,
+			"reference_type": "Sales Invoice",
+			"reference_name": si.name
+		})
+
+		start_bulk_voucher_import()
+		try:
+			jv.docstatus = 1
+			jv.insert()
+
+			# a voucher adjusted against more than the outstanding is still rejected
+			over_allocated_jv = make_journal_entry("_Test Bank - _TC", "Debtors - _TC", 100, save=False)
+			over_allocated_jv.get("accounts")[1].update({
+				"party_type": "Customer",
+				"party": si.customer,
+				"reference_type": "Journal Entry",
+				"reference_name": jv.name
+			})
+			over_allocated_jv.docstatus = 1
+			self.assertRaises(frappe.ValidationError, over_allocated_jv.insert)
+		finally:
+			stop_bulk_voucher_import()
+
+		self.assertEqual(frappe.db.get_value("Sales Invoice", si.name, "outstanding_amount"), 60)
+		self.assertEqual(len(frappe.get_all("GL Entry",
+			filters={"voucher_type": "Journal Entry", "voucher_no": jv.name, "docstatus": 1})), 2)
+
 	def test_rename_entries(self):
 		je = make_journal_entry("_Test Account Cost for Goods Sold - _TC", "_Test Bank - _TC", 100, submit=True)
 		rename_gle_sle_docs()
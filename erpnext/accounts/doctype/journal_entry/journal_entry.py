@@ -134,19 +134,24 @@ class JournalEntry(AccountsController):
 				d.db_update()
 
 	def unlink_asset_reference(self):
+		# depreciation entries have two rows per asset
+		assets = []
 		for d in self.get("accounts"):
-			if d.reference_type=="Asset" and d.reference_name:
-				asset = frappe.get_doc("Asset", d.reference_name)
-				for s in asset.get("schedules"):
-					if s.journal_entry == self.name:
-						s.db_set("journal_entry", None)
-
-						idx = cint(s.finance_book_id) or 1
-						finance_books = asset.get('finance_books')[idx - 1]
-						finance_books.value_after_depreciation += s.depreciation_amount
-						finance_books.db_update()
-
-						asset.set_status()
+			if d.reference_type=="Asset" and d.reference_name and d.reference_name not in assets:
+				assets.append(d.reference_name)
+
+		for asset_name in assets:
+			asset = frappe.get_doc("Asset", asset_name)
+			for s in asset.get("schedules"):
+				if s.journal_entry == self.name:
+					s.db_set("journal_entry", None)
+
+					idx = cint(s.finance_book_id) or 1
+					finance_books = asset.get('finance_books')[idx - 1]
+					finance_books.value_after_depreciation += s.depreciation_amount
+					finance_books.db_update()
+
+					asset.set_status()
 
 	def unlink_inter_company_jv(self):
 		if self.voucher_type == "Inter Company Journal Entry" and self.inter_company_journal_entry_reference:
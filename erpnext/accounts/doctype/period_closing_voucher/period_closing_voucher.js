@@ -32,6 +32,24 @@ frappe.ui.form.on('Period Closing Voucher', {
 				frappe.set_route("query-report", "General Ledger");
 			}, "fa fa-table");
 		}
+
+		if(frm.doc.docstatus==0 && !frm.is_new()) {
+			frm.add_custom_button(__('Preview'), function() {
+				frm.call('get_closing_preview').then((r) => {
+					let preview = r.message;
+					frappe.msgprint(`
+						<table class="table table-bordered">
+							<tr><td>${__("Entries")}</td><td>${preview.entries}</td></tr>
+							<tr><td>${__("Accounts")}</td><td>${preview.accounts}</td></tr>
+							<tr><td>${__("Cost Centers")}</td><td>${preview.cost_centers}</td></tr>
+							<tr><td>${__("Total Debit")}</td><td>${format_currency(preview.debit)}</td></tr>
+							<tr><td>${__("Total Credit")}</td><td>${format_currency(preview.credit)}</td></tr>
+							<tr><td>${__("Net Profit / Loss Closed")}</td><td>${format_currency(preview.net_pl_balance)}</td></tr>
+							<tr><td>${__("Computed In")}</td><td>${flt(preview.time, 2)} ${__("seconds")}</td></tr>
+						</table>`, __("Closing Preview"));
+				});
+			});
+		}
 	}
 	
 })
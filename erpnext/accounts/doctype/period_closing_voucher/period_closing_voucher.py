@@ -2,11 +2,14 @@
 # License: GNU General Public License v3. See license.txt
 
 from __future__ import unicode_literals
+import time
 import frappe
 from frappe.utils import flt
 from frappe import _
 from erpnext.accounts.utils import get_account_currency
 from erpnext.controllers.accounts_controller import AccountsController
+from erpnext.accounts.doctype.budget_consumption.budget_consumption import cancel_budget_consumption
+from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import get_accounting_dimensions
 
 class PeriodClosingVoucher(AccountsController):
 	def validate(self):
@@ -17,6 +20,7 @@ class PeriodClosingVoucher(AccountsController):
 		self.make_gl_entries()
 
 	def on_cancel(self):
+		cancel_budget_consumption("Period Closing Voucher", self.name)
 		frappe.db.sql("""delete from `tabGL Entry`
 			where voucher_type = 'Period Closing Voucher' and voucher_no=%s""", self.name)
 
@@ -47,13 +51,39 @@ class PeriodClosingVoucher(AccountsController):
 				.format(pce[0][0], self.posting_date))
 
 	def make_gl_entries(self):
+		# closing entries are computed from balanced totals, so they skip the per entry path
+		from erpnext.accounts.general_ledger import make_bulk_gl_entries
+		make_bulk_gl_entries(self.get_gl_entries())
+
+	@frappe.whitelist()
+	def get_closing_preview(self):
+		"""Returns the totals of the closing entries without posting them, and the time taken"""
+		from erpnext.accounts.utils import get_fiscal_year
+
+		start = time.time()
+		self.year_start_date = get_fiscal_year(self.posting_date, self.fiscal_year, company=self.company)[1]
+		gl_entries = self.get_gl_entries()
+
+		return {
+			"entries": len(gl_entries),
+			"accounts": len(set(d.account for d in gl_entries)),
+			"cost_centers": len(set(d.cost_center for d in gl_entries)),
+			"debit": sum(flt(d.debit) for d in gl_entries),
+			"credit": sum(flt(d.credit) for d in gl_entries),
+			"net_pl_balance": sum(flt(d.debit) - flt(d.credit) for d in gl_entries
+				if d.account == self.closing_account_head),
+			"time": time.time() - start
+		}
+
+	def get_gl_entries(self):
 		gl_entries = []
 		net_pl_balance = 0
-		pl_accounts = self.get_pl_balances()
+		dimensions = get_accounting_dimensions()
+		pl_accounts = self.get_pl_balances(dimensions)
 
 		for acc in pl_accounts:
 			if flt(acc.balance_in_company_currency):
-				gl_entries.append(self.get_gl_dict({
+				gl_entry = self.get_gl_dict({
 					"account": acc.account,
 					"cost_center": acc.cost_center,
 					"account_currency": acc.account_currency,
@@ -65,8 +95,12 @@ class PeriodClosingVoucher(AccountsController):
 						if flt(acc.balance_in_account_currency) > 0 else 0,
 					"credit": abs(flt(acc.balance_in_company_currency)) \
 						if flt(acc.balance_in_company_currency) > 0 else 0
-				}))
+				})
 
+				for dimension in dimensions:
+					gl_entry[dimension] = acc.get(dimension)
+
+				gl_entries.append(gl_entry)
 				net_pl_balance += flt(acc.balance_in_company_currency)
 
 		if net_pl_balance:
@@ -80,19 +114,20 @@ class PeriodClosingVoucher(AccountsController):
 				"cost_center": cost_center
 			}))
 
-		from erpnext.accounts.general_ledger import make_gl_entries
-		make_gl_entries(gl_entries)
+		return gl_entries
+
+	def get_pl_balances(self, dimensions=None):
+		"""Get balance for pl accounts, per cost center and accounting dimensions"""
+		dimension_fields = "".join(", t1.`{0}`".format(dimension) for dimension in dimensions or [])
 
-	def get_pl_balances(self):
-		"""Get balance for pl accounts"""
 		return frappe.db.sql("""
 			select
-				t1.account, t1.cost_center, t2.account_currency,
+				t1.account, t1.cost_center, t2.account_currency {dimension_fields},
 				sum(t1.debit_in_account_currency) - sum(t1.credit_in_account_currency) as balance_in_account_currency,
 				sum(t1.debit) - sum(t1.credit) as balance_in_company_currency
 			from `tabGL Entry` t1, `tabAccount` t2
 			where t1.account = t2.name and t2.report_type = 'Profit and Loss'
 			and t2.docstatus < 2 and t2.company = %s
 			and t1.posting_date between %s and %s
-			group by t1.account, t1.cost_center
-		""", (self.company, self.get("year_start_date"), self.posting_date), as_dict=1)
+			group by t1.account, t1.cost_center {dimension_fields}
+		""".format(dimension_fields=dimension_fields), (self.company, self.get("year_start_date"), self.posting_date), as_dict=1)
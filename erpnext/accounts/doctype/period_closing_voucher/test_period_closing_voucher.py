@@ -65,7 +65,29 @@ class TestPeriodClosingVoucher(unittest.TestCase):
 			self.assertEqual(gle_for_random_expense_account[0].amount_in_account_currency,
 				-1*random_expense_account[0].balance_in_account_currency)
 
-	def make_period_closing_voucher(self):
+	def test_closing_preview(self):
+		year_start_date = get_fiscal_year(today(), company="_Test Company")[1]
+
+		make_journal_entry("_Test Account Cost for Goods Sold - _TC",
+			"_Test Bank - _TC", 600, "_Test Cost Center - _TC", posting_date=now(), submit=True)
+
+		profit_or_loss = frappe.db.sql("""select sum(t1.debit) - sum(t1.credit) as balance
+			from `tabGL Entry` t1, `tabAccount` t2
+			where t1.account = t2.name and t2.report_type = 'Profit and Loss'
+			and t2.docstatus < 2 and t2.company = '_Test Company'
+			and t1.posting_date between %s and %s""", (year_start_date, today()))[0][0]
+
+		pcv = self.make_period_closing_voucher(submit=False)
+		preview = pcv.get_closing_preview()
+
+		self.assertEqual(flt(preview["net_pl_balance"], 2), flt(profit_or_loss, 2))
+		self.assertEqual(flt(preview["debit"], 2), flt(preview["credit"], 2))
+		self.assertFalse(frappe.db.get_value("GL Entry",
+			{"voucher_type": "Period Closing Voucher", "voucher_no": pcv.name}))
+
+		pcv.delete()
+
+	def make_period_closing_voucher(self, submit=True):
 		pcv = frappe.get_doc({
 			"doctype": "Period Closing Voucher",
 			"closing_account_head": "_Test Account Reserves and Surplus - _TC",
@@ -76,7 +98,8 @@ class TestPeriodClosingVoucher(unittest.TestCase):
 			"remarks": "test"
 		})
 		pcv.insert()
-		pcv.submit()
+		if submit:
+			pcv.submit()
 
 		return pcv
 
@@ -1660,6 +1660,30 @@ class TestSalesInvoice(unittest.TestCase):
 
 		self.check_gl_entries(si.name, expected_gle, "2019-01-31")
 
+	def test_deferred_revenue_booked_once(self):
+		deferred_account = create_account(account_name="Deferred Revenue",
+			parent_account="Current Liabilities - _TC", company="_Test Company")
+
+		si = create_sales_invoice(item="_Test Item", posting_date="2019-01-10", do_not_submit=True)
+		si.items[0].enable_deferred_revenue = 1
+		si.items[0].service_start_date = "2019-01-10"
+		si.items[0].service_end_date = "2019-03-15"
+		si.items[0].deferred_revenue_account = deferred_account
+		si.save()
+		si.submit()
+
+		from erpnext.accounts.deferred_revenue import convert_deferred_revenue_to_income
+
+		# running the booking again for the same period books nothing more
+		for i in range(2):
+			convert_deferred_revenue_to_income(start_date="2019-01-01", end_date="2019-01-31")
+
+			gl_entries = frappe.db.sql("""select account, debit, credit from `tabGL Entry`
+				where voucher_type='Sales Invoice' and voucher_no=%s and posting_date > %s""",
+				(si.name, "2019-01-10"), as_dict=1)
+			self.assertEqual(len(gl_entries), 2)
+			self.assertEqual(sum(flt(d.debit) for d in gl_entries if d.account == deferred_account), 33.85)
+
 	def check_gl_entries(self, voucher_no, expected_gle, posting_date):
 		gl_entries = frappe.db.sql("""select account, debit, credit, posting_date
 			from `tabGL Entry`
@@ -4,12 +4,15 @@
 
 from __future__ import unicode_literals
 
+import time
 import frappe
 from frappe import _
 from frappe.model.document import Document
 from frappe.utils.data import nowdate, getdate, cint, add_days, date_diff, get_last_day, add_to_date, flt
 from erpnext.accounts.doctype.subscription_plan.subscription_plan import get_plan_rate
 
+# subscriptions processed by one background job
+SUBSCRIPTION_BATCH_SIZE = 500
 
 class Subscription(Document):
 	def before_insert(self):
@@ -77,6 +80,20 @@ class Subscription(Document):
 		You shouldn't need to call this directly. Use `get_billing_cycle` instead.
 		"""
 		plan_names = [plan.plan for plan in self.plans]
+
+		preloaded_plans = frappe.flags.subscription_plans or {}
+		if plan_names and all(plan in preloaded_plans for plan in plan_names):
+			billing_info = []
+			for plan in plan_names:
+				data = {
+					'billing_interval': preloaded_plans[plan].billing_interval,
+					'billing_interval_count': preloaded_plans[plan].billing_interval_count
+				}
+				if data not in billing_info:
+					billing_info.append(data)
+
+			return billing_info
+
 		billing_info = frappe.db.sql(
 			'select distinct `billing_interval`, `billing_interval_count` '
 			'from `tabSubscription Plan` '
@@ -292,7 +309,10 @@ class Subscription(Document):
 		items = []
 		customer = self.customer
 		for plan in plans:
-			item_code = frappe.db.get_value("Subscription Plan", plan.plan, "item")
+			if plan.plan in (frappe.flags.subscription_plans or {}):
+				item_code = frappe.flags.subscription_plans[plan.plan].item
+			else:
+				item_code = frappe.db.get_value("Subscription Plan", plan.plan, "item")
 			if not prorate:
 				items.append({'item_code': item_code, 'qty': plan.qty, 'rate': get_plan_rate(plan.plan, plan.qty, customer)})
 			else:
@@ -436,28 +456,97 @@ def get_prorata_factor(period_end, period_start):
 	return prorate_factor
 
 
+def on_doctype_update():
+	frappe.db.add_index("Subscription", ["status", "current_invoice_end"])
+
+
 def process_all():
 	"""
-	Task to updates the status of all `Subscription` apart from those that are cancelled
+	Task to update the status of the `Subscription`s that are due for it. They are processed
+	in batches by the workers of the long queue, leaving out the ones still queued by an earlier run
 	"""
-	subscriptions = get_all_subscriptions()
-	for subscription in subscriptions:
-		process(subscription)
+	queued_after = time.time() - 86400
+	subscriptions = [d.name for d in get_all_subscriptions()
+		if not (frappe.cache().hget("subscriptions_queued", d.name) or 0) > queued_after]
+
+	for i in range(0, len(subscriptions), SUBSCRIPTION_BATCH_SIZE):
+		batch = subscriptions[i:i + SUBSCRIPTION_BATCH_SIZE]
+		for name in batch:
+			frappe.cache().hset("subscriptions_queued", name, time.time())
+
+		frappe.enqueue("erpnext.accounts.doctype.subscription.subscription.process_batch",
+			queue="long", timeout=3600, subscriptions=batch, now=frappe.flags.in_test)
 
 
 def get_all_subscriptions():
 	"""
-	Returns all `Subscription` documents
+	Returns the `Subscription`s that can be invoiced or change status today. Active ones are due
+	once their billing period ends, or anytime if they are invoiced at the start of the period
+	"""
+	return frappe.db.sql("""
+		select name from `tabSubscription`
+		where status in ('Past Due Date', 'Unpaid')
+			or (status = 'Active' and current_invoice_end <= %(today)s)
+			or (status = 'Active' and generate_invoice_at_period_start = 1)
+	""", {'today': nowdate()}, as_dict=1)
+
+
+def process_batch(subscriptions):
+	"""
+	Processes a batch of `Subscription`s with their plans and customer groups loaded upfront,
+	and logs the throughput of the batch
 	"""
-	return frappe.db.sql(
-		'select name from `tabSubscription` where status != "Cancelled"',
-		as_dict=1
-	)
+	start = time.time()
+	failed = 0
+	try:
+		invoice_count = get_invoice_count(subscriptions)
+		prefetch_plans(subscriptions)
+
+		for name in subscriptions:
+			if not process({'name': name}):
+				failed += 1
+
+	finally:
+		# subscriptions of a batch that stopped are queued again by the next run
+		for name in subscriptions:
+			frappe.cache().hdel("subscriptions_queued", name)
+
+		frappe.flags.subscription_plans = frappe.flags.subscription_customer_groups = None
+
+	duration = time.time() - start
+	frappe.logger(__name__).info("Processed {0} subscriptions ({1} failed), generated {2} invoices "
+		"in {3:.1f}s, {4:.1f} subscriptions/s".format(len(subscriptions), failed,
+			get_invoice_count(subscriptions) - invoice_count, duration, len(subscriptions) / (duration or 1)))
+
+
+def prefetch_plans(subscriptions):
+	"""
+	Loads the plans and the customer groups of a batch of `Subscription`s, to be used by
+	`get_plan_rate` and `get_billing_cycle_and_interval`
+	"""
+	frappe.flags.subscription_plans = {}
+	for d in frappe.db.sql("""
+		select sp.name, sp.item, sp.price_determination, sp.cost, sp.price_list,
+			sp.billing_interval, sp.billing_interval_count
+		from `tabSubscription Plan` sp
+		where exists(select name from `tabSubscription Plan Detail`
+			where parent in %s and plan = sp.name)""", (tuple(subscriptions),), as_dict=1):
+		frappe.flags.subscription_plans[d.name] = d
+
+	frappe.flags.subscription_customer_groups = dict(frappe.db.sql("""
+		select c.name, c.customer_group
+		from `tabCustomer` c, `tabSubscription` s
+		where s.customer = c.name and s.name in %s""", (tuple(subscriptions),)))
+
+
+def get_invoice_count(subscriptions):
+	return frappe.db.sql("""select count(*) from `tabSubscription Invoice`
+		where parent in %s""", (tuple(subscriptions),))[0][0]
 
 
 def process(data):
 	"""
-	Checks a `Subscription` and updates it status as necessary
+	Checks a `Subscription` and updates it status as necessary, returns `False` if it failed
 	"""
 	if data:
 		try:
@@ -469,6 +558,9 @@ def process(data):
 			frappe.db.begin()
 			frappe.log_error(frappe.get_traceback())
 			frappe.db.commit()
+			return False
+
+	return True
 
 
 @frappe.whitelist()
@@ -6,7 +6,8 @@ from __future__ import unicode_literals
 import unittest
 
 import frappe
-from erpnext.accounts.doctype.subscription.subscription import get_prorata_factor
+from erpnext.accounts.doctype.subscription.subscription import get_prorata_factor, get_all_subscriptions, \
+	process_batch
 from frappe.utils.data import nowdate, add_days, add_to_date, add_months, date_diff, flt
 
 
@@ -538,3 +539,27 @@ class TestSubscription(unittest.TestCase):
 		settings.save()
 
 		subscription.delete()
+
+	def test_only_due_subscriptions_are_processed(self):
+		current = frappe.new_doc('Subscription')
+		current.customer = '_Test Customer'
+		current.append('plans', {'plan': '_Test Plan Name', 'qty': 1})
+		current.save()
+
+		ended = frappe.new_doc('Subscription')
+		ended.customer = '_Test Customer'
+		ended.start = '2018-01-01'
+		ended.append('plans', {'plan': '_Test Plan Name', 'qty': 1})
+		ended.insert()
+
+		due = [d.name for d in get_all_subscriptions()]
+		self.assertNotIn(current.name, due)
+		self.assertIn(ended.name, due)
+
+		process_batch([current.name, ended.name])
+		self.assertEqual(frappe.db.get_value('Subscription', ended.name, 'status'), 'Past Due Date')
+		self.assertEqual(frappe.db.count('Subscription Invoice', {'parent': ended.name}), 1)
+		self.assertEqual(frappe.db.count('Subscription Invoice', {'parent': current.name}), 0)
+
+		current.delete()
+		frappe.get_doc('Subscription', ended.name).delete()
@@ -18,13 +18,15 @@ class SubscriptionPlan(Document):
 
 @frappe.whitelist()
 def get_plan_rate(plan, quantity=1, customer=None):
-	plan = frappe.get_doc("Subscription Plan", plan)
+	# plans and customer groups are loaded upfront when subscriptions are processed in batches
+	plan = (frappe.flags.subscription_plans or {}).get(plan) or frappe.get_doc("Subscription Plan", plan)
 	if plan.price_determination == "Fixed rate":
 		return plan.cost
 
 	elif plan.price_determination == "Based on price list":
 		if customer:
-			customer_group = frappe.db.get_value("Customer", customer, "customer_group")
+			customer_group = (frappe.flags.subscription_customer_groups or {}).get(customer) \
+				or frappe.db.get_value("Customer", customer, "customer_group")
 		else:
 			customer_group = None
 
@@ -3,16 +3,11 @@
 # For license information, please see license.txt
 
 from __future__ import unicode_literals
-from past.builtins import cmp
 import frappe
 from frappe import _
 from frappe.model.document import Document
-from frappe.utils import cstr, cint
+from frappe.utils import cstr, cint, getdate
 from frappe.contacts.doctype.address.address import get_default_address
-from frappe.utils.nestedset import get_root_of
-from erpnext.setup.doctype.customer_group.customer_group import get_parent_customer_groups
-
-import functools
 
 from six import iteritems
 
@@ -30,6 +25,12 @@ class TaxRule(Document):
 		self.validate_filters()
 		self.validate_use_for_shopping_cart()
 
+	def on_update(self):
+		clear_tax_rule_cache()
+
+	def on_trash(self):
+		clear_tax_rule_cache()
+
 	def validate_tax_template(self):
 		if self.tax_type== "Sales":
 			self.purchase_tax_template = self.supplier = self.supplier_group = None
@@ -142,50 +143,79 @@ def get_party_details(party, party_type, args=None):
 def get_tax_template(posting_date, args):
 	"""Get matching tax rule"""
 	args = frappe._dict(args)
-	conditions = ["""(from_date is null or from_date <= '{0}')
-		and (to_date is null or to_date >= '{0}')""".format(posting_date)]
-
-	conditions.append("ifnull(tax_category, '') = {0}".format(frappe.db.escape(cstr(args.get("tax_category")))))
-	if 'tax_category' in args.keys():
-		del args['tax_category']
-
-	for key, value in iteritems(args):
-		if key=="use_for_shopping_cart":
-			conditions.append("use_for_shopping_cart = {0}".format(1 if value else 0))
-		elif key == 'customer_group':
-			if not value: value = get_root_of("Customer Group")
-			customer_group_condition = get_customer_group_condition(value)
-			conditions.append("ifnull({0}, '') in ('', {1})".format(key, customer_group_condition))
-		else:
-			conditions.append("ifnull({0}, '') in ('', {1})".format(key, frappe.db.escape(cstr(value))))
+	posting_date = getdate(posting_date)
+	tax_rules = get_tax_rules()
 
-	tax_rule = frappe.db.sql("""select * from `tabTax Rule`
-		where {0}""".format(" and ".join(conditions)), as_dict = True)
+	tax_category = get_match_value(args.pop("tax_category", None))
 
-	if not tax_rule:
-		return None
+	customer_groups = None
+	if "customer_group" in args:
+		customer_groups = tax_rules.customer_groups.get(args.customer_group or tax_rules.root_customer_group, [])
 
-	for rule in tax_rule:
-		rule.no_of_keys_matched = 0
-		for key in args:
-			if rule.get(key): rule.no_of_keys_matched += 1
+	matched_rules = []
+	for rule in tax_rules.rules:
+		if ((rule.from_date and rule.from_date > posting_date)
+			or (rule.to_date and rule.to_date < posting_date)
+			or get_match_value(rule.tax_category) != tax_category):
+			continue
 
-	rule = sorted(tax_rule,
-		key = functools.cmp_to_key(lambda b, a:
-		cmp(a.no_of_keys_matched, b.no_of_keys_matched) or
-		cmp(a.priority, b.priority)))[0]
+		if all(is_key_matched(rule, key, value, customer_groups) for key, value in iteritems(args)):
+			# rules with more of the given keys set are a better match, then the ones with a higher priority
+			matched_rules.append(((len([key for key in args if rule.get(key)]), cint(rule.priority)), rule))
+
+	if not matched_rules:
+		return None
+
+	rule = max(matched_rules, key=lambda d: d[0])[1]
 
 	tax_template = rule.sales_tax_template or rule.purchase_tax_template
 	doctype = "{0} Taxes and Charges Template".format(rule.tax_type)
 
-	if frappe.db.get_value(doctype, tax_template, 'disabled')==1:
+	if frappe.get_cached_value(doctype, tax_template, 'disabled')==1:
 		return None
 
 	return tax_template
 
-def get_customer_group_condition(customer_group):
-	condition = ""
-	customer_groups = ["%s"%(frappe.db.escape(d.name)) for d in get_parent_customer_groups(customer_group)]
-	if customer_groups:
-		condition = ",".join(['%s'] * len(customer_groups))%(tuple(customer_groups))
-	return condition
\ No newline at end of file
+def is_key_matched(rule, key, value, customer_groups=None):
+	if key == "use_for_shopping_cart":
+		return cint(rule.use_for_shopping_cart) == (1 if value else 0)
+
+	if not rule.get(key):
+		return True
+
+	if key == "customer_group":
+		return get_match_value(rule.customer_group) in customer_groups
+
+	return get_match_value(rule.get(key)) == get_match_value(value)
+
+def get_match_value(value):
+	# values are compared like the database does, regardless of case and trailing spaces
+	return cstr(value).rstrip().lower()
+
+def get_tax_rules():
+	"""Returns all the Tax Rules, and the customer groups each customer group is under (itself included),
+	cached till a Tax Rule or Customer Group is changed"""
+	return frappe.cache().get_value("tax_rules", build_tax_rules)
+
+def build_tax_rules():
+	rules = frappe.db.sql("""select * from `tabTax Rule`""", as_dict=True)
+	for rule in rules:
+		rule.from_date = getdate(rule.from_date) if rule.from_date else None
+		rule.to_date = getdate(rule.to_date) if rule.to_date else None
+
+	customer_groups = frappe.db.sql("""select name, lft, rgt, parent_customer_group
+		from `tabCustomer Group` order by lft""", as_dict=True)
+
+	return frappe._dict({
+		"rules": rules,
+		"root_customer_group": next((d.name for d in customer_groups if not d.parent_customer_group), None),
+		"customer_groups": dict((d.name, [get_match_value(parent.name) for parent in customer_groups
+			if parent.lft <= d.lft and parent.rgt >= d.rgt]) for d in customer_groups)
+	})
+
+def clear_tax_rule_cache():
+	frappe.cache().delete_value("tax_rules")
+
+def clear_tax_rule_cache_on_rename(doc, method=None, *args):
+	'''Renaming a document linked in tax rules updates the rules directly in the database'''
+	clear_tax_rule_cache()
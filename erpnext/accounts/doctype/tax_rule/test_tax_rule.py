@@ -5,7 +5,8 @@ from __future__ import unicode_literals
 
 import frappe
 import unittest
-from erpnext.accounts.doctype.tax_rule.tax_rule import IncorrectCustomerGroup, IncorrectSupplierType, ConflictingTaxRule, get_tax_template
+from erpnext.accounts.doctype.tax_rule.tax_rule import IncorrectCustomerGroup, IncorrectSupplierType, ConflictingTaxRule, get_tax_template, \
+	clear_tax_rule_cache
 
 test_records = frappe.get_test_records('Tax Rule')
 
@@ -14,9 +15,11 @@ from six import iteritems
 class TestTaxRule(unittest.TestCase):
 	def setUp(self):
 		frappe.db.sql("delete from `tabTax Rule`")
+		clear_tax_rule_cache()
 
 	def tearDown(self):
 		frappe.db.sql("delete from `tabTax Rule`")
+		clear_tax_rule_cache()
 
 	def test_conflict(self):
 		tax_rule1 = make_tax_rule(customer= "_Test Customer",
@@ -46,6 +49,22 @@ class TestTaxRule(unittest.TestCase):
 		self.assertEqual(get_tax_template("2015-01-01", {"customer_group" : "Commercial", "use_for_shopping_cart":0}),
 			"_Test Sales Taxes and Charges Template - _TC")
 
+	def test_tax_template_for_changed_rule(self):
+		tax_rule = make_tax_rule(customer= "_Test Customer",
+			sales_tax_template = "_Test Sales Taxes and Charges Template - _TC", save=1)
+
+		self.assertEqual(get_tax_template("2015-01-01", {"customer": "_Test Customer"}),
+			"_Test Sales Taxes and Charges Template - _TC")
+
+		tax_rule.sales_tax_template = "_Test Sales Taxes and Charges Template 1 - _TC"
+		tax_rule.save()
+
+		self.assertEqual(get_tax_template("2015-01-01", {"customer": "_Test Customer"}),
+			"_Test Sales Taxes and Charges Template 1 - _TC")
+
+		tax_rule.delete()
+		self.assertEqual(get_tax_template("2015-01-01", {"customer": "_Test Customer"}), None)
+
 	def test_conflict_with_overlapping_dates(self):
 		tax_rule1 = make_tax_rule(customer= "_Test Customer",
 			sales_tax_template = "_Test Sales Taxes and Charges Template - _TC", priority = 1, from_date = "2015-01-01", to_date = "2015-01-05")
@@ -144,6 +163,29 @@ class TestTaxRule(unittest.TestCase):
 		self.assertEqual(get_tax_template("2015-01-01", {"customer":"_Test Customer", "billing_city": "Test City 1"}),
 			"_Test Sales Taxes and Charges Template 1 - _TC")
 
+	def test_tax_rules_after_rename(self):
+		if not frappe.db.exists("Customer", "_Test Tax Rule Customer"):
+			frappe.get_doc({
+				"doctype": "Customer",
+				"customer_name": "_Test Tax Rule Customer",
+				"customer_group": "_Test Customer Group",
+				"territory": "_Test Territory"
+			}).insert()
+
+		make_tax_rule(customer="_Test Tax Rule Customer",
+			sales_tax_template="_Test Sales Taxes and Charges Template - _TC", save=1)
+		self.assertEqual(get_tax_template("2015-01-01", {"customer": "_Test Tax Rule Customer"}),
+			"_Test Sales Taxes and Charges Template - _TC")
+
+		# links in tax rules are renamed in the database, so the cached rules are cleared
+		frappe.rename_doc("Customer", "_Test Tax Rule Customer", "_Test Tax Rule Customer 1", force=True)
+		try:
+			self.assertEqual(get_tax_template("2015-01-01", {"customer": "_Test Tax Rule Customer 1"}),
+				"_Test Sales Taxes and Charges Template - _TC")
+		finally:
+			frappe.db.sql("delete from `tabTax Rule`")
+			frappe.delete_doc("Customer", "_Test Tax Rule Customer 1")
+
 
 def make_tax_rule(**args):
 	args = frappe._dict(args)
@@ -6,7 +6,9 @@ import frappe, erpnext
 from frappe.utils import flt, cstr, cint
 from frappe import _
 from frappe.model.meta import get_field_precision
-from erpnext.accounts.doctype.budget.budget import validate_expense_against_budget
+from erpnext.accounts.doctype.budget.budget import validate_voucher_against_budget
+from erpnext.accounts.doctype.budget_consumption.budget_consumption import update_budget_consumption, \
+	cancel_budget_consumption
 from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import get_accounting_dimensions
 
 
@@ -96,12 +98,15 @@ def save_entries(gl_map, adv_adj, update_outstanding, from_repost=False):
 
 	round_off_debit_credit(gl_map)
 
-	for entry in gl_map:
-		make_entry(entry, adv_adj, update_outstanding, from_repost)
+	if frappe.flags.in_bulk_voucher_import:
+		gl_entries = make_imported_entries(gl_map, adv_adj, update_outstanding)
+	else:
+		gl_entries = [make_entry(entry, adv_adj, update_outstanding, from_repost) for entry in gl_map]
+	update_budget_consumption(gl_entries)
 
-		# check against budget
-		if not from_repost:
-			validate_expense_against_budget(entry)
+	# check against budget
+	if not from_repost and not frappe.flags.in_bulk_voucher_import:
+		validate_voucher_against_budget(gl_map)
 
 def make_entry(args, adv_adj, update_outstanding, from_repost=False):
 	args.update({"doctype": "GL Entry"})
@@ -112,6 +117,103 @@ def make_entry(args, adv_adj, update_outstanding, from_repost=False):
 	gle.run_method("on_update_with_args", adv_adj, update_outstanding, from_repost)
 	gle.submit()
 
+	return gle
+
+def make_imported_entries(gl_map, adv_adj, update_outstanding):
+	"""Insert the GL Entries of a migrated voucher in one multi-row insert, after running the
+	validations of each entry, then update the outstanding of the vouchers they are against,
+	once per voucher. Errors are raised like on the regular path, so the voucher is rejected"""
+	from erpnext.accounts.doctype.gl_entry.gl_entry import update_outstanding_amt
+
+	gl_entries = []
+	for entry in gl_map:
+		gle = get_bulk_gl_entry(entry)
+		gle.run_method("validate")
+		gle.run_method("on_update_with_args", adv_adj, "No")
+		gl_entries.append(gle)
+
+	insert_gl_entries(gl_entries)
+
+	if update_outstanding == "Yes":
+		against_vouchers = set((gle.account, gle.party_type, gle.party, gle.against_voucher_type, gle.against_voucher)
+			for gle in gl_entries if gle.against_voucher
+				and gle.against_voucher_type in ['Journal Entry', 'Sales Invoice', 'Purchase Invoice', 'Fees'])
+
+		for args in sorted(against_vouchers, key=lambda d: [cstr(v) for v in d]):
+			update_outstanding_amt(*args)
+
+	return gl_entries
+
+def get_bulk_gl_entry(entry, now=None):
+	"""GL Entry document to insert as submitted through `insert_gl_entries`"""
+	now = now or frappe.utils.now()
+	gle = frappe.get_doc(dict(entry, doctype="GL Entry"))
+	gle.flags.ignore_permissions = 1
+	gle.update({
+		"name": frappe.generate_hash(txt="", length=10),
+		"docstatus": 1,
+		"to_rename": 1,
+		"owner": frappe.session.user,
+		"modified_by": frappe.session.user,
+		"creation": now,
+		"modified": now
+	})
+	return gle
+
+def insert_gl_entries(gl_entries, batch_size=1000):
+	columns = list(gl_entries[0].get_valid_dict(convert_dates_to_str=True))
+	for i in range(0, len(gl_entries), batch_size):
+		values = []
+		for gle in gl_entries[i:i + batch_size]:
+			d = gle.get_valid_dict(convert_dates_to_str=True)
+			values.extend(d.get(column) for column in columns)
+
+		frappe.db.sql("""insert into `tabGL Entry` ({columns}) values {values}""".format(
+			columns=", ".join("`{0}`".format(column) for column in columns),
+			values=", ".join(["({0})".format(", ".join(["%s"] * len(columns)))] * (len(values) // len(columns)))),
+			tuple(values))
+
+def make_bulk_gl_entries(gl_map, batch_size=1000):
+	"""Insert the GL Entries of a voucher as submitted, in multi-row inserts.
+
+	Entries skip the per-entry validations and hooks, for vouchers that compute
+	balanced entries for validated accounts themselves, like the Period Closing Voucher."""
+	from erpnext.accounts.doctype.gl_entry.gl_entry import check_freezing_date, validate_frozen_account
+	from erpnext.accounts.utils import get_account_currency
+
+	gl_map = process_gl_map(gl_map, merge_entries=False)
+	if not gl_map:
+		return
+
+	round_off_debit_credit(gl_map)
+	check_freezing_date(gl_map[0].posting_date)
+	for account in set(d.account for d in gl_map):
+		validate_frozen_account(account)
+
+	now = frappe.utils.now()
+	gl_entries = []
+	for entry in gl_map:
+		gle = get_bulk_gl_entry(entry, now)
+		gle.validate_and_set_fiscal_year()
+		if not gle.account_currency:
+			gle.account_currency = get_account_currency(gle.account)
+
+		gl_entries.append(gle)
+
+	insert_gl_entries(gl_entries, batch_size)
+	update_budget_consumption(gl_entries)
+
+def start_bulk_voucher_import():
+	"""Post GL Entries of migrated vouchers through the bulk path.
+
+	The GL Entries of each voucher are validated one by one but inserted as submitted in
+	one multi-row insert, budgets are not validated, and outstanding amounts of the vouchers
+	referred by the entries are updated once per voucher, see `make_imported_entries`."""
+	frappe.flags.in_bulk_voucher_import = True
+
+def stop_bulk_voucher_import():
+	frappe.flags.in_bulk_voucher_import = False
+
 def validate_account_for_perpetual_inventory(gl_map):
 	if cint(erpnext.is_perpetual_inventory_enabled(gl_map[0].company)) \
 		and gl_map[0].voucher_type=="Journal Entry":
@@ -212,14 +314,17 @@ def delete_gl_entries(gl_entries=None, voucher_type=None, voucher_no=None,
 	if gl_entries:
 		check_freezing_date(gl_entries[0]["posting_date"], adv_adj)
 
+	voucher_type, voucher_no = voucher_type or gl_entries[0]["voucher_type"], voucher_no or gl_entries[0]["voucher_no"]
+	cancel_budget_consumption(voucher_type, voucher_no)
 	frappe.db.sql("""delete from `tabGL Entry` where voucher_type=%s and voucher_no=%s""",
-		(voucher_type or gl_entries[0]["voucher_type"], voucher_no or gl_entries[0]["voucher_no"]))
+		(voucher_type, voucher_no))
+
+	if not adv_adj:
+		validate_voucher_against_budget(gl_entries)
 
 	for entry in gl_entries:
 		validate_frozen_account(entry["account"], adv_adj)
 		validate_balance_type(entry["account"], adv_adj)
-		if not adv_adj:
-			validate_expense_against_budget(entry)
 
 		if entry.get("against_voucher") and update_outstanding == 'Yes' and not adv_adj:
 			update_outstanding_amt(entry["account"], entry.get("party_type"), entry.get("party"), entry.get("against_voucher_type"),
@@ -380,7 +380,7 @@ erpnext.accounts.ReconciliationRow = class ReconciliationRow {
 	}
 
 
-	show_dialog(data) {
+	show_dialog(data, refresh) {
 		const me = this;
 
 		frappe.db.get_value("Bank Account", me.data.bank_account, "account", (r) => {
@@ -388,7 +388,7 @@ erpnext.accounts.ReconciliationRow = class ReconciliationRow {
 		})
 
 		frappe.xcall('erpnext.accounts.page.bank_reconciliation.bank_reconciliation.get_linked_payments',
-			{bank_transaction: data, freeze:true, freeze_message:__("Finding linked payments")}
+			{bank_transaction: data, refresh: refresh ? 1 : 0, freeze:true, freeze_message:__("Finding linked payments")}
 		).then((result) => {
 			me.make_dialog(result)
 		})
@@ -498,6 +498,11 @@ erpnext.accounts.ReconciliationRow = class ReconciliationRow {
 			size: "large"
 		});
 
+		me.dialog.set_primary_action(__("Find Payments Again"), () => {
+			me.dialog.hide();
+			me.show_dialog(me.bank_entry, true);
+		});
+
 		const proposals_wrapper = me.dialog.fields_dict.payment_proposals.$wrapper;
 		if (data && data.length > 0) {
 			proposals_wrapper.append(frappe.render_template("linked_payment_header"));
@@ -5,10 +5,13 @@
 from __future__ import unicode_literals
 import frappe
 from frappe import _
+import json
 import difflib
-from frappe.utils import flt
-from six import iteritems
+from frappe.utils import flt, cint
+from six import iteritems, string_types
 from erpnext import get_company_currency
+from erpnext.accounts.doctype.bank_transaction_term.bank_transaction_term import get_description_matches
+from erpnext.accounts.doctype.bank_transaction_suggestion.bank_transaction_suggestion import get_bank_transaction_suggestions
 
 @frappe.whitelist()
 def reconcile(bank_transaction, payment_doctype, payment_name):
@@ -44,7 +47,14 @@ def add_payment_to_transaction(transaction, payment_entry, gl_entry):
 	transaction.update_allocations()
 
 @frappe.whitelist()
-def get_linked_payments(bank_transaction):
+def get_linked_payments(bank_transaction, refresh=False):
+	# payments suggested when the statement was imported, or since a payment was submitted,
+	# are served as is, the payments are only matched again on demand or without suggestions
+	if not cint(refresh):
+		suggestions = get_bank_transaction_suggestions(bank_transaction)
+		if suggestions:
+			return suggestions
+
 	transaction = frappe.get_doc("Bank Transaction", bank_transaction)
 	bank_account = frappe.db.get_values("Bank Account", transaction.bank_account, ["account", "company"], as_dict=True)
 
@@ -58,11 +68,8 @@ def get_linked_payments(bank_transaction):
 		return check_amount_vs_description(amount_matching, description_matching)
 
 	elif description_matching:
-		description_matching = filter(lambda x: not x.get('clearance_date'), description_matching)
-		if not description_matching:
-			return []
-
-		return sorted(list(description_matching), key = lambda x: x["posting_date"], reverse=True)
+		description_matching = [x for x in description_matching if not x.get('clearance_date')]
+		return sorted(description_matching, key = lambda x: x["posting_date"], reverse=True)
 
 	else:
 		return []
@@ -190,29 +197,43 @@ def get_matching_descriptions_data(company, transaction):
 	if not transaction.description :
 		return []
 
-	bank_transactions = frappe.db.sql("""
+	matches = get_description_matches([transaction.description]).get(transaction.description)
+
+	return get_matching_payments_data(company, matches)
+
+@frappe.whitelist()
+def get_statement_description_matches(bank_transactions, top_k=10):
+	"""Returns the reconciled transactions matching the description of each of `bank_transactions`,
+	to match a whole statement at once"""
+	if isinstance(bank_transactions, string_types):
+		bank_transactions = json.loads(bank_transactions)
+
+	if not bank_transactions:
+		return {}
+
+	descriptions = dict(frappe.db.sql("""select name, description from `tabBank Transaction`
+		where name in %s""", (tuple(bank_transactions),)))
+	matches = get_description_matches(descriptions.values(), top_k=cint(top_k))
+
+	return {name: matches.get(description) or [] for name, description in iteritems(descriptions)}
+
+def get_matching_payments_data(company, matches):
+	"""Returns the payments of the given matching bank transactions"""
+	if not matches:
+		return []
+
+	ratio = {d.bank_transaction: d.ratio for d in matches}
+	selection = frappe.db.sql("""
 		SELECT
-			bt.name, bt.description, bt.date, btp.payment_document, btp.payment_entry
+			btp.parent as name, btp.payment_document, btp.payment_entry
 		FROM
-			`tabBank Transaction` as bt
-		LEFT JOIN
 			`tabBank Transaction Payments` as btp
-		ON
-			bt.name = btp.parent
 		WHERE
-			bt.allocated_amount > 0
-		AND
-			bt.docstatus = 1
-		""", as_dict=True)
-
-	selection = []
-	for bank_transaction in bank_transactions:
-		if bank_transaction.description:
-			seq=difflib.SequenceMatcher(lambda x: x == " ", transaction.description, bank_transaction.description)
+			btp.parent in %s
+		""", (tuple(ratio),), as_dict=True)
 
-			if seq.ratio() > 0.6:
-				bank_transaction["ratio"] = seq.ratio()
-				selection.append(bank_transaction)
+	for bank_transaction in selection:
+		bank_transaction["ratio"] = ratio[bank_transaction.name]
 
 	document_types = set([x["payment_document"] for x in selection])
 
@@ -233,9 +254,14 @@ def get_matching_descriptions_data(company, transaction):
 				fields=["name", "'Journal Entry' as doctype", "posting_date",
 					"pay_to_recd_from as party", "cheque_no as reference_no", "cheque_date as reference_date",
 					"total_credit as paid_amount", "clearance_date"])
+
+			account_currency = {}
+			for d in frappe.get_all("Journal Entry Account", filters={"parenttype": "Journal Entry",
+				"parent": ["in", value]}, fields=["parent", "account_currency"], order_by="idx"):
+				account_currency.setdefault(d.parent, d.account_currency)
+
 			for journal_entry in journal_entries:
-				journal_entry_accounts = frappe.get_all("Journal Entry Account", filters={"parenttype": journal_entry["doctype"], "parent": journal_entry["name"]}, fields=["account_currency"])
-				journal_entry["currency"] = journal_entry_accounts[0]["account_currency"] if journal_entry_accounts else company_currency
+				journal_entry["currency"] = account_currency.get(journal_entry["name"]) or company_currency
 			data.extend(journal_entries)
 		if key == "Sales Invoice":
 			data.extend(frappe.get_all("Sales Invoice", filters=[["name", "in", value]], fields=["'Sales Invoice' as doctype", "posting_date", "customer_name as party", "paid_amount", "currency"]))
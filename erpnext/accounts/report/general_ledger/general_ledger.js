@@ -155,8 +155,38 @@ frappe.query_reports["General Ledger"] = {
 			"fieldname": "include_default_book_entries",
 			"label": __("Include Default Book Entries"),
 			"fieldtype": "Check"
+		},
+		{
+			"fieldname": "page_length",
+			"label": __("Entries per Page"),
+			"fieldtype": "Int",
+			"description": __("Show the entries one by one, in pages. Leave Group by empty."),
+			on_change: function() {
+				frappe.query_report.set_filter_value('page_after', "");
+			}
+		},
+		{
+			"fieldname": "page_after",
+			"label": __("Page After"),
+			"fieldtype": "Data",
+			"hidden": 1
 		}
-	]
+	],
+
+	onload: function(report) {
+		report.page.add_inner_button(__("Next Page"), function() {
+			// pages are fetched after the last entry shown, by posting date and name
+			let entries = (frappe.query_report.data || []).filter(d => d.name);
+			if (!frappe.query_report.get_filter_value('page_length') || !entries.length) return;
+
+			let last = entries[entries.length - 1];
+			frappe.query_report.set_filter_value('page_after', JSON.stringify([last.posting_date, last.name]));
+		});
+
+		report.page.add_inner_button(__("First Page"), function() {
+			frappe.query_report.set_filter_value('page_after', "");
+		});
+	}
 }
 
 let dimension_filters = erpnext.get_dimension_filters();
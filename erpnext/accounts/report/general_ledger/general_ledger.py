@@ -5,7 +5,7 @@ from __future__ import unicode_literals
 import frappe, erpnext
 from erpnext import get_company_currency, get_default_company
 from erpnext.accounts.report.utils import get_currency, convert_to_presentation_currency
-from frappe.utils import getdate, cstr, flt, fmt_money
+from frappe.utils import getdate, cstr, flt, fmt_money, cint
 from frappe import _, _dict
 from erpnext.accounts.utils import get_account_currency
 from erpnext.accounts.report.financial_statements import get_cost_centers_with_children
@@ -22,8 +22,10 @@ def execute(filters=None):
 		not filters.get('account'):
 		frappe.throw(_("Select an account to print in account currency"))
 
-	for acc in frappe.db.sql("""select name, is_group from tabAccount""", as_dict=1):
-		account_details.setdefault(acc.name, acc)
+	if filters.get('account'):
+		for acc in frappe.db.sql("""select name, is_group from tabAccount where name=%s""",
+			filters.account, as_dict=1):
+			account_details.setdefault(acc.name, acc)
 
 	if filters.get('party'):
 		filters.party = frappe.parse_json(filters.get("party"))
@@ -36,7 +38,10 @@ def execute(filters=None):
 
 	columns = get_columns(filters)
 
-	res = get_result(filters, account_details)
+	if cint(filters.get('page_length')):
+		res = get_paginated_result(filters)
+	else:
+		res = get_result(filters, account_details)
 
 	return columns, res
 
@@ -59,6 +64,9 @@ def validate_filters(filters, account_details):
 	if filters.from_date > filters.to_date:
 		frappe.throw(_("From Date must be before To Date"))
 
+	if cint(filters.get('page_length')) and filters.get('group_by'):
+		frappe.throw(_("Entries can only be shown in pages if they are not grouped"))
+
 	if filters.get('project'):
 		filters.project = frappe.parse_json(filters.get('project'))
 
@@ -158,6 +166,115 @@ def get_gl_entries(filters):
 		return gl_entries
 
 
+def get_paginated_result(filters):
+	'''
+	Returns a page of the GL Entries matching the filters, ordered by posting date and name,
+	after the entry set in `page_after` as `[posting_date, name]`. The opening row comes with
+	the first page and the totals with the last one, they are summed by the database.
+	The balance of a page runs on from the entries of the previous pages.
+	'''
+	conditions = get_conditions(filters)
+	period_conditions = conditions + get_period_conditions(filters)
+	page_length = cint(filters.page_length)
+
+	keyset_conditions = ""
+	if filters.get('page_after'):
+		filters.after_date, filters.after_name = frappe.parse_json(filters.page_after)
+		keyset_conditions = """ and (posting_date > %(after_date)s
+			or (posting_date = %(after_date)s and name > %(after_name)s))"""
+
+	gl_entries = frappe.db.sql(
+		"""
+		select
+			name, posting_date, account, party_type, party,
+			voucher_type, voucher_no, cost_center, project,
+			against_voucher_type, against_voucher, account_currency,
+			remarks, against, is_opening, debit, credit,
+			debit_in_account_currency, credit_in_account_currency
+		from `tabGL Entry`
+		where company=%(company)s {conditions}
+		order by posting_date, name
+		limit {limit}
+		""".format(conditions=period_conditions + keyset_conditions, limit=page_length + 1),
+		filters, as_dict=1)
+
+	is_last_page = len(gl_entries) <= page_length
+	gl_entries = gl_entries[:page_length]
+	if filters.get('presentation_currency'):
+		gl_entries = convert_to_presentation_currency(gl_entries, get_currency(filters))
+
+	totals = get_totals_dict()
+	add_gl_totals(totals.opening, filters, conditions + get_opening_conditions(filters))
+
+	data, balance = [], 0
+	if filters.get('page_after'):
+		# balance brought forward from the previous pages
+		brought_forward = _dict(debit=0.0, credit=0.0, debit_in_account_currency=0.0, credit_in_account_currency=0.0)
+		add_gl_totals(brought_forward, filters, period_conditions + """ and (posting_date < %(after_date)s
+			or (posting_date = %(after_date)s and name <= %(after_name)s))""")
+
+		balance = (totals.opening.debit - totals.opening.credit
+			+ brought_forward.debit - brought_forward.credit)
+	else:
+		data.append(totals.opening)
+
+	data += gl_entries
+
+	if is_last_page:
+		add_gl_totals(totals.total, filters, period_conditions)
+		for key in ('debit', 'credit', 'debit_in_account_currency', 'credit_in_account_currency'):
+			totals.closing[key] = totals.opening[key] + totals.total[key]
+
+		data += [totals.total, totals.closing]
+
+	return get_result_as_list(data, filters, balance,
+		invoices=[d.against_voucher for d in gl_entries if d.against_voucher_type == 'Purchase Invoice'])
+
+def get_opening_conditions(filters):
+	if filters.get("show_opening_entries"):
+		return " and posting_date < %(from_date)s"
+	else:
+		return " and (posting_date < %(from_date)s or is_opening = 'Yes')"
+
+def get_period_conditions(filters):
+	conditions = " and posting_date between %(from_date)s and %(to_date)s"
+	if not filters.get("show_opening_entries"):
+		conditions += " and ifnull(is_opening, 'No') != 'Yes'"
+
+	return conditions
+
+def add_gl_totals(totals, filters, conditions):
+	'''Add the debit and credit of the GL Entries matching the conditions to `totals`'''
+	if filters.get('presentation_currency'):
+		# converted like the entries, per account and date with debit and credit apart
+		gl_entries = []
+		for d in frappe.db.sql("""
+			select
+				account, account_currency, posting_date, sum(debit) as debit, sum(credit) as credit,
+				sum(debit_in_account_currency) as debit_in_account_currency,
+				sum(credit_in_account_currency) as credit_in_account_currency
+			from `tabGL Entry`
+			where company=%(company)s {conditions}
+			group by account, account_currency, posting_date
+			""".format(conditions=conditions), filters, as_dict=1):
+			gl_entries.append(_dict(d, credit=0.0, credit_in_account_currency=0.0))
+			gl_entries.append(_dict(d, debit=0.0, debit_in_account_currency=0.0))
+
+		gl_entries = convert_to_presentation_currency(gl_entries, get_currency(filters))
+	else:
+		gl_entries = frappe.db.sql("""
+			select
+				sum(debit) as debit, sum(credit) as credit,
+				sum(debit_in_account_currency) as debit_in_account_currency,
+				sum(credit_in_account_currency) as credit_in_account_currency
+			from `tabGL Entry`
+			where company=%(company)s {conditions}
+			""".format(conditions=conditions), filters, as_dict=1)
+
+	for gle in gl_entries:
+		for key in ('debit', 'credit', 'debit_in_account_currency', 'credit_in_account_currency'):
+			totals[key] += flt(gle.get(key))
+
 def get_conditions(filters):
 	conditions = []
 	if filters.get("account"):
@@ -317,9 +434,9 @@ def get_accountwise_gle(filters, gl_entries, gle_map):
 
 	return totals, entries
 
-def get_result_as_list(data, filters):
-	balance, balance_in_account_currency = 0, 0
-	inv_details = get_supplier_invoice_details()
+def get_result_as_list(data, filters, balance=0, invoices=None):
+	balance_in_account_currency = 0
+	inv_details = get_supplier_invoice_details(invoices)
 
 	for d in data:
 		if not d.get('posting_date'):
@@ -333,10 +450,15 @@ def get_result_as_list(data, filters):
 
 	return data
 
-def get_supplier_invoice_details():
+def get_supplier_invoice_details(invoices=None):
 	inv_details = {}
+	if invoices is not None and not invoices:
+		return inv_details
+
+	condition = " and name in %(invoices)s" if invoices else ""
 	for d in frappe.db.sql(""" select name, bill_no from `tabPurchase Invoice`
-		where docstatus = 1 and bill_no is not null and bill_no != '' """, as_dict=1):
+		where docstatus = 1 and bill_no is not null and bill_no != '' {0}""".format(condition),
+		{"invoices": tuple(invoices or [])}, as_dict=1):
 		inv_details[d.name] = d.bill_no
 
 	return inv_details
@@ -0,0 +1,50 @@
+from __future__ import unicode_literals
+
+import frappe
+import json
+import unittest
+from frappe.utils import add_days, flt, nowdate
+from erpnext.accounts.report.general_ledger.general_ledger import execute
+from erpnext.accounts.doctype.journal_entry.test_journal_entry import make_journal_entry
+
+class TestGeneralLedger(unittest.TestCase):
+	def test_paginated_entries(self):
+		# an entry before the period for the opening, and a few in it, some on the same day
+		for days, amount in ((-5, 100), (-2, 200), (-2, 300), (-1, 400), (0, 500), (0, 600)):
+			make_journal_entry("_Test Bank - _TC", "_Test Cash - _TC", amount,
+				posting_date=add_days(nowdate(), days), submit=True)
+
+		columns, expected_data = execute(get_filters())
+		expected_entries = sorted(get_entry_values(d) for d in expected_data if d.get("posting_date"))
+		self.assertTrue(len(expected_entries) > 5)
+
+		entries, page_after, pages = [], None, 0
+		while True:
+			columns, data = execute(get_filters(page_length=2, page_after=page_after))
+			pages += 1
+
+			page_entries = [d for d in data if d.get("name")]
+			self.assertTrue(len(page_entries) <= 2)
+			entries += page_entries
+
+			# the totals and closing come with the last page
+			if not data[-1].get("posting_date"):
+				break
+			page_after = json.dumps([str(page_entries[-1].posting_date), page_entries[-1].name])
+
+		self.assertTrue(pages > 2)
+		self.assertEqual(sorted(get_entry_values(d) for d in entries), expected_entries)
+
+		# the last page ends with the same closing, and the balance runs on to it across the pages
+		closing, expected_closing = data[-1], expected_data[-1]
+		self.assertEqual(closing.account, expected_closing.account)
+		for key in ("debit", "credit", "balance"):
+			self.assertEqual(flt(closing.get(key), 2), flt(expected_closing.get(key), 2))
+		self.assertEqual(flt(entries[-1].balance, 2), flt(closing.balance, 2))
+
+def get_filters(**kwargs):
+	return frappe._dict(kwargs, company="_Test Company", account="_Test Bank - _TC",
+		from_date=add_days(nowdate(), -3), to_date=nowdate())
+
+def get_entry_values(d):
+	return (str(d.posting_date), d.voucher_type, d.voucher_no, flt(d.debit, 2), flt(d.credit, 2))
@@ -99,6 +99,7 @@ class GrossProfitGenerator(object):
 		self.load_stock_ledger_entries()
 		self.load_product_bundle()
 		self.load_non_stock_items()
+		self.load_purchase_rates()
 		self.get_returned_invoice_items()
 		self.process()
 
@@ -145,25 +146,24 @@ class GrossProfitGenerator(object):
 			else:
 				row.gross_profit_percent = 0.0
 
-			# add to grouped
-			self.grouped.setdefault(row.get(scrub(self.filters.group_by)), []).append(row)
+			# add to grouped, the first row of a group holds its totals
+			key = row.get(scrub(self.filters.group_by))
+			if self.filters.get("group_by") == "Invoice":
+				self.grouped.setdefault(key, []).append(row)
+			elif key not in self.grouped:
+				self.grouped[key] = row
+			else:
+				self.grouped[key].qty += row.qty
+				self.grouped[key].buying_amount += row.buying_amount
+				self.grouped[key].base_amount += row.base_amount
 
 		if self.grouped:
 			self.get_average_rate_based_on_group_by()
 
 	def get_average_rate_based_on_group_by(self):
-		# sum buying / selling totals for group
 		for key in list(self.grouped):
 			if self.filters.get("group_by") != "Invoice":
-				for i, row in enumerate(self.grouped[key]):
-					if i==0:
-						new_row = row
-					else:
-						new_row.qty += row.qty
-						new_row.buying_amount += flt(row.buying_amount, self.currency_precision)
-						new_row.base_amount += flt(row.base_amount, self.currency_precision)
-				new_row = self.set_average_rate(new_row)
-				self.grouped_data.append(new_row)
+				self.grouped_data.append(self.set_average_rate(self.grouped[key]))
 			else:
 				for i, row in enumerate(self.grouped[key]):
 					if row.parent in self.returned_invoices \
@@ -187,6 +187,10 @@ class GrossProfitGenerator(object):
 		return new_row
 
 	def get_returned_invoice_items(self):
+		self.returned_invoices = frappe._dict()
+		if self.filters.get("group_by") != "Invoice":
+			return
+
 		returned_invoices = frappe.db.sql("""
 			select
 				si.name, si_item.item_code, si_item.stock_qty as qty, si_item.base_net_amount as base_amount, si.return_against
@@ -196,9 +200,9 @@ class GrossProfitGenerator(object):
 				si.name = si_item.parent
 				and si.docstatus = 1
 				and si.is_return = 1
-		""", as_dict=1)
+				and si.company = %(company)s
+		""", self.filters, as_dict=1)
 
-		self.returned_invoices = frappe._dict()
 		for inv in returned_invoices:
 			self.returned_invoices.setdefault(inv.return_against, frappe._dict())\
 				.setdefault(inv.item_code, []).append(inv)
@@ -219,81 +223,75 @@ class GrossProfitGenerator(object):
 		return flt(buying_amount, self.currency_precision)
 
 	def get_buying_amount(self, row, item_code):
-		# IMP NOTE
-		# stock_ledger_entries should already be filtered by item_code and warehouse and
-		# sorted by posting_date desc, posting_time desc
 		if item_code in self.non_stock_items:
 			#Issue 6089-Get last purchasing rate for non-stock item
-			item_rate = self.get_last_purchase_rate(item_code)
-			return flt(row.qty) * item_rate
+			return flt(row.qty) * self.last_purchase_rate.get(item_code, 0.0)
 
-		else:
-			my_sle = self.sle.get((item_code, row.warehouse))
-			if (row.update_stock or row.dn_detail) and my_sle:
-				parenttype, parent = row.parenttype, row.parent
-				if row.dn_detail:
-					parenttype, parent = "Delivery Note", row.delivery_note
-
-				for i, sle in enumerate(my_sle):
-					# find the stock valution rate from stock ledger entry
-					if sle.voucher_type == parenttype and parent == sle.voucher_no and \
-						sle.voucher_detail_no == row.item_row:
-							previous_stock_value = len(my_sle) > i+1 and \
-								flt(my_sle[i+1].stock_value) or 0.0
-							if previous_stock_value:
-								return (previous_stock_value - flt(sle.stock_value)) * flt(row.qty) / abs(flt(sle.qty))
-							else:
-								return flt(row.qty) * self.get_average_buying_rate(row, item_code)
-			else:
-				return flt(row.qty) * self.get_average_buying_rate(row, item_code)
+		if row.update_stock or row.dn_detail:
+			parenttype, parent = row.parenttype, row.parent
+			if row.dn_detail:
+				parenttype, parent = "Delivery Note", row.delivery_note
+
+			# the stock value the delivery of the item row took out of the warehouse
+			sle = self.sle.get((parenttype, parent, row.item_row, item_code))
+			if sle and flt(sle.qty):
+				return -flt(sle.stock_value_difference) * flt(row.qty) / abs(flt(sle.qty))
 
-		return 0.0
+		return flt(row.qty) * self.get_average_buying_rate(row, item_code)
 
 	def get_average_buying_rate(self, row, item_code):
 		args = row
 		if not item_code in self.average_buying_rate:
-			if item_code in self.non_stock_items:
-				self.average_buying_rate[item_code] = flt(frappe.db.sql("""
-					select sum(base_net_amount) / sum(qty * conversion_factor)
-					from `tabPurchase Invoice Item`
-					where item_code = %s and docstatus=1""", item_code)[0][0])
-			else:
-				args.update({
-					'voucher_type': row.parenttype,
-					'voucher_no': row.parent,
-					'allow_zero_valuation': True,
-					'company': self.filters.company
-				})
+			args.update({
+				'voucher_type': row.parenttype,
+				'voucher_no': row.parent,
+				'allow_zero_valuation': True,
+				'company': self.filters.company
+			})
 
-				average_buying_rate = get_incoming_rate(args)
-				self.average_buying_rate[item_code] =  flt(average_buying_rate)
+			average_buying_rate = get_incoming_rate(args)
+			self.average_buying_rate[item_code] =  flt(average_buying_rate)
 
 		return self.average_buying_rate[item_code]
 
-	def get_last_purchase_rate(self, item_code):
-		if self.filters.to_date:
-			last_purchase_rate = frappe.db.sql("""
-			select (a.base_rate / a.conversion_factor)
-			from `tabPurchase Invoice Item` a
-			where a.item_code = %s and a.docstatus=1
-			and modified <= %s
-			order by a.modified desc limit 1""", (item_code,self.filters.to_date))
-		else:
-			last_purchase_rate = frappe.db.sql("""
-			select (a.base_rate / a.conversion_factor)
-			from `tabPurchase Invoice Item` a
-			where a.item_code = %s and a.docstatus=1
-			order by a.modified desc limit 1""", item_code)
-		return flt(last_purchase_rate[0][0]) if last_purchase_rate else 0
-
-	def load_invoice_items(self):
+	def load_purchase_rates(self):
+		# last purchase rates of the non stock items in the report, in one query
+		item_codes = set(d.item_code for d in self.si_list if d.item_code in self.non_stock_items)
+		for parenttype in self.product_bundles.values():
+			for bundles in parenttype.values():
+				for packed_items in bundles.values():
+					item_codes.update(d.item_code for d in packed_items if d.item_code in self.non_stock_items)
+
+		self.last_purchase_rate = {}
+		if not item_codes:
+			return
+
+		condition = " and modified <= %(to_date)s" if self.filters.to_date else ""
+		self.last_purchase_rate = dict((d[0], flt(d[1])) for d in frappe.db.sql("""
+			select a.item_code, (a.base_rate / a.conversion_factor)
+			from `tabPurchase Invoice Item` a, (
+				select item_code, max(modified) as modified
+				from `tabPurchase Invoice Item`
+				where item_code in %(item_codes)s and docstatus=1 {condition}
+				group by item_code) last
+			where a.item_code = last.item_code and a.modified = last.modified and a.docstatus=1
+		""".format(condition=condition), {"item_codes": tuple(item_codes), "to_date": self.filters.to_date}))
+
+	def get_invoice_conditions(self):
 		conditions = ""
 		if self.filters.company:
-			conditions += " and company = %(company)s"
+			conditions += " and `tabSales Invoice`.company = %(company)s"
 		if self.filters.from_date:
-			conditions += " and posting_date >= %(from_date)s"
+			conditions += " and `tabSales Invoice`.posting_date >= %(from_date)s"
 		if self.filters.to_date:
-			conditions += " and posting_date <= %(to_date)s"
+			conditions += " and `tabSales Invoice`.posting_date <= %(to_date)s"
+		if self.filters.get("sales_invoice"):
+			conditions += " and `tabSales Invoice`.name = %(sales_invoice)s"
+
+		return conditions
+
+	def load_invoice_items(self):
+		conditions = self.get_invoice_conditions()
 
 		if self.filters.group_by=="Sales Person":
 			sales_person_cols = ", sales.sales_person, sales.allocated_amount, sales.incentives"
@@ -302,9 +300,6 @@ class GrossProfitGenerator(object):
 			sales_person_cols = ""
 			sales_team_table = ""
 
-		if self.filters.get("sales_invoice"):
-			conditions += " and `tabSales Invoice`.name = %(sales_invoice)s"
-
 		if self.filters.get("item_code"):
 			conditions += " and `tabSales Invoice Item`.item_code = %(item_code)s"
 
@@ -334,19 +329,24 @@ class GrossProfitGenerator(object):
 				sales_team_table=sales_team_table, match_cond = get_match_cond('Sales Invoice')), self.filters, as_dict=1)
 
 	def load_stock_ledger_entries(self):
-		res = frappe.db.sql("""select item_code, voucher_type, voucher_no,
-				voucher_detail_no, stock_value, warehouse, actual_qty as qty
-			from `tabStock Ledger Entry`
-			where company=%(company)s
-			order by
-				item_code desc, warehouse desc, posting_date desc,
-				posting_time desc, creation desc""", self.filters, as_dict=True)
+		# stock value moved by each delivered item row of the invoices in the report,
+		# directly or through its delivery note
 		self.sle = {}
-		for r in res:
-			if (r.item_code, r.warehouse) not in self.sle:
-				self.sle[(r.item_code, r.warehouse)] = []
-
-			self.sle[(r.item_code, r.warehouse)].append(r)
+		for voucher_type, vouchers in (
+			("Sales Invoice", "select `tabSales Invoice`.name from `tabSales Invoice` where update_stock = 1"),
+			("Delivery Note", """select `tabSales Invoice Item`.delivery_note
+				from `tabSales Invoice` inner join `tabSales Invoice Item`
+					on `tabSales Invoice Item`.parent = `tabSales Invoice`.name
+				where ifnull(`tabSales Invoice Item`.dn_detail, '') != ''""")):
+			for d in frappe.db.sql("""
+				select voucher_type, voucher_no, voucher_detail_no, item_code,
+					sum(stock_value_difference) as stock_value_difference, sum(actual_qty) as qty
+				from `tabStock Ledger Entry`
+				where voucher_type = %(voucher_type)s and voucher_no in ({vouchers}
+					and `tabSales Invoice`.docstatus = 1 and `tabSales Invoice`.is_opening != 'Yes' {conditions})
+				group by voucher_type, voucher_no, voucher_detail_no, item_code""".format(vouchers=vouchers,
+					conditions=self.get_invoice_conditions()), dict(self.filters, voucher_type=voucher_type), as_dict=1):
+				self.sle[(d.voucher_type, d.voucher_no, d.voucher_detail_no, d.item_code)] = d
 
 	def load_product_bundle(self):
 		self.product_bundles = {}
@@ -358,5 +358,5 @@ class GrossProfitGenerator(object):
 				frappe._dict()).setdefault(d.parent_item, []).append(d)
 
 	def load_non_stock_items(self):
-		self.non_stock_items = frappe.db.sql_list("""select name from tabItem
-			where is_stock_item=0""")
+		self.non_stock_items = set(frappe.db.sql_list("""select name from tabItem
+			where is_stock_item=0"""))
@@ -0,0 +1,99 @@
+from __future__ import unicode_literals
+
+import frappe
+import unittest
+from frappe.utils import flt, nowdate
+from erpnext.accounts.report.gross_profit.gross_profit import GrossProfitGenerator
+from erpnext.accounts.doctype.sales_invoice.test_sales_invoice import create_sales_invoice
+from erpnext.accounts.doctype.purchase_invoice.test_purchase_invoice import make_purchase_invoice
+from erpnext.stock.doctype.delivery_note.delivery_note import make_sales_invoice
+from erpnext.stock.doctype.delivery_note.test_delivery_note import create_delivery_note
+from erpnext.stock.doctype.stock_entry.stock_entry_utils import make_stock_entry
+from erpnext.stock.doctype.item.test_item import make_item
+from erpnext.selling.doctype.product_bundle.test_product_bundle import make_product_bundle
+
+test_dependencies = ["Product Bundle"]
+
+class TestGrossProfit(unittest.TestCase):
+	def test_buying_amount(self):
+		make_item("_Test Gross Profit Item", {"is_stock_item": 1})
+		make_item("_Test Gross Profit Packed Item", {"is_stock_item": 1})
+		make_item("_Test Gross Profit Bundle", {"is_stock_item": 0})
+		make_item("_Test Gross Profit Service", {"is_stock_item": 0})
+		make_product_bundle("_Test Gross Profit Bundle",
+			["_Test Gross Profit Item", "_Test Gross Profit Packed Item"])
+
+		for item_code, rate in (("_Test Gross Profit Item", 100), ("_Test Gross Profit Item", 130),
+			("_Test Gross Profit Packed Item", 40)):
+			make_stock_entry(item_code=item_code, target="_Test Warehouse - _TC", qty=10, rate=rate)
+		make_purchase_invoice(item_code="_Test Gross Profit Service", rate=30, qty=1)
+
+		# an invoice updating stock, with a product bundle and a non stock item
+		si = create_sales_invoice(item_code="_Test Gross Profit Item", qty=2, rate=200, update_stock=1,
+			do_not_save=1)
+		for item_code, qty in (("_Test Gross Profit Bundle", 1), ("_Test Gross Profit Service", 3)):
+			si.append("items", {
+				"item_code": item_code,
+				"warehouse": "_Test Warehouse - _TC",
+				"qty": qty,
+				"rate": 200,
+				"income_account": "Sales - _TC",
+				"expense_account": "Cost of Goods Sold - _TC",
+				"cost_center": "_Test Cost Center - _TC"
+			})
+		si.insert()
+		si.submit()
+
+		# and an invoice against a delivery note
+		dn = create_delivery_note(item_code="_Test Gross Profit Item", qty=3, rate=250)
+		dn_si = make_sales_invoice(dn.name)
+		dn_si.insert()
+		dn_si.submit()
+
+		report = GrossProfitGenerator(frappe._dict(company="_Test Company", from_date=nowdate(),
+			to_date=nowdate(), group_by="Invoice"))
+
+		rows = [d for d in report.grouped_data if d.parent in (si.name, dn_si.name)]
+		self.assertEqual(len(rows), 4)
+
+		for row in rows:
+			expected = flt(get_buying_amount_from_stock_ledger(row), report.currency_precision)
+			self.assertTrue(expected)
+			self.assertEqual(row.buying_amount, expected)
+			self.assertEqual(row.gross_profit, flt(row.base_amount - expected, report.currency_precision))
+
+		dn_si.cancel()
+		dn.cancel()
+		si.cancel()
+
+def get_buying_amount_from_stock_ledger(row):
+	'''Buying amount of an invoice item row, scanning the stock ledger of the item
+	for the value its delivery took out of the warehouse, like the report used to'''
+	if row.item_code == "_Test Gross Profit Service":
+		return flt(row.qty) * flt(frappe.db.sql("""select base_rate / conversion_factor
+			from `tabPurchase Invoice Item` where item_code = %s and docstatus = 1
+			order by modified desc limit 1""", row.item_code)[0][0])
+
+	voucher_type, voucher_no, voucher_detail_no = row.parenttype, row.parent, row.item_row
+	if row.dn_detail:
+		voucher_type, voucher_no, voucher_detail_no = "Delivery Note", row.delivery_note, row.dn_detail
+
+	item_codes = [row.item_code]
+	if row.item_code == "_Test Gross Profit Bundle":
+		item_codes = ["_Test Gross Profit Item", "_Test Gross Profit Packed Item"]
+
+	buying_amount = 0.0
+	for item_code in item_codes:
+		sles = frappe.db.sql("""select voucher_type, voucher_no, voucher_detail_no, stock_value, actual_qty as qty
+			from `tabStock Ledger Entry`
+			where item_code = %s and warehouse = %s
+			order by posting_date desc, posting_time desc, creation desc""",
+			(item_code, row.warehouse), as_dict=1)
+
+		for i, sle in enumerate(sles):
+			if (sle.voucher_type, sle.voucher_no, sle.voucher_detail_no) == (voucher_type, voucher_no, voucher_detail_no):
+				previous_stock_value = flt(sles[i+1].stock_value) if len(sles) > i+1 else 0.0
+				buying_amount += (previous_stock_value - flt(sle.stock_value)) * flt(row.qty) / abs(flt(sle.qty))
+				break
+
+	return buying_amount
@@ -1,5 +1,5 @@
 from __future__ import unicode_literals
-import frappe
+import frappe, os, hashlib
 from erpnext import get_company_currency, get_default_company
 from erpnext.setup.utils import get_exchange_rate
 from erpnext.accounts.doctype.fiscal_year.fiscal_year import get_from_and_to_date
@@ -157,3 +157,33 @@ def get_invoiced_item_gross_margin(sales_invoice=None, item_code=None, company=N
 		result = sum([d.gross_profit for d in result])
 
 	return result
+
+
+def write_report_file(file_name, write_content):
+	"""
+	Write a report export to a private File piece by piece, so that it is never held in memory.
+
+	:param file_name: name of the file, made unique if a file of that name exists
+	:param write_content: function called with a `write(text)` function, to write the content
+	"""
+	base_name, extension = os.path.splitext(file_name)
+	while os.path.exists(frappe.get_site_path("private", "files", file_name)):
+		file_name = "{0}-{1}{2}".format(base_name, frappe.generate_hash(length=6), extension)
+
+	content_hash = hashlib.md5()
+	with open(frappe.get_site_path("private", "files", file_name), "wb") as f:
+		def write(text):
+			content = frappe.safe_encode(text)
+			content_hash.update(content)
+			f.write(content)
+
+		write_content(write)
+
+	return frappe.get_doc({
+		"doctype": "File",
+		"file_name": file_name,
+		"file_url": "/private/files/" + file_name,
+		"file_size": os.path.getsize(frappe.get_site_path("private", "files", file_name)),
+		"content_hash": content_hash.hexdigest(),
+		"is_private": 1
+	}).insert()
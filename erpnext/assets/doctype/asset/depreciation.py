@@ -3,10 +3,14 @@
 # For license information, please see license.txt
 
 from __future__ import unicode_literals
+import time
 import frappe
 from frappe import _
 from frappe.utils import flt, today, getdate, cint
 
+# schedule rows posted in one Journal Entry, by one background job
+DEPRECIATION_BATCH_SIZE = 500
+
 def post_depreciation_entries(date=None):
 	# Return if automatic booking of asset depreciation is disabled
 	if not cint(frappe.db.get_value("Accounts Settings", None, "book_asset_depreciation_entry_automatically")):
@@ -14,16 +18,140 @@ def post_depreciation_entries(date=None):
 
 	if not date:
 		date = today()
-	for asset in get_depreciable_assets(date):
-		make_depreciation_entry(asset, date)
-		frappe.db.commit()
 
-def get_depreciable_assets(date):
-	return frappe.db.sql_list("""select a.name
+	# due rows are posted in one Journal Entry per company, finance book and date, in batches
+	# run concurrently by the workers of the long queue. Posted rows are linked to their entry,
+	# so rows left by an interrupted run are picked up by the next one
+	queued_after = time.time() - 86400
+	batches = {}
+	for d in get_depreciable_schedules(date):
+		if not (frappe.cache().hget("depreciation_queued", d.name) or 0) > queued_after:
+			batches.setdefault((d.company, d.finance_book, d.schedule_date), []).append(d.name)
+
+	for key in sorted(batches, key=lambda d: (d[2], d[0], d[1] or "")):
+		schedules = batches[key]
+		for i in range(0, len(schedules), DEPRECIATION_BATCH_SIZE):
+			batch = schedules[i:i + DEPRECIATION_BATCH_SIZE]
+			for name in batch:
+				frappe.cache().hset("depreciation_queued", name, time.time())
+
+			frappe.enqueue("erpnext.assets.doctype.asset.depreciation.make_depreciation_entries",
+				queue="long", timeout=3600, schedules=batch, now=frappe.flags.in_test)
+
+def get_depreciable_schedules(date=None, schedules=None):
+	conditions = []
+	if date:
+		conditions.append("ds.schedule_date<=%(date)s")
+	if schedules:
+		conditions.append("ds.name in %(schedules)s")
+
+	return frappe.db.sql("""select ds.name, ds.parent as asset, ds.schedule_date, ds.depreciation_amount,
+			ds.finance_book, ds.finance_book_id, a.company, a.asset_category, a.cost_center
 		from tabAsset a, `tabDepreciation Schedule` ds
-		where a.name = ds.parent and a.docstatus=1 and ds.schedule_date<=%s
+		where a.name = ds.parent and a.docstatus=1
 			and a.status in ('Submitted', 'Partially Depreciated')
-			and ifnull(ds.journal_entry, '')=''""", date)
+			and ifnull(ds.journal_entry, '')='' {0}
+		order by ds.parent, ds.idx""".format("".join(" and " + d for d in conditions)),
+		{"date": date, "schedules": tuple(schedules or [])}, as_dict=1)
+
+def make_depreciation_entries(schedules):
+	"""Post depreciation schedule rows of the same company, finance book and date in one
+	Journal Entry, the ones posted since they were queued are left out. If the entry fails,
+	the rows are posted again asset by asset, so that only the assets at fault are left out"""
+	try:
+		depreciable_schedules = get_depreciable_schedules(schedules=schedules)
+		if not depreciable_schedules:
+			return
+
+		try:
+			make_consolidated_depreciation_entry(depreciable_schedules)
+			frappe.db.commit()
+		except Exception:
+			frappe.db.rollback()
+			frappe.log_error(frappe.get_traceback(), _("Depreciation Entry failed"))
+			make_depreciation_entries_by_asset(depreciable_schedules)
+	finally:
+		for name in schedules:
+			frappe.cache().hdel("depreciation_queued", name)
+
+def make_depreciation_entries_by_asset(schedules):
+	asset_schedules = {}
+	for d in schedules:
+		asset_schedules.setdefault(d.asset, []).append(d)
+
+	for asset, rows in asset_schedules.items():
+		try:
+			make_consolidated_depreciation_entry(rows)
+			frappe.db.commit()
+		except Exception:
+			frappe.db.rollback()
+			frappe.log_error(frappe.get_traceback(), _("Depreciation Entry failed for Asset {0}").format(asset))
+
+def make_consolidated_depreciation_entry(schedules):
+	company, finance_book, posting_date = schedules[0].company, schedules[0].finance_book, schedules[0].schedule_date
+	depreciation_cost_center, depreciation_series = frappe.get_cached_value('Company',  company,
+		["depreciation_cost_center", "series_for_depreciation_entry"])
+
+	je = frappe.new_doc("Journal Entry")
+	je.voucher_type = "Depreciation Entry"
+	je.naming_series = depreciation_series
+	je.posting_date = posting_date
+	je.company = company
+	je.finance_book = finance_book
+
+	# rows stay per asset, for the asset depreciation ledger and to unlink the schedules on cancel
+	category_accounts = {}
+	posted_schedules = []
+	for d in schedules:
+		if d.asset_category not in category_accounts:
+			try:
+				category_accounts[d.asset_category] = get_depreciation_accounts(
+					frappe._dict(asset_category=d.asset_category, company=company))
+			except frappe.ValidationError:
+				frappe.log_error(frappe.get_traceback(), _("Depreciation Entry failed"))
+				category_accounts[d.asset_category] = None
+
+		if not category_accounts[d.asset_category]:
+			continue
+
+		fixed_asset_account, accumulated_depreciation_account, depreciation_expense_account = \
+			category_accounts[d.asset_category]
+
+		je.append("accounts", {
+			"account": accumulated_depreciation_account,
+			"credit_in_account_currency": d.depreciation_amount,
+			"reference_type": "Asset",
+			"reference_name": d.asset
+		})
+
+		je.append("accounts", {
+			"account": depreciation_expense_account,
+			"debit_in_account_currency": d.depreciation_amount,
+			"reference_type": "Asset",
+			"reference_name": d.asset,
+			"cost_center": d.cost_center or depreciation_cost_center
+		})
+
+		posted_schedules.append(d)
+
+	if not posted_schedules:
+		return
+
+	je.remark = "Depreciation Entry against {0} assets worth {1}".format(len(set(d.asset for d in posted_schedules)),
+		sum(flt(d.depreciation_amount) for d in posted_schedules))
+	je.flags.ignore_permissions = True
+	je.submit()
+
+	frappe.db.sql("""update `tabDepreciation Schedule` set journal_entry=%s
+		where name in %s""", (je.name, tuple(d.name for d in posted_schedules)))
+
+	for d in posted_schedules:
+		frappe.db.sql("""update `tabAsset Finance Book`
+			set value_after_depreciation = value_after_depreciation - %s
+			where parent=%s and idx=%s""", (d.depreciation_amount, d.asset, cint(d.finance_book_id) or 1))
+
+	for asset in set(d.asset for d in posted_schedules):
+		frappe.get_doc("Asset", asset).set_status()
 
 @frappe.whitelist()
 def make_depreciation_entry(asset_name, date=None):
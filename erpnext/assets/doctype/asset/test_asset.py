@@ -10,6 +10,7 @@ from erpnext.assets.doctype.asset.depreciation import post_depreciation_entries,
 from erpnext.assets.doctype.asset.asset import make_sales_invoice, make_purchase_invoice
 from erpnext.stock.doctype.purchase_receipt.test_purchase_receipt import make_purchase_receipt
 from erpnext.stock.doctype.purchase_receipt.purchase_receipt import make_purchase_invoice as make_invoice
+from erpnext.accounts.doctype.tax_rule.tax_rule import clear_tax_rule_cache
 
 class TestAsset(unittest.TestCase):
 	def setUp(self):
@@ -17,6 +18,7 @@ class TestAsset(unittest.TestCase):
 		remove_prorated_depreciation_schedule()
 		create_asset_data()
 		frappe.db.sql("delete from `tabTax Rule`")
+		clear_tax_rule_cache()
 
 	def test_purchase_asset(self):
 		pr = make_purchase_receipt(item_code="Macbook Pro",
@@ -339,6 +341,43 @@ class TestAsset(unittest.TestCase):
 		depr_entry = asset.get("schedules")[0].journal_entry
 		self.assertFalse(depr_entry)
 
+	def test_consolidated_depreciation_entry(self):
+		assets = [make_depreciable_asset() for i in range(2)]
+
+		post_depreciation_entries(date="2021-01-01")
+
+		for asset in assets:
+			asset.load_from_db()
+		depr_entry = assets[0].get("schedules")[0].journal_entry
+		self.assertTrue(depr_entry)
+		self.assertEqual(assets[1].get("schedules")[0].journal_entry, depr_entry)
+
+		gle = frappe.db.sql("""select against_voucher, sum(debit) from `tabGL Entry`
+			where voucher_type='Journal Entry' and voucher_no=%s and against_voucher in %s
+			group by against_voucher""", (depr_entry, tuple(d.name for d in assets)))
+		self.assertEqual(len(gle), 2)
+
+		frappe.get_doc("Journal Entry", depr_entry).cancel()
+		for asset in assets:
+			asset.load_from_db()
+			self.assertFalse(asset.get("schedules")[0].journal_entry)
+
+	def test_consolidated_depreciation_entry_with_failing_asset(self):
+		assets = [make_depreciable_asset() for i in range(3)]
+
+		# a cost center of another company fails the entry of the asset
+		frappe.db.set_value("Asset", assets[1].name, "cost_center",
+			frappe.db.get_value("Cost Center", {"company": "_Test Company 1", "is_group": 0}))
+
+		post_depreciation_entries(date="2021-01-01")
+
+		for asset in assets:
+			asset.load_from_db()
+
+		self.assertTrue(assets[0].get("schedules")[0].journal_entry)
+		self.assertTrue(assets[2].get("schedules")[0].journal_entry)
+		self.assertFalse(assets[1].get("schedules")[0].journal_entry)
+
 	def test_scrap_asset(self):
 		pr = make_purchase_receipt(item_code="Macbook Pro",
 			qty=1, rate=100000.0, location="Test Location")
@@ -547,6 +586,27 @@ class TestAsset(unittest.TestCase):
 		self.assertEquals('Asset Received But Not Billed - _TC', doc.items[0].expense_account)
 
 
+def make_depreciable_asset():
+	pr = make_purchase_receipt(item_code="Macbook Pro",
+		qty=1, rate=100000.0, location="Test Location")
+
+	asset_name = frappe.db.get_value("Asset", {"purchase_receipt": pr.name}, 'name')
+	asset = frappe.get_doc('Asset', asset_name)
+	asset.calculate_depreciation = 1
+	asset.available_for_use_date = '2020-06-06'
+	asset.purchase_date = '2020-06-06'
+	asset.append("finance_books", {
+		"expected_value_after_useful_life": 10000,
+		"depreciation_method": "Straight Line",
+		"total_number_of_depreciations": 3,
+		"frequency_of_depreciation": 10,
+		"depreciation_start_date": "2020-12-31"
+	})
+	asset.insert()
+	asset.submit()
+
+	return asset
+
 def create_asset_data():
 	if not frappe.db.exists("Asset Category", "Computers"):
 		create_asset_category()
@@ -44,6 +44,36 @@ def make_demo(context, site, domain='Manufacturing', days=100,
 			from erpnext.demo import demo
 			demo.make(domain, days)
 
+@click.command('profile-report')
+@click.argument('report_name')
+@click.option('--filters', default='{}', help='filters of the report, as JSON')
+@click.option('--queries', default=10, help='number of slowest queries to show. Default 10')
+@pass_context
+def profile_report(context, report_name, filters='{}', queries=10):
+	"Run a query report and show where its time was spent, the run is saved as a Report Run Log"
+	from frappe.desk.query_report import run
+	from erpnext.utilities.doctype.report_run_log.report_run_log import ReportProfiler
+
+	site = get_site(context)
+
+	with frappe.init_site(site):
+		frappe.connect()
+		frappe.set_user('Administrator')
+
+		with ReportProfiler(report_name, filters) as profiler:
+			run(report_name, filters)
+
+		log = profiler.log
+		frappe.db.commit()
+
+		print("{0}: {1:.3f}s total, {2:.3f}s in {3} queries, {4:.3f}s in Python".format(log.name,
+			log.total_time, log.sql_time, log.query_count, log.python_time))
+
+		for d in log.queries[:queries]:
+			print("\n{0:.3f}s {1} calls {2} rows  {3}\n{4}".format(d.duration, d.calls, d.row_count,
+				d.call_site, d.query[:500]))
+
 commands = [
-	make_demo
+	make_demo,
+	profile_report
 ]
\ No newline at end of file
@@ -553,7 +553,14 @@ class BuyingController(StockController):
 
 	def validate_budget(self):
 		if self.docstatus == 1:
+			validated = set()
 			for data in self.get('items'):
+				# requested and ordered amounts are per item, account, cost center and project
+				key = (data.item_code, data.expense_account, data.cost_center, data.get('project'))
+				if key in validated:
+					continue
+
+				validated.add(key)
 				args = data.as_dict()
 				args.update({
 					'doctype': self.doctype,
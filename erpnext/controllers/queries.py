@@ -150,10 +150,24 @@ def tax_account_query(doctype, txt, searchfield, start, page_len, filters):
 	return tax_accounts
 
 def item_query(doctype, txt, searchfield, start, page_len, filters, as_dict=False):
+	from erpnext.stock.doctype.item_search_term.item_search_term import get_item_search_condition
+
 	conditions = []
 
+	index_cond = None
+	if searchfield in ("name", "item_code", "item_name", "item_group", "description"):
+		index_cond = get_item_search_condition(txt)
+
 	description_cond = ''
-	if frappe.db.count('Item', cache=True) < 50000:
+	barcode_cond = 'tabItem.item_code IN (select parent from `tabItem Barcode` where barcode LIKE %(txt)s)'
+	if index_cond:
+		# only items from the search index are matched, so description and barcodes can be
+		# checked for all of them
+		index_cond = 'and ' + index_cond
+		description_cond = 'or tabItem.description LIKE %(txt)s'
+		barcode_cond = '''exists (select name from `tabItem Barcode`
+			where parent = tabItem.name and barcode LIKE %(txt)s)'''
+	elif frappe.db.count('Item', cache=True) < 50000:
 		# scan description only if items are less than 50000
 		description_cond = 'or tabItem.description LIKE %(txt)s'
 
@@ -168,11 +182,12 @@ def item_query(doctype, txt, searchfield, start, page_len, filters, as_dict=Fals
 			and tabItem.has_variants=0
 			and tabItem.disabled=0
 			and (tabItem.end_of_life > %(today)s or ifnull(tabItem.end_of_life, '0000-00-00')='0000-00-00')
+			{index_cond}
 			and (tabItem.`{key}` LIKE %(txt)s
 				or tabItem.item_code LIKE %(txt)s
 				or tabItem.item_group LIKE %(txt)s
 				or tabItem.item_name LIKE %(txt)s
-				or tabItem.item_code IN (select parent from `tabItem Barcode` where barcode LIKE %(txt)s)
+				or {barcode_cond}
 				{description_cond})
 			{fcond} {mcond}
 		order by
@@ -184,6 +199,8 @@ def item_query(doctype, txt, searchfield, start, page_len, filters, as_dict=Fals
 			key=searchfield,
 			fcond=get_filters_cond(doctype, filters, conditions).replace('%', '%%'),
 			mcond=get_match_cond(doctype).replace('%', '%%'),
+			index_cond=index_cond or '',
+			barcode_cond=barcode_cond,
 			description_cond = description_cond),
 			{
 				"today": nowdate(),
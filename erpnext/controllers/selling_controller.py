@@ -6,7 +6,7 @@ import frappe
 from frappe.utils import cint, flt, cstr, comma_or
 from frappe import _, throw
 from erpnext.stock.get_item_details import get_bin_details
-from erpnext.stock.utils import get_incoming_rate
+from erpnext.stock.utils import get_incoming_rates
 from erpnext.stock.get_item_details import get_conversion_factor
 from erpnext.stock.doctype.item.item import set_item_default
 from frappe.contacts.doctype.address.address import get_address_display
@@ -300,7 +300,10 @@ class SellingController(StockController):
 		self.update_reserved_qty()
 
 		sl_entries = []
-		for d in self.get_item_list():
+		item_list = self.get_item_list()
+		incoming_rates = self.get_incoming_rates_for_target_warehouse(item_list)
+
+		for i, d in enumerate(item_list):
 			if frappe.get_cached_value("Item", d.item_code, "is_stock_item") == 1 and flt(d.qty):
 				if flt(d.conversion_factor)==0.0:
 					d.conversion_factor = get_conversion_factor(d.item_code, d.uom).get("conversion_factor") or 1.0
@@ -326,20 +329,8 @@ class SellingController(StockController):
 
 					if self.docstatus == 1:
 						if not cint(self.is_return):
-							args = frappe._dict({
-								"item_code": d.item_code,
-								"warehouse": d.warehouse,
-								"posting_date": self.posting_date,
-								"posting_time": self.posting_time,
-								"qty": -1*flt(d.qty),
-								"serial_no": d.serial_no,
-								"company": d.company,
-								"voucher_type": d.voucher_type,
-								"voucher_no": d.name,
-								"allow_zero_valuation": d.allow_zero_valuation
-							})
 							target_warehouse_sle.update({
-								"incoming_rate": get_incoming_rate(args)
+								"incoming_rate": incoming_rates.get(i)
 							})
 						else:
 							target_warehouse_sle.update({
@@ -355,6 +346,30 @@ class SellingController(StockController):
 						}))
 		self.make_sl_entries(sl_entries)
 
+	def get_incoming_rates_for_target_warehouse(self, item_list):
+		"""Incoming rates of the items transferred to a target warehouse on submit,
+		fetched together, by their position in the item list"""
+		if self.docstatus != 1 or cint(self.is_return):
+			return {}
+
+		rows = [(i, d) for i, d in enumerate(item_list) if d.target_warehouse and flt(d.qty)
+			and frappe.get_cached_value("Item", d.item_code, "is_stock_item") == 1]
+
+		incoming_rates = get_incoming_rates([frappe._dict({
+			"item_code": d.item_code,
+			"warehouse": d.warehouse,
+			"posting_date": self.posting_date,
+			"posting_time": self.posting_time,
+			"qty": -1*flt(d.qty),
+			"serial_no": d.serial_no,
+			"company": d.company,
+			"voucher_type": d.voucher_type,
+			"voucher_no": d.name,
+			"allow_zero_valuation": d.allow_zero_valuation
+		}) for i, d in rows])
+
+		return dict(zip([i for i, d in rows], incoming_rates))
+
 	def set_po_nos(self):
 		if self.doctype in ("Delivery Note", "Sales Invoice") and hasattr(self, "items"):
 			ref_fieldname = "against_sales_order" if self.doctype == "Delivery Note" else "sales_order"
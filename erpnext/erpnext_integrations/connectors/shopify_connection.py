@@ -28,9 +28,11 @@ def sync_sales_order(order, request_id=None):
 			validate_item(order, shopify_settings)
 			create_order(order, shopify_settings)
 		except Exception as e:
-			make_shopify_log(status="Error", message=e.message, exception=False)
+			make_shopify_log(status="Error", message=cstr(e), exception=False)
 		else:
 			make_shopify_log(status="Success")
+	else:
+		make_shopify_log(status="Success")
 
 def prepare_sales_invoice(order, request_id=None):
 	shopify_settings = frappe.get_doc("Shopify Settings")
@@ -38,8 +40,11 @@ def prepare_sales_invoice(order, request_id=None):
 
 	try:
 		sales_order = get_sales_order(cstr(order['id']))
-		if sales_order:
-			create_sales_invoice(order, shopify_settings, sales_order)
+		if not sales_order:
+			# queued again, to be retried once the order is synced
+			frappe.throw(_("Sales Order for Shopify order {0} is not synced yet").format(order['id']))
+
+		create_sales_invoice(order, shopify_settings, sales_order)
 		make_shopify_log(status="Success")
 	except Exception:
 		make_shopify_log(status="Error", exception=True)
@@ -50,8 +55,11 @@ def prepare_delivery_note(order, request_id=None):
 
 	try:
 		sales_order = get_sales_order(cstr(order['id']))
-		if sales_order:
-			create_delivery_note(order, shopify_settings, sales_order)
+		if not sales_order:
+			# queued again, to be retried once the order is synced
+			frappe.throw(_("Sales Order for Shopify order {0} is not synced yet").format(order['id']))
+
+		create_delivery_note(order, shopify_settings, sales_order)
 		make_shopify_log(status="Success")
 	except Exception:
 		make_shopify_log(status="Error", exception=True)
@@ -65,14 +73,27 @@ def get_sales_order(shopify_order_id):
 def validate_customer(order, shopify_settings):
 	customer_id = order.get("customer", {}).get("id")
 	if customer_id:
-		if not frappe.db.get_value("Customer", {"shopify_customer_id": customer_id}, "name"):
+		if not get_customer(customer_id):
 			create_customer(order.get("customer"), shopify_settings)
 
 def validate_item(order, shopify_settings):
 	for item in order.get("line_items"):
-		if item.get("product_id") and not frappe.db.get_value("Item", {"shopify_product_id": item.get("product_id")}, "name"):
+		if item.get("product_id") and not get_mapped_item("product", item.get("product_id")) \
+			and not frappe.db.get_value("Item", {"shopify_product_id": item.get("product_id")}, "name"):
 			sync_item_from_shopify(shopify_settings, item)
 
+def get_customer(shopify_customer_id):
+	# customers of a batch of orders are prefetched by sync_queued_requests
+	customer = (frappe.flags.shopify_customers or {}).get(cstr(shopify_customer_id))
+	if not customer:
+		customer = frappe.db.get_value("Customer", {"shopify_customer_id": shopify_customer_id}, "name")
+
+	return customer
+
+def get_mapped_item(id_type, shopify_id):
+	if frappe.flags.shopify_items and shopify_id:
+		return frappe.flags.shopify_items[id_type].get(cstr(shopify_id))
+
 def create_order(order, shopify_settings, company=None):
 	so = create_sales_order(order, shopify_settings, company)
 	if so:
@@ -84,7 +105,7 @@ def create_order(order, shopify_settings, company=None):
 
 def create_sales_order(shopify_order, shopify_settings, company=None):
 	product_not_exists = []
-	customer = frappe.db.get_value("Customer", {"shopify_customer_id": shopify_order.get("customer", {}).get("id")}, "name")
+	customer = get_customer(shopify_order.get("customer", {}).get("id"))
 	so = frappe.db.get_value("Sales Order", {"shopify_order_id": shopify_order.get("id")}, "name")
 
 	if not so:
@@ -94,9 +115,7 @@ def create_sales_order(shopify_order, shopify_settings, company=None):
 			message = 'Following items are exists in order but relevant record not found in Product master'
 			message += "\n" + ", ".join(product_not_exists)
 
-			make_shopify_log(status="Error", message=message, exception=True)
-
-			return ''
+			frappe.throw(message)
 
 		so = frappe.get_doc({
 			"doctype": "Sales Order",
@@ -209,9 +228,11 @@ def get_order_items(order_items, shopify_settings):
 	return items
 
 def get_item_code(shopify_item):
-	item_code = frappe.db.get_value("Item", {"shopify_variant_id": shopify_item.get("variant_id")}, "item_code")
+	item_code = get_mapped_item("variant", shopify_item.get("variant_id")) \
+		or frappe.db.get_value("Item", {"shopify_variant_id": shopify_item.get("variant_id")}, "item_code")
 	if not item_code:
-		item_code = frappe.db.get_value("Item", {"shopify_product_id": shopify_item.get("product_id")}, "item_code")
+		item_code = get_mapped_item("product", shopify_item.get("product_id")) \
+			or frappe.db.get_value("Item", {"shopify_product_id": shopify_item.get("product_id")}, "item_code")
 	if not item_code:
 		item_code = frappe.db.get_value("Item", {"item_name": shopify_item.get("title")}, "item_code")
 
@@ -3,6 +3,10 @@ from __future__ import unicode_literals
 import frappe, base64, hashlib, hmac, json
 import datetime
 from frappe import _
+from frappe.utils import cstr
+from frappe.integrations.utils import create_request_log
+
+ORDER_BATCH_SIZE = 100
 
 
 def verify_request():
@@ -32,7 +36,6 @@ def order(*args, **kwargs):
 
 
 def _order(*args, **kwargs):
-	woocommerce_settings = frappe.get_doc("Woocommerce Settings")
 	if frappe.flags.woocomm_test_order_data:
 		fd = frappe.flags.woocomm_test_order_data
 		event = "created"
@@ -46,84 +49,185 @@ def _order(*args, **kwargs):
 		return "success"
 
 	if event == "created":
-		raw_billing_data = fd.get("billing")
-		customer_woo_com_email = raw_billing_data.get("email")
+		queue_order(fd)
 
-		if frappe.get_value("Customer",{"woocommerce_email": customer_woo_com_email}):
-			# Edit
-			link_customer_and_address(raw_billing_data,1)
-		else:
-			# Create
-			link_customer_and_address(raw_billing_data,0)
 
+def queue_order(fd):
+	"""Store the order to be synced by `sync_queued_orders` and acknowledge the webhook"""
+	order_id = cstr(fd.get("id"))
+	if frappe.db.exists("Sales Order", {"woocommerce_id": order_id}):
+		return
+
+	# WooCommerce retries webhooks, so an order is queued once,
+	# as the Integration Request named after its id
+	request_name = get_integration_request_name(order_id)
+	status = frappe.db.get_value("Integration Request", request_name, "status")
 
-		items_list = fd.get("line_items")
-		for item in items_list:
+	if status == "Queued":
+		return
 
-			item_woo_com_id = item.get("product_id")
+	elif status:
+		# failed, or synced to a Sales Order that was since deleted
+		frappe.db.set_value("Integration Request", request_name, {
+			"status": "Queued",
+			"data": json.dumps(fd)
+		})
+		frappe.db.commit()
 
-			if frappe.get_value("Item",{"woocommerce_id": item_woo_com_id}):
-				#Edit
-				link_item(item,1)
-			else:
-				link_item(item,0)
+	else:
+		try:
+			create_request_log(fd, "Remote", "WooCommerce", name=request_name)
+		except frappe.DuplicateEntryError:
+			# queued by a concurrent delivery of the same webhook
+			return
 
+	# set only if not set already, so that a burst of webhooks enqueues one sync
+	if frappe.cache().set(frappe.cache().make_key("woocommerce_sync_enqueued"), 1, ex=300, nx=True):
+		frappe.enqueue("erpnext.erpnext_integrations.connectors.woocommerce_connection.sync_queued_orders",
+			queue="short", timeout=1500)
 
-		customer_name = raw_billing_data.get("first_name") + " " + raw_billing_data.get("last_name")
 
-		new_sales_order = frappe.new_doc("Sales Order")
-		new_sales_order.customer = customer_name
+def get_integration_request_name(order_id):
+	return "WooCommerce-" + order_id
 
-		created_date = fd.get("date_created").split("T")
-		new_sales_order.transaction_date = created_date[0]
 
-		new_sales_order.po_no = fd.get("id")
-		new_sales_order.woocommerce_id = fd.get("id")
-		new_sales_order.naming_series = woocommerce_settings.sales_order_series or "SO-WOO-"
+def sync_queued_orders():
+	"""Create Sales Orders for queued WooCommerce orders in batches"""
+	frappe.cache().delete_value("woocommerce_sync_enqueued")
 
-		placed_order_date = created_date[0]
-		raw_date = datetime.datetime.strptime(placed_order_date, "%Y-%m-%d")
-		raw_delivery_date = frappe.utils.add_to_date(raw_date,days = 7)
-		order_delivery_date_str = raw_delivery_date.strftime('%Y-%m-%d')
-		order_delivery_date = str(order_delivery_date_str)
+	# orders are synced by one worker at a time, the lock is taken and checked in one command
+	if not frappe.cache().set(frappe.cache().make_key("woocommerce_sync_running"), 1, ex=1500, nx=True):
+		return
 
-		new_sales_order.delivery_date = order_delivery_date
-		default_set_company = frappe.get_doc("Global Defaults")
-		company = raw_billing_data.get("company") or default_set_company.default_company
-		found_company = frappe.get_doc("Company",{"name":company})
-		company_abbr = found_company.abbr
+	try:
+		while True:
+			integration_requests = frappe.get_all("Integration Request",
+				filters={"integration_request_service": "WooCommerce", "status": "Queued"},
+				fields=["name", "data"], order_by="creation", limit_page_length=ORDER_BATCH_SIZE)
 
-		new_sales_order.company = company
+			if not integration_requests:
+				break
 
-		for item in items_list:
-			woocomm_item_id = item.get("product_id")
-			found_item = frappe.get_doc("Item",{"woocommerce_id": woocomm_item_id})
+			orders = [json.loads(d.data) for d in integration_requests]
+			prefetch_woocommerce_mappings(orders)
 
-			ordered_items_tax = item.get("total_tax")
+			for integration_request, fd in zip(integration_requests, orders):
+				try:
+					if not frappe.db.exists("Sales Order", {"woocommerce_id": cstr(fd.get("id"))}):
+						create_sales_order(fd)
+					status = "Completed"
+				except Exception:
+					frappe.db.rollback()
+					frappe.log_error(frappe.get_traceback() + "\n\n Request Data: \n" + fd.__str__(), "WooCommerce Error")
+					status = "Failed"
 
-			new_sales_order.append("items",{
-				"item_code": found_item.item_code,
-				"item_name": found_item.item_name,
-				"description": found_item.item_name,
-				"delivery_date":order_delivery_date,
-				"uom": woocommerce_settings.uom or _("Nos"),
-				"qty": item.get("quantity"),
-				"rate": item.get("price"),
-				"warehouse": woocommerce_settings.warehouse or "Stores" + " - " + company_abbr
-				})
+				frappe.db.set_value("Integration Request", integration_request.name, "status", status)
+				frappe.db.commit()
 
-			add_tax_details(new_sales_order,ordered_items_tax,"Ordered Item tax",0)
+			frappe.flags.woocommerce_customers = frappe.flags.woocommerce_items = None
+	finally:
+		frappe.cache().delete_value("woocommerce_sync_running")
 
-		# shipping_details = fd.get("shipping_lines") # used for detailed order
-		shipping_total = fd.get("shipping_total")
-		shipping_tax = fd.get("shipping_tax")
 
-		add_tax_details(new_sales_order,shipping_tax,"Shipping Tax",1)
-		add_tax_details(new_sales_order,shipping_total,"Shipping Total",1)
+def prefetch_woocommerce_mappings(orders):
+	"""Load the customers and items referred by a batch of orders in one go"""
+	emails = set(fd.get("billing", {}).get("email") for fd in orders) - {None}
+	product_ids = set(cstr(item.get("product_id")) for fd in orders for item in fd.get("line_items") or [])
 
-		new_sales_order.submit()
+	frappe.flags.woocommerce_customers = set()
+	if emails:
+		frappe.flags.woocommerce_customers = set(frappe.db.sql_list("""select woocommerce_email
+			from tabCustomer where woocommerce_email in %s""", (tuple(emails),)))
 
-		frappe.db.commit()
+	frappe.flags.woocommerce_items = {}
+	if product_ids:
+		frappe.flags.woocommerce_items = dict(frappe.db.sql("""select woocommerce_id, name
+			from tabItem where woocommerce_id in %s""", (tuple(product_ids),)))
+
+
+def create_sales_order(fd):
+	woocommerce_settings = frappe.get_doc("Woocommerce Settings")
+	customers = frappe.flags.woocommerce_customers or set()
+	items = frappe.flags.woocommerce_items or {}
+
+	raw_billing_data = fd.get("billing")
+	customer_woo_com_email = raw_billing_data.get("email")
+
+	if customer_woo_com_email in customers or frappe.get_value("Customer",{"woocommerce_email": customer_woo_com_email}):
+		# Edit
+		link_customer_and_address(raw_billing_data,1)
+	else:
+		# Create
+		link_customer_and_address(raw_billing_data,0)
+
+
+	items_list = fd.get("line_items")
+	for item in items_list:
+
+		item_woo_com_id = item.get("product_id")
+
+		if cstr(item_woo_com_id) in items or frappe.get_value("Item",{"woocommerce_id": item_woo_com_id}):
+			#Edit
+			link_item(item,1)
+		else:
+			link_item(item,0)
+
+
+	customer_name = raw_billing_data.get("first_name") + " " + raw_billing_data.get("last_name")
+
+	new_sales_order = frappe.new_doc("Sales Order")
+	new_sales_order.customer = customer_name
+
+	created_date = fd.get("date_created").split("T")
+	new_sales_order.transaction_date = created_date[0]
+
+	new_sales_order.po_no = fd.get("id")
+	new_sales_order.woocommerce_id = fd.get("id")
+	new_sales_order.naming_series = woocommerce_settings.sales_order_series or "SO-WOO-"
+
+	placed_order_date = created_date[0]
+	raw_date = datetime.datetime.strptime(placed_order_date, "%Y-%m-%d")
+	raw_delivery_date = frappe.utils.add_to_date(raw_date,days = 7)
+	order_delivery_date_str = raw_delivery_date.strftime('%Y-%m-%d')
+	order_delivery_date = str(order_delivery_date_str)
+
+	new_sales_order.delivery_date = order_delivery_date
+	default_set_company = frappe.get_doc("Global Defaults")
+	company = raw_billing_data.get("company") or default_set_company.default_company
+	found_company = frappe.get_doc("Company",{"name":company})
+	company_abbr = found_company.abbr
+
+	new_sales_order.company = company
+
+	for item in items_list:
+		woocomm_item_id = item.get("product_id")
+		found_item = frappe.get_doc("Item",{"woocommerce_id": woocomm_item_id})
+
+		ordered_items_tax = item.get("total_tax")
+
+		new_sales_order.append("items",{
+			"item_code": found_item.item_code,
+			"item_name": found_item.item_name,
+			"description": found_item.item_name,
+			"delivery_date":order_delivery_date,
+			"uom": woocommerce_settings.uom or _("Nos"),
+			"qty": item.get("quantity"),
+			"rate": item.get("price"),
+			"warehouse": woocommerce_settings.warehouse or "Stores" + " - " + company_abbr
+			})
+
+		add_tax_details(new_sales_order,ordered_items_tax,"Ordered Item tax",0)
+
+	# shipping_details = fd.get("shipping_lines") # used for detailed order
+	shipping_total = fd.get("shipping_total")
+	shipping_tax = fd.get("shipping_tax")
+
+	add_tax_details(new_sales_order,shipping_tax,"Shipping Tax",1)
+	add_tax_details(new_sales_order,shipping_total,"Shipping Total",1)
+
+	new_sales_order.submit()
+
+	frappe.db.commit()
 
 def link_customer_and_address(raw_billing_data,customer_status):
 
@@ -3,14 +3,21 @@
 # For license information, please see license.txt
 
 from __future__ import unicode_literals
-import frappe, time, dateutil, math, csv
+import frappe, time, dateutil, math, csv, json
+from datetime import datetime, timedelta
 try:
     from StringIO import StringIO
 except ImportError:
     from io import StringIO
 import erpnext.erpnext_integrations.doctype.amazon_mws_settings.amazon_mws_api as mws
+from erpnext.erpnext_integrations.doctype.amazon_mws_settings.xml_utils import object_dict
 from frappe import _
 
+# seconds a job creating a page of orders may run, before its orders are queued again
+ORDER_SYNC_TIMEOUT = 3600
+# times an order may fail to be created before the sync stops waiting for it
+MAX_ORDER_SYNC_FAILURES = 5
+
 #Get and Create Products
 def get_products_details():
 	products = get_products_instance()
@@ -205,18 +212,30 @@ def create_item_price(amazon_item_json, item_code):
 
 #Get and create Orders
 def get_orders(after_date):
+	# an hourly run must not overlap with one that is still listing orders
+	if frappe.cache().get_value("amazon_mws_order_sync_running"):
+		return
+	frappe.cache().set_value("amazon_mws_order_sync_running", 1, expires_in_sec=3600)
+
 	try:
 		orders = get_orders_instance()
 		statuses = ["PartiallyShipped", "Unshipped", "Shipped", "Canceled"]
 		mws_settings = frappe.get_doc("Amazon MWS Settings")
 		market_place_list = return_as_list(mws_settings.market_place_id)
 
+		# resume from where the last sync left off
+		last_updated_after = get_orders_synced_upto(after_date)
+
+		# MWS only accepts times at least two minutes in the past
+		sync_started_on = (datetime.utcnow() - timedelta(minutes=2)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
 		orders_response = call_mws_method(orders.list_orders, marketplaceids=market_place_list,
 			fulfillment_channels=["MFN", "AFN"],
-			lastupdatedafter=after_date,
+			lastupdatedafter=last_updated_after,
 			orderstatus=statuses,
 			max_results='50')
 
+		listed_orders = {}
 		while True:
 			orders_list = []
 
@@ -227,7 +246,9 @@ def get_orders(after_date):
 				break
 
 			for order in orders_list:
-				create_sales_order(order, after_date)
+				listed_orders[order.AmazonOrderId] = order.LastUpdateDate
+
+			enqueue_orders(orders_list)
 
 			if not "NextToken" in orders_response.parsed:
 				break
@@ -235,9 +256,130 @@ def get_orders(after_date):
 			next_token = orders_response.parsed.NextToken
 			orders_response = call_mws_method(orders.list_orders_by_next_token, next_token)
 
+		# the next sync lists orders from here, once these orders are created
+		frappe.db.set_global("amazon_mws_orders_listed", json.dumps({
+			"listed_on": sync_started_on,
+			"orders": listed_orders
+		}))
+
 	except Exception as e:
 		frappe.log_error(title="get_orders", message=e)
 
+	finally:
+		frappe.cache().delete_value("amazon_mws_order_sync_running")
+
+def get_orders_synced_upto(after_date):
+	"""Returns the time to list orders updated after: when the last listing started, or if some
+	of the orders it listed have no Sales Order yet, just before the oldest update of those orders,
+	so that they are listed and synced again"""
+	listed = json.loads(frappe.db.get_global("amazon_mws_orders_listed") or "{}")
+	if not listed:
+		return after_date
+
+	synced_upto = listed["listed_on"]
+	if listed["orders"]:
+		created_orders = set(frappe.db.sql_list("""select amazon_order_id from `tabSales Order`
+			where amazon_order_id in %s""", (tuple(listed["orders"]),)))
+
+		pending_orders = dict((order_id, last_update_date) for order_id, last_update_date
+			in listed["orders"].items() if order_id not in created_orders)
+		skip_failed_orders(pending_orders)
+
+		pending_updates = [dateutil.parser.parse(last_update_date) for last_update_date in pending_orders.values()]
+		if pending_updates:
+			synced_upto = (min(pending_updates) - timedelta(seconds=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+	return max(after_date, synced_upto)
+
+def skip_failed_orders(pending_orders):
+	"""Stop waiting for the pending orders that failed too often, so that newer orders are synced,
+	they are synced again if they are updated on Amazon"""
+	failed_orders = [order_id for order_id in pending_orders
+		if (frappe.cache().hget("amazon_mws_order_sync_failures", order_id) or 0) >= MAX_ORDER_SYNC_FAILURES]
+	if not failed_orders:
+		return
+
+	for order_id in failed_orders:
+		del pending_orders[order_id]
+		frappe.cache().hdel("amazon_mws_order_sync_failures", order_id)
+
+	frappe.log_error(title="Amazon MWS Orders Skipped",
+		message=_("Sales Orders could not be created for these Amazon orders after {0} attempts: {1}").format(
+			MAX_ORDER_SYNC_FAILURES, ", ".join(failed_orders)))
+
+def enqueue_orders(orders_list):
+	"""Enqueue a page of listed orders to be created by `sync_orders`,
+	leaving out the ones already synced or being synced"""
+	existing_orders = set(frappe.db.sql_list("""select amazon_order_id from `tabSales Order`
+		where amazon_order_id in %s""", (tuple(order.AmazonOrderId for order in orders_list),)))
+
+	# orders of a job that did not finish are queued again after its timeout
+	queued_after = time.time() - ORDER_SYNC_TIMEOUT
+	orders_list = [order for order in orders_list if order.AmazonOrderId not in existing_orders
+		and not (frappe.cache().hget("amazon_mws_queued_orders", order.AmazonOrderId) or 0) > queued_after]
+
+	if not orders_list:
+		return
+
+	for order in orders_list:
+		frappe.cache().hset("amazon_mws_queued_orders", order.AmazonOrderId, time.time())
+
+	# the listed orders are passed on as they are, instead of fetching them again with GetOrder,
+	# and pages are processed concurrently by the workers of the long queue
+	frappe.enqueue("erpnext.erpnext_integrations.doctype.amazon_mws_settings.amazon_methods.sync_orders",
+		queue="long", timeout=ORDER_SYNC_TIMEOUT, orders=json.loads(json.dumps(orders_list)),
+		now=frappe.flags.in_test)
+
+def sync_orders(orders):
+	"""Create the Sales Orders of a page of orders, as returned by ListOrders"""
+	orders_list = [get_object_dict(order) for order in orders]
+
+	try:
+		prefetch_customers(orders_list)
+
+		for order in orders_list:
+			try:
+				create_sales_order(order, None)
+				frappe.db.commit()
+			except Exception as e:
+				frappe.db.rollback()
+				frappe.log_error(message=e, title="Create Sales Order")
+
+				failures = frappe.cache().hget("amazon_mws_order_sync_failures", order.AmazonOrderId) or 0
+				frappe.cache().hset("amazon_mws_order_sync_failures", order.AmazonOrderId, failures + 1)
+
+	finally:
+		for order in orders_list:
+			frappe.cache().hdel("amazon_mws_queued_orders", order.AmazonOrderId)
+
+		frappe.flags.amazon_mws_customers = frappe.flags.amazon_mws_item_codes = None
+
+def get_object_dict(value):
+	"""Restore the object view of an MWS response passed to a job as plain dicts"""
+	if isinstance(value, dict):
+		return object_dict(dict((key, get_object_dict(d)) for key, d in value.items()))
+	elif isinstance(value, list):
+		return [get_object_dict(d) for d in value]
+
+	return value
+
+def prefetch_customers(orders_list):
+	"""Load the customers of a page of orders, and whether they have a contact, in one go"""
+	customer_names = [get_customer_name(order) for order in orders_list]
+
+	frappe.flags.amazon_mws_customers = {}
+	if not customer_names:
+		return
+
+	for name in frappe.db.sql_list("select name from tabCustomer where name in %s", (tuple(customer_names),)):
+		frappe.flags.amazon_mws_customers[name] = False
+
+	if frappe.flags.amazon_mws_customers:
+		for name in frappe.db.sql_list("""select link_name from `tabDynamic Link`
+			where link_doctype = 'Customer' and parenttype = 'Contact' and link_name in %s""",
+			(tuple(frappe.flags.amazon_mws_customers),)):
+			frappe.flags.amazon_mws_customers[name] = True
+
 def get_orders_instance():
 	mws_settings = frappe.get_doc("Amazon MWS Settings")
 	orders = mws.Orders(
@@ -252,20 +394,20 @@ def get_orders_instance():
 	return orders
 
 def create_sales_order(order_json,after_date):
-	customer_name = create_customer(order_json)
-	create_address(order_json, customer_name)
-
 	market_place_order_id = order_json.AmazonOrderId
 
 	so = frappe.db.get_value("Sales Order",
 			filters={"amazon_order_id": market_place_order_id},
 			fieldname="name")
 
-	taxes_and_charges = frappe.db.get_value("Amazon MWS Settings", "Amazon MWS Settings", "taxes_charges")
-
 	if so:
 		return
 
+	customer_name = create_customer(order_json)
+	create_address(order_json, customer_name)
+
+	taxes_and_charges = frappe.db.get_value("Amazon MWS Settings", "Amazon MWS Settings", "taxes_charges")
+
 	if not so:
 		items = get_order_items(market_place_order_id)
 		delivery_date = dateutil.parser.parse(order_json.LatestShipDate).strftime("%Y-%m-%d")
@@ -298,25 +440,35 @@ def create_sales_order(order_json,after_date):
 		except Exception as e:
 			frappe.log_error(message=e, title="Create Sales Order")
 
-def create_customer(order_json):
-	order_customer_name = ""
-
+def get_customer_name(order_json):
 	if not("BuyerName" in order_json):
-		order_customer_name = "Buyer - " + order_json.AmazonOrderId
+		return "Buyer - " + order_json.AmazonOrderId
 	else:
-		order_customer_name = order_json.BuyerName
+		return order_json.BuyerName
+
+def create_customer(order_json):
+	order_customer_name = get_customer_name(order_json)
 
-	existing_customer_name = frappe.db.get_value("Customer",
-			filters={"name": order_customer_name}, fieldname="name")
+	# customers of a page of orders are prefetched by sync_orders
+	prefetched_customers = frappe.flags.amazon_mws_customers or {}
+
+	if order_customer_name in prefetched_customers:
+		existing_customer_name = order_customer_name
+	else:
+		existing_customer_name = frappe.db.get_value("Customer",
+				filters={"name": order_customer_name}, fieldname="name")
 
 	if existing_customer_name:
-		filters = [
-				["Dynamic Link", "link_doctype", "=", "Customer"],
-				["Dynamic Link", "link_name", "=", existing_customer_name],
-				["Dynamic Link", "parenttype", "=", "Contact"]
-			]
+		if prefetched_customers.get(existing_customer_name):
+			existing_contacts = True
+		else:
+			filters = [
+					["Dynamic Link", "link_doctype", "=", "Customer"],
+					["Dynamic Link", "link_name", "=", existing_customer_name],
+					["Dynamic Link", "parenttype", "=", "Contact"]
+				]
 
-		existing_contacts = frappe.get_list("Contact", filters)
+			existing_contacts = frappe.get_list("Contact", filters)
 
 		if existing_contacts:
 			pass
@@ -435,9 +587,15 @@ def get_order_items(market_place_order_id):
 
 def get_item_code(order_item):
 	sku = order_item.SellerSKU
-	item_code = frappe.db.get_value("Item", {"item_code": sku}, "item_code")
-	if item_code:
-		return item_code
+
+	# the same SKUs recur across the orders of a page
+	if frappe.flags.amazon_mws_item_codes is None:
+		frappe.flags.amazon_mws_item_codes = {}
+
+	if sku not in frappe.flags.amazon_mws_item_codes:
+		frappe.flags.amazon_mws_item_codes[sku] = frappe.db.get_value("Item", {"item_code": sku}, "item_code")
+
+	return frappe.flags.amazon_mws_item_codes[sku]
 
 def get_charges_and_fees(market_place_order_id):
 	finances = get_finances_instance()
@@ -3,7 +3,128 @@
 # See license.txt
 from __future__ import unicode_literals
 
+import frappe
 import unittest
+from erpnext.erpnext_integrations.doctype.amazon_mws_settings import amazon_methods
+from erpnext.erpnext_integrations.doctype.amazon_mws_settings.amazon_mws_settings import setup_custom_fields
 
 class TestAmazonMWSSettings(unittest.TestCase):
-	pass
+	def setUp(self):
+		setup_custom_fields()
+
+		settings = {
+			"company": "_Test Company",
+			"warehouse": "_Test Warehouse - _TC",
+			"customer_group": "_Test Customer Group",
+			"territory": "_Test Territory",
+			"customer_type": "Individual",
+			"taxes_charges": 0,
+			"max_retry_limit": 1
+		}
+		for fieldname, value in settings.items():
+			frappe.db.set_value("Amazon MWS Settings", None, fieldname, value)
+
+		frappe.db.set_global("amazon_mws_orders_listed", None)
+		frappe.cache().delete_value("amazon_mws_queued_orders")
+		frappe.cache().delete_value("amazon_mws_order_sync_failures")
+
+		self.responder = FakeMWSOrders()
+		self.get_orders_instance = amazon_methods.get_orders_instance
+		amazon_methods.get_orders_instance = lambda: self.responder
+
+	def tearDown(self):
+		amazon_methods.get_orders_instance = self.get_orders_instance
+		frappe.db.set_global("amazon_mws_orders_listed", None)
+
+	def test_order_sync(self):
+		created_order = self.responder.add_order("2018-11-02T10:00:00Z", "_Test Item")
+		failing_order = self.responder.add_order("2018-11-01T10:00:00Z", "_Test Non Existent Item")
+
+		amazon_methods.get_orders("2018-10-01")
+
+		self.assertTrue(get_sales_order(created_order))
+		self.assertFalse(get_sales_order(failing_order))
+
+		# the listed orders are created as listed, without fetching them again
+		self.assertFalse([call for call in self.responder.calls if call[0] == "get_order"])
+
+		# the next sync lists the order that failed again
+		self.responder.orders[failing_order]["items"] = [get_order_item("_Test Item")]
+		amazon_methods.get_orders("2018-10-01")
+
+		self.assertEqual(self.responder.get_last_updated_after(), "2018-11-01T09:59:59Z")
+		self.assertTrue(get_sales_order(failing_order))
+
+		# and once all the listed orders are created, the sync moves past them
+		amazon_methods.get_orders("2018-10-01")
+		self.assertTrue(self.responder.get_last_updated_after() > "2018-11-02T10:00:00Z")
+
+	def test_failing_order_sync(self):
+		failing_order = self.responder.add_order("2018-11-01T10:00:00Z", "_Test Non Existent Item")
+
+		# the sync waits for an order that fails, until it failed too often
+		for i in range(amazon_methods.MAX_ORDER_SYNC_FAILURES):
+			amazon_methods.get_orders("2018-10-01")
+			self.assertTrue(self.responder.get_last_updated_after() < "2018-11-01T10:00:00Z")
+
+		amazon_methods.get_orders("2018-10-01")
+		self.assertTrue(self.responder.get_last_updated_after() > "2018-11-01T10:00:00Z")
+		self.assertFalse(get_sales_order(failing_order))
+
+def get_sales_order(amazon_order_id):
+	return frappe.db.get_value("Sales Order", {"amazon_order_id": amazon_order_id, "docstatus": 1})
+
+def get_order_item(sku):
+	return {
+		"SellerSKU": {"value": sku},
+		"Title": {"value": sku},
+		"QuantityOrdered": {"value": "1"},
+		"ItemPrice": {"Amount": {"value": "100"}}
+	}
+
+class FakeMWSOrders(object):
+	"""Answers the Orders API calls of a sync from local orders, the way `mws.Orders` parses them"""
+	def __init__(self):
+		self.orders = {}
+		self.calls = []
+
+	def add_order(self, last_update_date, sku):
+		amazon_order_id = "_T-" + frappe.generate_hash(length=10)
+		self.orders[amazon_order_id] = {
+			"order": {
+				"AmazonOrderId": {"value": amazon_order_id},
+				"MarketplaceId": {"value": "_Test Marketplace"},
+				"PurchaseDate": {"value": "2018-11-01T09:00:00Z"},
+				"LatestShipDate": {"value": "2018-11-05T09:00:00Z"},
+				"LastUpdateDate": {"value": last_update_date}
+			},
+			"items": [get_order_item(sku)]
+		}
+
+		return amazon_order_id
+
+	def list_orders(self, **kwargs):
+		self.calls.append(("list_orders", kwargs))
+
+		orders = [d["order"] for d in self.orders.values()
+			if d["order"]["LastUpdateDate"]["value"] > kwargs["lastupdatedafter"]]
+
+		return get_response({"Orders": {"Order": orders} if orders else {}})
+
+	def list_orders_by_next_token(self, next_token):
+		self.calls.append(("list_orders_by_next_token", next_token))
+		return get_response({"Orders": {}})
+
+	def list_order_items(self, amazon_order_id):
+		self.calls.append(("list_order_items", amazon_order_id))
+		return get_response({"OrderItems": {"OrderItem": self.orders[amazon_order_id]["items"]}})
+
+	def get_last_updated_after(self):
+		return [call[1] for call in self.calls if call[0] == "list_orders"][-1]["lastupdatedafter"]
+
+	def get_order(self, amazon_order_ids):
+		self.calls.append(("get_order", amazon_order_ids))
+		return get_response({"Orders": {"Order": [self.orders[d]["order"] for d in amazon_order_ids]}})
+
+def get_response(parsed):
+	return frappe._dict(parsed=amazon_methods.get_object_dict(parsed))
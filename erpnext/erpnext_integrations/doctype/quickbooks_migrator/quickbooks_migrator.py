@@ -9,6 +9,9 @@ from frappe.model.document import Document
 from requests_oauthlib import OAuth2Session
 import json, requests
 from erpnext import encode_company_abbr
+from erpnext.accounts.general_ledger import start_bulk_voucher_import, stop_bulk_voucher_import
+
+ENTRY_CHUNK_SIZE = 100
 
 # QuickBooks requires a redirect URL, User will be redirect to this URL
 # This will be a GET request
@@ -314,9 +317,16 @@ class QuickBooksMigrator(Document):
 			"Inventory Qty Adjust": self._save_inventory_qty_adjust,
 		}
 		total = len(entries)
+		start_bulk_voucher_import()
 		for index, entry in enumerate(entries, start=1):
-			self._publish({"event": "progress", "message": _("Saving {0}").format(entity), "count": index, "total": total})
+			# an entry that fails is rolled back to here by _log_error, so it is not committed half saved
+			frappe.db.sql("savepoint quickbooks_entry")
 			entity_method_map[entity](entry)
+			if index % ENTRY_CHUNK_SIZE == 0 or index == total:
+				# commit the chunk, entries already saved are skipped by their quickbooks_id on a rerun
+				frappe.db.commit()
+				self._publish({"event": "progress", "message": _("Saving {0}").format(entity), "count": index, "total": total})
+		stop_bulk_voucher_import()
 		frappe.db.commit()
 
 
@@ -647,8 +657,8 @@ class QuickBooksMigrator(Document):
 					invoice_dict["discount_amount"] = discount["Amount"]
 
 				invoice_doc = frappe.get_doc(invoice_dict)
+				invoice_doc.docstatus = 1
 				invoice_doc.insert()
-				invoice_doc.submit()
 		except Exception as e:
 			self._log_error(e, [invoice, invoice_dict, json.loads(invoice_doc.as_json())])
 
@@ -801,8 +811,8 @@ class QuickBooksMigrator(Document):
 					"accounts": accounts,
 					"multi_currency": 1,
 				})
+				je.docstatus = 1
 				je.insert()
-				je.submit()
 		except Exception as e:
 			self._log_error(e, [accounts, json.loads(je.as_json())])
 
@@ -845,8 +855,8 @@ class QuickBooksMigrator(Document):
 					"company": self.company,
 				}
 				invoice_doc = frappe.get_doc(invoice_dict)
+				invoice_doc.docstatus = 1
 				invoice_doc.insert()
-				invoice_doc.submit()
 		except Exception as e:
 			self._log_error(e, [invoice, invoice_dict, json.loads(invoice_doc.as_json())])
 
@@ -1254,6 +1264,8 @@ class QuickBooksMigrator(Document):
 	def _log_error(self, execption, data=""):
 		import json, traceback
 		traceback.print_exc()
+		if frappe.flags.in_bulk_voucher_import:
+			frappe.db.sql("rollback to savepoint quickbooks_entry")
 		frappe.log_error(title="QuickBooks Migration Error",
 			message="\n".join([
 				"Data",
@@ -6,8 +6,14 @@ from __future__ import unicode_literals
 import frappe
 import json
 from frappe.model.document import Document
+from frappe.utils import cstr, now_datetime, add_to_date
 from erpnext.erpnext_integrations.utils import get_webhook_address
 
+SYNC_BATCH_SIZE = 100
+MAX_RETRIES = 3
+# minutes to wait before a failed request is retried
+RETRY_INTERVAL = 5
+
 class ShopifyLog(Document):
 	pass
 
@@ -17,15 +23,21 @@ def make_shopify_log(status="Queued", message=None, exception=False):
 	if not frappe.flags.request_id:
 		return
 
-	log = frappe.get_doc("Shopify Log", frappe.flags.request_id)
-
 	if exception:
 		frappe.db.rollback()
-		log = frappe.get_doc({"doctype":"Shopify Log"}).insert(ignore_permissions=True)
+
+	log = frappe.get_doc("Shopify Log", frappe.flags.request_id)
 
 	log.message = message if message else ''
 	log.traceback = frappe.get_traceback()
 	log.status = status
+
+	if status == "Error" and log.order_id:
+		# failed requests are queued again until they run out of retries
+		log.retry_count += 1
+		if log.retry_count < MAX_RETRIES:
+			log.status = "Queued"
+
 	log.save(ignore_permissions=True)
 	frappe.db.commit()
 
@@ -36,18 +48,129 @@ def dump_request_data(data, event="create/order"):
 		"orders/fulfilled": get_webhook_address(connector_name='shopify_connection', method="prepare_delivery_note", exclude_uri=True)
 	}
 
-	log = frappe.get_doc({
-		"doctype": "Shopify Log",
-		"request_data": json.dumps(data, indent=1),
-		"method": event_mapper[event]
-	}).insert(ignore_permissions=True)
+	method = event_mapper[event]
+	order_id = cstr(data.get("id"))
+
+	# Shopify retries webhooks, so a request is logged once per order and event
+	queued_log = frappe.db.get_value("Shopify Log",
+		{"order_id": order_id, "method": method, "status": "Queued"})
+
+	if queued_log:
+		# only the latest state of the order needs to be synced
+		frappe.db.set_value("Shopify Log", queued_log, "request_data", json.dumps(data, indent=1))
+
+	elif event == "orders/fulfilled" or not frappe.db.exists("Shopify Log",
+		{"order_id": order_id, "method": method, "status": ["in", ["Processing", "Success"]]}):
+		# every fulfillment of an order is synced
+		frappe.get_doc({
+			"doctype": "Shopify Log",
+			"order_id": order_id,
+			"request_data": json.dumps(data, indent=1),
+			"method": method
+		}).insert(ignore_permissions=True)
 
 	frappe.db.commit()
-	frappe.enqueue(method=event_mapper[event], queue='short', timeout=300, is_async=True, 
-		**{"order": data, "request_id": log.name})
+	enqueue_sync_queued_requests()
+
+def enqueue_sync_queued_requests():
+	if frappe.cache().get_value("shopify_sync_enqueued"):
+		return
+
+	frappe.cache().set_value("shopify_sync_enqueued", 1, expires_in_sec=300)
+	frappe.enqueue("erpnext.erpnext_integrations.doctype.shopify_log.shopify_log.sync_queued_requests",
+		queue='short', timeout=1500)
+
+def sync_queued_requests():
+	'''Process queued Shopify requests in batches.
+
+	Requests are claimed before they are processed, so that more than one
+	worker can drain the queue at a time.'''
+	frappe.cache().delete_value("shopify_sync_enqueued")
+	requeue_stale_requests()
+
+	while True:
+		logs = claim_queued_requests()
+		if not logs:
+			break
+
+		orders = [json.loads(log.request_data) for log in logs]
+		prefetch_shopify_mappings(orders)
+
+		for log, order in zip(logs, orders):
+			frappe.get_attr(log.method)(order=order, request_id=log.name)
+
+		frappe.flags.shopify_customers = frappe.flags.shopify_items = None
+
+def claim_queued_requests():
+	retry_after = add_to_date(now_datetime(), minutes=-RETRY_INTERVAL)
+
+	# the requests of an order are processed in the order they came in, so a request
+	# waits while an earlier one of its order is being processed or waiting for a retry
+	logs = frappe.db.sql("""
+		select log.name, log.method, log.request_data
+		from `tabShopify Log` log
+		where log.status = 'Queued' and ifnull(log.order_id, '') != ''
+			and (log.retry_count = 0 or log.modified < %(retry_after)s)
+			and not exists(select earlier.name from `tabShopify Log` earlier
+				where earlier.order_id = log.order_id and earlier.creation < log.creation
+					and (earlier.status = 'Processing' or (earlier.status = 'Queued'
+						and earlier.retry_count > 0 and earlier.modified >= %(retry_after)s)))
+		order by log.creation
+		limit %(batch_size)s
+		for update""", {"retry_after": retry_after, "batch_size": SYNC_BATCH_SIZE}, as_dict=1)
+
+	if logs:
+		frappe.db.sql("""update `tabShopify Log` set status = 'Processing', modified = %s
+			where name in ({0})""".format(", ".join(["%s"] * len(logs))),
+			[now_datetime()] + [log.name for log in logs])
+	frappe.db.commit()
+
+	return logs
+
+def requeue_stale_requests():
+	'''Queue again requests left in Processing by a worker that died'''
+	frappe.db.sql("""update `tabShopify Log` set status = 'Queued'
+		where status = 'Processing' and modified < %s""", add_to_date(now_datetime(), hours=-1))
+	frappe.db.commit()
+
+def prefetch_shopify_mappings(orders):
+	'''Load the customers and items referred by a batch of orders in one go'''
+	customer_ids, product_ids, variant_ids = set(), set(), set()
+	for order in orders:
+		if order.get("customer", {}).get("id"):
+			customer_ids.add(cstr(order["customer"]["id"]))
+
+		for item in order.get("line_items") or []:
+			if item.get("product_id"):
+				product_ids.add(cstr(item["product_id"]))
+			if item.get("variant_id"):
+				variant_ids.add(cstr(item["variant_id"]))
+
+	frappe.flags.shopify_customers = {}
+	if customer_ids:
+		frappe.flags.shopify_customers = dict(frappe.db.sql("""select shopify_customer_id, name
+			from tabCustomer where shopify_customer_id in %s""", (tuple(customer_ids),)))
+
+	frappe.flags.shopify_items = {"product": {}, "variant": {}}
+	if product_ids or variant_ids:
+		for d in frappe.db.sql("""select item_code, shopify_product_id, shopify_variant_id
+			from tabItem where shopify_product_id in %s or shopify_variant_id in %s""",
+			(tuple(product_ids) or ("",), tuple(variant_ids) or ("",)), as_dict=1):
+			if d.shopify_product_id:
+				frappe.flags.shopify_items["product"].setdefault(d.shopify_product_id, d.item_code)
+			if d.shopify_variant_id:
+				frappe.flags.shopify_items["variant"].setdefault(d.shopify_variant_id, d.item_code)
 
 @frappe.whitelist()
 def resync(method, name, request_data):
-	frappe.db.set_value("Shopify Log", name, "status", "Queued", update_modified=False)
-	frappe.enqueue(method=method, queue='short', timeout=300, is_async=True, 
-		**{"order": json.loads(request_data), "request_id": name})
+	frappe.db.set_value("Shopify Log", name, {
+		"status": "Queued",
+		"retry_count": 0
+	}, update_modified=False)
+
+	if frappe.db.get_value("Shopify Log", name, "order_id"):
+		frappe.db.commit()
+		enqueue_sync_queued_requests()
+	else:
+		frappe.enqueue(method=method, queue='short', timeout=300, is_async=True,
+			**{"order": json.loads(request_data), "request_id": name})
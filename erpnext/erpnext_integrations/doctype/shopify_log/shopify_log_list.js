@@ -7,6 +7,8 @@ frappe.listview_settings['Shopify Log'] = {
 			return [__("Error"), "red", "status,=,Error"];
         } else if(doc.status ==="Queued"){
 			return [__("Queued"), "orange", "status,=,Queued"];
+        } else if(doc.status ==="Processing"){
+			return [__("Processing"), "blue", "status,=,Processing"];
         }
 	}
 }
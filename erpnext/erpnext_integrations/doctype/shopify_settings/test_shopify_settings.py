@@ -9,6 +9,8 @@ from frappe.utils import cstr
 from erpnext.erpnext_integrations.connectors.shopify_connection import create_order
 from erpnext.erpnext_integrations.doctype.shopify_settings.sync_product import make_item
 from erpnext.erpnext_integrations.doctype.shopify_settings.sync_customer import create_customer
+from erpnext.erpnext_integrations.doctype.shopify_log.shopify_log import (dump_request_data,
+	prefetch_shopify_mappings, claim_queued_requests)
 from frappe.core.doctype.data_import.data_import import import_doc
 
 
@@ -95,3 +97,33 @@ class ShopifySettings(unittest.TestCase):
 			where shopify_order_id = %s""", sales_order.shopify_order_id)[0][0]
 
 		self.assertEqual(delivery_note_count, len(shopify_order.get("order").get("fulfillments")))
+
+	def test_webhook_queue(self):
+		with open (os.path.join(os.path.dirname(__file__), "test_data", "shopify_customer.json")) as shopify_customer:
+			shopify_customer = json.load(shopify_customer).get("customer")
+		if not frappe.db.exists("Customer", {"shopify_customer_id": shopify_customer.get("id")}):
+			create_customer(shopify_customer, self.shopify_settings)
+
+		with open (os.path.join(os.path.dirname(__file__), "test_data", "shopify_order.json")) as shopify_order:
+			shopify_order = json.load(shopify_order).get("order")
+		order_id = cstr(shopify_order.get("id"))
+		frappe.db.sql("delete from `tabShopify Log` where order_id = %s", order_id)
+
+		# repeated webhooks for the same order and event are queued once
+		dump_request_data(shopify_order, "orders/create")
+		dump_request_data(shopify_order, "orders/create")
+		self.assertEqual(frappe.db.count("Shopify Log", {"order_id": order_id, "status": "Queued"}), 1)
+
+		# a payment waits while the order is being created by another worker
+		frappe.db.set_value("Shopify Log", {"order_id": order_id}, "status", "Processing")
+		dump_request_data(shopify_order, "orders/paid")
+		payment_log = frappe.db.get_value("Shopify Log", {"order_id": order_id, "status": "Queued"})
+
+		self.assertNotIn(payment_log, [log.name for log in claim_queued_requests()])
+		self.assertEqual(frappe.db.get_value("Shopify Log", payment_log, "status"), "Queued")
+		frappe.db.sql("delete from `tabShopify Log` where order_id = %s", order_id)
+
+		prefetch_shopify_mappings([shopify_order])
+		self.assertEqual(frappe.flags.shopify_customers.get(cstr(shopify_customer.get("id"))),
+			frappe.db.get_value("Customer", {"shopify_customer_id": shopify_customer.get("id")}))
+		frappe.flags.shopify_customers = frappe.flags.shopify_items = None
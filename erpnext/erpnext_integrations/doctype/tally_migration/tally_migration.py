@@ -4,20 +4,23 @@
 
 from __future__ import unicode_literals
 
+import codecs
 from decimal import Decimal
 import json
 import re
 import traceback
 import zipfile
+from xml.etree import ElementTree
 import frappe
 from frappe import _
 from frappe.custom.doctype.custom_field.custom_field import create_custom_field
 from frappe.model.document import Document
 from frappe.model.naming import getseries, revert_series_if_last
-from frappe.utils.data import format_datetime
+from frappe.utils.data import cint, format_datetime
 from bs4 import BeautifulSoup as bs
 from erpnext import encode_company_abbr
 from erpnext.accounts.doctype.account.chart_of_accounts.chart_of_accounts import create_charts
+from erpnext.accounts.general_ledger import start_bulk_voucher_import, stop_bulk_voucher_import
 
 PRIMARY_ACCOUNT = "Primary"
 VOUCHER_CHUNK_SIZE = 500
@@ -32,12 +35,6 @@ class TallyMigration(Document):
 		def sanitize(string):
 			return re.sub("&#4;", "", string)
 
-		def emptify(string):
-			string = re.sub(r"<\w+/>", "", string)
-			string = re.sub(r"<([\w.]+)>\s*<\/\1>", "", string)
-			string = re.sub(r"\r\n", "", string)
-			return string
-
 		master_file = frappe.get_doc("File", {"file_url": data_file})
 
 		with zipfile.ZipFile(master_file.get_full_path()) as zf:
@@ -51,16 +48,56 @@ class TallyMigration(Document):
 		collection = master.BODY.IMPORTDATA.REQUESTDATA
 		return collection
 
+	def iterate_elements(self, data_file, tag):
+		"""Yield `tag` elements of the zipped Tally export one at a time.
+
+		The file is parsed incrementally and every element outside of the one
+		being yielded is discarded, so memory stays bounded by the size of a
+		single element rather than of the whole export."""
+		data = frappe.get_doc("File", {"file_url": data_file})
+
+		with zipfile.ZipFile(data.get_full_path()) as zf:
+			stream = TallyXMLStream(zf.open(zf.namelist()[0]))
+			parser = ElementTree.XMLParser(encoding="utf-8")
+
+			parents = []
+			open_tags = 0
+			for event, element in ElementTree.iterparse(stream, events=("start", "end"), parser=parser):
+				if event == "start":
+					parents.append(element)
+					if element.tag == tag:
+						open_tags += 1
+					continue
+
+				parents.pop()
+				if element.tag == tag:
+					open_tags -= 1
+					yield element
+				elif open_tags:
+					# still building the element to be yielded
+					continue
+
+				element.clear()
+				if parents:
+					parents[-1].remove(element)
+
 	def dump_processed_data(self, data):
 		for key, value in data.items():
-			f = frappe.get_doc({
-				"doctype": "File",
-				"file_name":  key + ".json",
-				"attached_to_doctype": self.doctype,
-				"attached_to_name": self.name,
-				"content": json.dumps(value)
-			}).insert()
-			setattr(self, key, f.file_url)
+			setattr(self, key, self.dump_file(key + ".json", value))
+
+	def dump_file(self, file_name, value):
+		f = frappe.get_doc({
+			"doctype": "File",
+			"file_name": file_name,
+			"attached_to_doctype": self.doctype,
+			"attached_to_name": self.name,
+			"content": json.dumps(value)
+		}).insert()
+		return f.file_url
+
+	def load_file(self, file_url):
+		f = frappe.get_doc("File", {"file_url": file_url})
+		return json.loads(f.get_content())
 
 	def _process_master_data(self):
 		def get_company_name(collection):
@@ -285,35 +322,46 @@ class TallyMigration(Document):
 		self.save()
 
 	def _process_day_book_data(self):
-		def get_vouchers(collection):
-			vouchers = []
-			for voucher in collection.find_all("VOUCHER"):
-				if voucher.ISCANCELLED.string == "Yes":
-					continue
-				inventory_entries = voucher.find_all("INVENTORYENTRIES.LIST") + voucher.find_all("ALLINVENTORYENTRIES.LIST") + voucher.find_all("INVENTORYENTRIESIN.LIST") + voucher.find_all("INVENTORYENTRIESOUT.LIST")
-				if voucher.VOUCHERTYPENAME.string not in ["Journal", "Receipt", "Payment", "Contra"] and inventory_entries:
-					function = voucher_to_invoice
-				else:
-					function = voucher_to_journal_entry
-				try:
-					vouchers.append(function(voucher))
-				except:
-					self.log(voucher)
-			return vouchers
+		def get_text(element, tag):
+			child = find(element, tag)
+			return child.text if child is not None else None
+
+		def find(element, tag):
+			return next(element.iter(tag), None)
+
+		def find_all(element, *tags):
+			return [child for tag in tags for child in element.iter(tag)]
+
+		def get_inventory_entries(voucher):
+			return find_all(voucher, "INVENTORYENTRIES.LIST", "ALLINVENTORYENTRIES.LIST",
+				"INVENTORYENTRIESIN.LIST", "INVENTORYENTRIESOUT.LIST")
+
+		def process_voucher(voucher):
+			if get_text(voucher, "ISCANCELLED") == "Yes":
+				return
+			if get_text(voucher, "VOUCHERTYPENAME") not in ["Journal", "Receipt", "Payment", "Contra"] and get_inventory_entries(voucher):
+				function = voucher_to_invoice
+			else:
+				function = voucher_to_journal_entry
+			try:
+				return function(voucher)
+			except:
+				self.log(frappe.safe_decode(ElementTree.tostring(voucher)))
 
 		def voucher_to_journal_entry(voucher):
 			accounts = []
-			ledger_entries = voucher.find_all("ALLLEDGERENTRIES.LIST") + voucher.find_all("LEDGERENTRIES.LIST")
+			ledger_entries = find_all(voucher, "ALLLEDGERENTRIES.LIST", "LEDGERENTRIES.LIST")
 			for entry in ledger_entries:
-				account = {"account": encode_company_abbr(entry.LEDGERNAME.string, self.erpnext_company), "cost_center": self.default_cost_center}
-				if entry.ISPARTYLEDGER.string == "Yes":
-					party_details = get_party(entry.LEDGERNAME.string)
+				ledger_name = get_text(entry, "LEDGERNAME")
+				account = {"account": encode_company_abbr(ledger_name, self.erpnext_company), "cost_center": self.default_cost_center}
+				if get_text(entry, "ISPARTYLEDGER") == "Yes":
+					party_details = get_party(ledger_name)
 					if party_details:
 						party_type, party_account = party_details
 						account["party_type"] = party_type
 						account["account"] = party_account
-						account["party"] = entry.LEDGERNAME.string
-				amount = Decimal(entry.AMOUNT.string)
+						account["party"] = ledger_name
+				amount = Decimal(get_text(entry, "AMOUNT"))
 				if amount > 0:
 					account["credit_in_account_currency"] = str(abs(amount))
 				else:
@@ -322,21 +370,22 @@ class TallyMigration(Document):
 
 			journal_entry = {
 				"doctype": "Journal Entry",
-				"tally_guid": voucher.GUID.string,
-				"posting_date": voucher.DATE.string,
+				"tally_guid": get_text(voucher, "GUID"),
+				"posting_date": get_text(voucher, "DATE"),
 				"company": self.erpnext_company,
 				"accounts": accounts,
 			}
 			return journal_entry
 
 		def voucher_to_invoice(voucher):
-			if voucher.VOUCHERTYPENAME.string in ["Sales", "Credit Note"]:
+			voucher_type = get_text(voucher, "VOUCHERTYPENAME")
+			if voucher_type in ["Sales", "Credit Note"]:
 				doctype = "Sales Invoice"
 				party_field = "customer"
 				account_field = "debit_to"
 				account_name = encode_company_abbr(self.tally_debtors_account, self.erpnext_company)
 				price_list_field = "selling_price_list"
-			elif voucher.VOUCHERTYPENAME.string in ["Purchase", "Debit Note"]:
+			elif voucher_type in ["Purchase", "Debit Note"]:
 				doctype = "Purchase Invoice"
 				party_field = "supplier"
 				account_field = "credit_to"
@@ -345,10 +394,10 @@ class TallyMigration(Document):
 
 			invoice = {
 				"doctype": doctype,
-				party_field: voucher.PARTYNAME.string,
-				"tally_guid": voucher.GUID.string,
-				"posting_date": voucher.DATE.string,
-				"due_date": voucher.DATE.string,
+				party_field: get_text(voucher, "PARTYNAME"),
+				"tally_guid": get_text(voucher, "GUID"),
+				"posting_date": get_text(voucher, "DATE"),
+				"due_date": get_text(voucher, "DATE"),
 				"items": get_voucher_items(voucher, doctype),
 				"taxes": get_voucher_taxes(voucher),
 				account_field: account_name,
@@ -360,62 +409,90 @@ class TallyMigration(Document):
 			return invoice
 
 		def get_voucher_items(voucher, doctype):
-			inventory_entries = voucher.find_all("INVENTORYENTRIES.LIST") + voucher.find_all("ALLINVENTORYENTRIES.LIST") + voucher.find_all("INVENTORYENTRIESIN.LIST") + voucher.find_all("INVENTORYENTRIESOUT.LIST")
+			inventory_entries = get_inventory_entries(voucher)
 			if doctype == "Sales Invoice":
 				account_field = "income_account"
 			elif doctype == "Purchase Invoice":
 				account_field = "expense_account"
 			items = []
 			for entry in inventory_entries:
-				qty, uom = entry.ACTUALQTY.string.strip().split()
+				qty, uom = get_text(entry, "ACTUALQTY").strip().split()
 				items.append({
-					"item_code": entry.STOCKITEMNAME.string,
-					"description": entry.STOCKITEMNAME.string,
+					"item_code": get_text(entry, "STOCKITEMNAME"),
+					"description": get_text(entry, "STOCKITEMNAME"),
 					"qty": qty.strip(),
 					"uom": uom.strip(),
 					"conversion_factor": 1,
-					"price_list_rate": entry.RATE.string.split("/")[0],
+					"price_list_rate": get_text(entry, "RATE").split("/")[0],
 					"cost_center": self.default_cost_center,
 					"warehouse": self.default_warehouse,
-					account_field: encode_company_abbr(entry.find_all("ACCOUNTINGALLOCATIONS.LIST")[0].LEDGERNAME.string, self.erpnext_company),
+					account_field: encode_company_abbr(get_text(find(entry, "ACCOUNTINGALLOCATIONS.LIST"), "LEDGERNAME"), self.erpnext_company),
 				})
 			return items
 
 		def get_voucher_taxes(voucher):
-			ledger_entries = voucher.find_all("ALLLEDGERENTRIES.LIST") + voucher.find_all("LEDGERENTRIES.LIST")
+			ledger_entries = find_all(voucher, "ALLLEDGERENTRIES.LIST", "LEDGERENTRIES.LIST")
 			taxes = []
 			for entry in ledger_entries:
-				if entry.ISPARTYLEDGER.string == "No":
-					tax_account = encode_company_abbr(entry.LEDGERNAME.string, self.erpnext_company)
+				if get_text(entry, "ISPARTYLEDGER") == "No":
+					tax_account = encode_company_abbr(get_text(entry, "LEDGERNAME"), self.erpnext_company)
 					taxes.append({
 						"charge_type": "Actual",
 						"account_head": tax_account,
 						"description": tax_account,
-						"tax_amount": entry.AMOUNT.string,
+						"tax_amount": get_text(entry, "AMOUNT"),
 						"cost_center": self.default_cost_center,
 					})
 			return taxes
 
 		def get_party(party):
-			if frappe.db.exists({"doctype": "Supplier", "supplier_name": party}):
-				return "Supplier", encode_company_abbr(self.tally_creditors_account, self.erpnext_company)
-			elif frappe.db.exists({"doctype": "Customer", "customer_name": party}):
-				return "Customer", encode_company_abbr(self.tally_debtors_account, self.erpnext_company)
+			if party not in parties:
+				if frappe.db.exists({"doctype": "Supplier", "supplier_name": party}):
+					parties[party] = "Supplier", encode_company_abbr(self.tally_creditors_account, self.erpnext_company)
+				elif frappe.db.exists({"doctype": "Customer", "customer_name": party}):
+					parties[party] = "Customer", encode_company_abbr(self.tally_debtors_account, self.erpnext_company)
+				else:
+					parties[party] = None
+			return parties[party]
+
+		def dump_chunk(vouchers):
+			file_name = "vouchers-{0}.json".format(len(chunks) + 1)
+			chunks.append(self.dump_file(file_name, vouchers))
+
+		parties = {}
+		chunks, vouchers = [], []
+		total, earliest_date = 0, None
 
 		self.publish("Process Day Book Data", _("Reading Uploaded File"), 1, 3)
-		collection = self.get_collection(self.day_book_data)
-		self.publish("Process Day Book Data", _("Processing Vouchers"), 2, 3)
-		vouchers = get_vouchers(collection)
+		for element in self.iterate_elements(self.day_book_data, "VOUCHER"):
+			voucher = process_voucher(element)
+			if not voucher:
+				continue
+
+			vouchers.append(voucher)
+			total += 1
+			if voucher["posting_date"] and (not earliest_date or voucher["posting_date"] < earliest_date):
+				earliest_date = voucher["posting_date"]
+
+			if len(vouchers) == VOUCHER_CHUNK_SIZE:
+				dump_chunk(vouchers)
+				vouchers = []
+				self.publish("Process Day Book Data", _("Processed {0} Vouchers").format(total), 2, 3)
+
+		if vouchers:
+			dump_chunk(vouchers)
+
 		self.publish("Process Day Book Data", _("Done"), 3, 3)
-		self.dump_processed_data({"vouchers": vouchers})
+		# vouchers are stored in chunks, the vouchers file only indexes them
+		self.dump_processed_data({"vouchers": {"chunks": chunks, "total": total, "earliest_date": earliest_date}})
 		self.status = ""
 		self.is_day_book_data_processed = 1
 		self.save()
 
 	def _import_day_book_data(self):
-		def create_fiscal_years(vouchers):
+		def create_fiscal_years(earliest_date):
 			from frappe.utils.data import add_years, getdate
-			earliest_date = getdate(min(voucher["posting_date"] for voucher in vouchers))
+			earliest_date = getdate(earliest_date)
 			oldest_year = frappe.get_all("Fiscal Year", fields=["year_start_date", "year_end_date"], order_by="year_start_date")[0]
 			while earliest_date < oldest_year.year_start_date:
 				new_year = frappe.get_doc({"doctype": "Fiscal Year"})
@@ -452,35 +529,68 @@ class TallyMigration(Document):
 		frappe.db.set_value("Account", encode_company_abbr(self.tally_debtors_account, self.erpnext_company), "account_type", "Receivable")
 		frappe.db.set_value("Company", self.erpnext_company, "round_off_account", self.round_off_account)
 
-		vouchers_file = frappe.get_doc("File", {"file_url": self.vouchers})
-		vouchers = json.loads(vouchers_file.get_content())
+		vouchers = self.load_file(self.vouchers)
 
-		create_fiscal_years(vouchers)
+		if vouchers["earliest_date"]:
+			create_fiscal_years(vouchers["earliest_date"])
 		create_price_list()
 		create_custom_fields(["Journal Entry", "Purchase Invoice", "Sales Invoice"])
 
-		total = len(vouchers)
-		is_last = False
-		for index in range(0, total, VOUCHER_CHUNK_SIZE):
-			if index + VOUCHER_CHUNK_SIZE >= total:
-				is_last = True
-			frappe.enqueue_doc(self.doctype, self.name, "_import_vouchers", queue="long", timeout=3600, start=index+1, total=total, is_last=is_last)
+		# each chunk is a separate file, so chunks can be imported by parallel workers
+		total = vouchers["total"]
+		chunks = vouchers["chunks"]
+		self.db_set("day_book_chunks_imported", 0, update_modified=False)
+		frappe.db.commit()
+
+		for index, chunk in enumerate(chunks):
+			frappe.enqueue_doc(self.doctype, self.name, "_import_vouchers", queue="long", timeout=3600,
+				chunk=chunk, start=index * VOUCHER_CHUNK_SIZE + 1, total=total, chunk_count=len(chunks))
+
+	def _import_vouchers(self, chunk, start, total, chunk_count=1):
+		def get_imported_guids(vouchers):
+			guids = {}
+			for voucher in vouchers:
+				guids.setdefault(voucher["doctype"], []).append(voucher["tally_guid"])
+
+			imported = set()
+			for doctype, doctype_guids in guids.items():
+				imported.update(d.tally_guid for d in frappe.get_all(doctype,
+					filters={"tally_guid": ["in", doctype_guids]}, fields=["tally_guid"]))
+			return imported
 
-	def _import_vouchers(self, start, total, is_last=False):
 		frappe.flags.in_migrate = True
-		vouchers_file = frappe.get_doc("File", {"file_url": self.vouchers})
-		vouchers = json.loads(vouchers_file.get_content())
-		chunk = vouchers[start: start + VOUCHER_CHUNK_SIZE]
+		vouchers = self.load_file(chunk)
 
-		for index, voucher in enumerate(chunk, start=start):
+		# vouchers committed by an earlier run of this chunk are not imported again
+		imported_guids = get_imported_guids(vouchers)
+
+		start_bulk_voucher_import()
+		for voucher in vouchers:
+			if voucher["tally_guid"] in imported_guids:
+				continue
+			frappe.db.sql("savepoint tally_voucher")
 			try:
-				doc = frappe.get_doc(voucher).insert()
-				doc.submit()
-				self.publish("Importing Vouchers", _("{} of {}").format(index, total), index, total)
+				doc = frappe.get_doc(voucher)
+				# validate and submit in a single pass
+				doc.docstatus = 1
+				doc.insert()
 			except:
+				# nothing of a rejected voucher is committed with the chunk
+				frappe.db.sql("rollback to savepoint tally_voucher")
 				self.log(voucher)
+		stop_bulk_voucher_import()
+
+		frappe.db.commit()
+		index = start + len(vouchers) - 1
+		self.publish("Importing Vouchers", _("{} of {}").format(index, total), index, total)
 
-		if is_last:
+		# chunks finish in any order, the import is done when all of them are
+		chunks_imported = cint(frappe.db.get_value(self.doctype, self.name, "day_book_chunks_imported",
+			for_update=True)) + 1
+		self.db_set("day_book_chunks_imported", chunks_imported, update_modified=False)
+		frappe.db.commit()
+
+		if chunks_imported == chunk_count:
 			self.status = ""
 			self.is_day_book_data_imported = 1
 			self.save()
@@ -510,3 +620,58 @@ class TallyMigration(Document):
 	def log(self, data=None):
 		message = "\n".join(["Data", json.dumps(data, default=str, indent=4), "Exception", traceback.format_exc()])
 		return frappe.log_error(title="Tally Migration Error", message=message)
+
+
+class TallyXMLStream(object):
+	"""File like wrapper over a Tally XML export that decodes it in chunks and returns utf-8
+	encoded bytes, with the invalid `&#4;` references, empty tags and line breaks removed"""
+	def __init__(self, stream):
+		self.stream = stream
+		self.decoder = None
+		self.pending = ""
+
+	def read(self, size=-1):
+		if not size or size < 0:
+			size = 16 * 1024
+
+		while True:
+			if not self.decoder:
+				# read enough to detect the byte order mark
+				data = self.stream.read(max(size, 4))
+				self.decoder = codecs.getincrementaldecoder(get_encoding(data))()
+			else:
+				data = self.stream.read(size)
+
+			text = emptify((self.pending + self.decoder.decode(data, final=not data)).replace("&#4;", ""))
+			if data:
+				# a reference, line break or empty tag may be split across chunks, so hold back
+				# the last characters, and the last tag with what follows it
+				split = max(len(text) - 3, 0)
+				incomplete_tag = re.search(r"(<[\w.]+>\s*)?<[^<]*$", text)
+				if incomplete_tag:
+					split = min(split, incomplete_tag.start())
+				text, self.pending = text[:split], text[split:]
+			else:
+				self.pending = ""
+
+			if text or not data:
+				return text.encode("utf-8")
+
+def get_encoding(data):
+	"""Returns the encoding of a Tally export from its first bytes, exports without
+	a byte order mark are UTF-16 too if their ASCII characters are padded with nulls"""
+	if data.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+		return "utf-16"
+	elif data[1:2] == b"\x00":
+		return "utf-16-le"
+	elif data[:1] == b"\x00":
+		return "utf-16-be"
+
+	return "utf-8-sig"
+
+def emptify(string):
+	"""Remove empty tags, so that they are not found instead of the filled ones"""
+	string = re.sub(r"<\w+/>", "", string)
+	string = re.sub(r"<([\w.]+)>\s*<\/\1>", "", string)
+	string = re.sub(r"\r\n", "", string)
+	return string
@@ -3,8 +3,26 @@
 # See license.txt
 from __future__ import unicode_literals
 
+import io
+from xml.etree import ElementTree
 import frappe
 import unittest
+from erpnext.erpnext_integrations.doctype.tally_migration.tally_migration import TallyXMLStream
 
 class TestTallyMigration(unittest.TestCase):
-	pass
+	def test_xml_stream(self):
+		# empty tags before the filled ones are dropped, so that they are not found instead
+		content = "<ENVELOPE><VOUCHER><DATE/><NARRATION> </NARRATION>\r\n" \
+			"<NARRATION>Rent&#4; Paid</NARRATION></VOUCHER></ENVELOPE>"
+
+		# exports without a byte order mark are utf-16 too
+		for encoding in ("utf-16", "utf-16-le", "utf-8-sig"):
+			stream = TallyXMLStream(io.BytesIO(content.encode(encoding)))
+			# small reads split the invalid reference across chunks
+			read = stream.read
+			stream.read = lambda size: read(5)
+
+			parser = ElementTree.XMLParser(encoding="utf-8")
+			narrations = [element.text for event, element in ElementTree.iterparse(stream, parser=parser)
+				if element.tag == "NARRATION"]
+			self.assertEqual(narrations, ["Rent Paid"])
@@ -198,6 +198,11 @@ standard_queries = {
 	"Healthcare Practitioner": "erpnext.healthcare.doctype.healthcare_practitioner.healthcare_practitioner.get_practitioner_list"
 }
 
+# profiles query reports when enabled in site config
+override_whitelisted_methods = {
+	"frappe.desk.query_report.run": "erpnext.utilities.doctype.report_run_log.report_run_log.run"
+}
+
 doc_events = {
 	"Stock Entry": {
 		"on_submit": "erpnext.stock.doctype.material_request.material_request.update_completed_and_requested_qty",
@@ -217,10 +222,16 @@ doc_events = {
 		"validate": "erpnext.portal.doctype.products_settings.products_settings.home_page_is_products"
 	},
 	"Sales Invoice": {
-		"on_submit": ["erpnext.regional.france.utils.create_transaction_log", "erpnext.regional.italy.utils.sales_invoice_on_submit"],
-		"on_cancel": "erpnext.regional.italy.utils.sales_invoice_on_cancel",
+		"on_submit": ["erpnext.regional.france.utils.create_transaction_log", "erpnext.regional.italy.utils.sales_invoice_on_submit",
+			"erpnext.regional.doctype.gst_tax_line.gst_tax_line.update_gst_tax_lines"],
+		"on_cancel": ["erpnext.regional.italy.utils.sales_invoice_on_cancel",
+			"erpnext.regional.doctype.gst_tax_line.gst_tax_line.update_gst_tax_lines"],
 		"on_trash": "erpnext.regional.check_deletion_permission"
 	},
+	"Purchase Invoice": {
+		"on_submit": "erpnext.regional.doctype.gst_tax_line.gst_tax_line.update_gst_tax_lines",
+		"on_cancel": "erpnext.regional.doctype.gst_tax_line.gst_tax_line.update_gst_tax_lines"
+	},
 	"Payment Entry": {
 		"on_submit": ["erpnext.regional.france.utils.create_transaction_log", "erpnext.accounts.doctype.payment_request.payment_request.make_status_as_paid"],
 		"on_trash": "erpnext.regional.check_deletion_permission"
@@ -233,12 +244,37 @@ doc_events = {
 	},
 	"Contact":{
 		"on_trash": "erpnext.support.doctype.issue.issue.update_issue"
+	},
+	("Payment Entry", "Journal Entry"): {
+		"on_submit": "erpnext.accounts.doctype.bank_transaction_suggestion.bank_transaction_suggestion.match_bank_statement_for_payment",
+		"on_cancel": "erpnext.accounts.doctype.bank_transaction_suggestion.bank_transaction_suggestion.delete_payment_suggestions"
+	},
+	("Quotation", "Sales Order", "Delivery Note", "Sales Invoice", "Issue", "Project"): {
+		"after_insert": "erpnext.setup.doctype.company.company.update_company_transactions_history",
+		"on_trash": "erpnext.setup.doctype.company.company.update_company_transactions_history"
+	},
+	"Item Group": {
+		"after_rename": "erpnext.stock.doctype.item_search_term.item_search_term.update_item_group_search_terms"
+	},
+	("Customer", "Supplier", "Supplier Group", "Item", "Item Group", "Tax Category", "Country", "Company",
+		"Sales Taxes and Charges Template", "Purchase Taxes and Charges Template"): {
+		"after_rename": "erpnext.accounts.doctype.tax_rule.tax_rule.clear_tax_rule_cache_on_rename"
+	},
+	"Accounts Settings": {
+		"on_update": "erpnext.regional.doctype.gst_tax_line.gst_tax_line.clear_gst_return_cache_on_change"
+	},
+	("Address", "Customer", "Supplier", "Item", "GST HSN Code"): {
+		"on_update": "erpnext.regional.doctype.gst_tax_line.gst_tax_line.clear_gst_return_cache_on_change",
+		"on_trash": "erpnext.regional.doctype.gst_tax_line.gst_tax_line.clear_gst_return_cache_on_change",
+		"after_rename": "erpnext.regional.doctype.gst_tax_line.gst_tax_line.clear_gst_return_cache_on_change"
 	}
 }
 
 scheduler_events = {
 	"all": [
-		"erpnext.projects.doctype.project.project.project_status_update_reminder"
+		"erpnext.projects.doctype.project.project.project_status_update_reminder",
+		"erpnext.erpnext_integrations.doctype.shopify_log.shopify_log.sync_queued_requests",
+		"erpnext.erpnext_integrations.connectors.woocommerce_connection.sync_queued_orders"
 	],
 	"hourly": [
 		'erpnext.hr.doctype.daily_work_summary_group.daily_work_summary_group.trigger_emails',
@@ -250,6 +286,7 @@ scheduler_events = {
 		"erpnext.projects.doctype.project.project.collect_project_status",
 		"erpnext.hr.doctype.shift_type.shift_type.process_auto_attendance_for_all_shifts",
 		"erpnext.support.doctype.issue.issue.set_service_level_agreement_variance",
+		"erpnext.stock.doctype.item_search_term.item_search_term.update_modified_item_search_terms",
 	],
 	"daily": [
 		"erpnext.stock.reorder_item.reorder_item",
@@ -276,6 +313,9 @@ scheduler_events = {
 	"daily_long": [
 		"erpnext.manufacturing.doctype.bom_update_tool.bom_update_tool.update_latest_price_in_all_boms"
 	],
+	"weekly_long": [
+		"erpnext.setup.doctype.company.company.rebuild_companies_sales_history"
+	],
 	"monthly_long": [
 		"erpnext.accounts.deferred_revenue.convert_deferred_revenue_to_income",
 		"erpnext.accounts.deferred_revenue.convert_deferred_expense_to_expense",
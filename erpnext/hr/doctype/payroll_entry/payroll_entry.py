@@ -11,6 +11,8 @@ from frappe import _
 from erpnext.accounts.utils import get_fiscal_year
 from erpnext.hr.doctype.employee.employee import get_holiday_list_for_employee
 
+SALARY_SLIP_CHUNK_SIZE = 500
+
 class PayrollEntry(Document):
 	def on_submit(self):
 		self.create_salary_slips()
@@ -116,7 +118,12 @@ class PayrollEntry(Document):
 				"payroll_entry": self.name
 			})
 			if len(emp_list) > 30:
-				frappe.enqueue(create_salary_slips_for_employees, timeout=600, employees=emp_list, args=args)
+				# chunks are picked up by different workers and processed in parallel
+				chunks = [emp_list[i:i + SALARY_SLIP_CHUNK_SIZE]
+					for i in range(0, len(emp_list), SALARY_SLIP_CHUNK_SIZE)]
+				for idx, employees in enumerate(chunks):
+					frappe.enqueue(create_salary_slips_for_employees, queue='long', timeout=3000,
+						employees=employees, args=args, chunk=(idx + 1, len(chunks)))
 			else:
 				create_salary_slips_for_employees(emp_list, args, publish_progress=False)
 
@@ -486,26 +493,110 @@ def payroll_entry_has_bank_entries(name):
 
 	return response
 
-def create_salary_slips_for_employees(employees, args, publish_progress=True):
+def create_salary_slips_for_employees(employees, args, publish_progress=True, chunk=None):
+	'''Create salary slips for the given employees.
+
+	When run as one of the chunks of a large payroll, failures are logged per employee
+	instead of aborting the chunk, and the Payroll Entry is marked as done once every
+	employee has a salary slip'''
 	salary_slips_exists_for = get_existing_salary_slips(employees, args)
-	count=0
-	for emp in employees:
-		if emp not in salary_slips_exists_for:
+	pending = [emp for emp in employees if emp not in salary_slips_exists_for]
+
+	frappe.flags.payroll_prefetch = get_payroll_prefetch(pending, args)
+	failed = []
+	count = 0
+	try:
+		for emp in pending:
 			args.update({
 				"doctype": "Salary Slip",
 				"employee": emp
 			})
-			ss = frappe.get_doc(args)
-			ss.insert()
+
+			if chunk:
+				try:
+					frappe.get_doc(args).insert()
+					frappe.db.commit()
+				except Exception:
+					frappe.db.rollback()
+					failed.append(emp)
+					frappe.log_error(frappe.get_traceback(),
+						_("Salary Slip creation failed for {0} in {1}").format(emp, args.payroll_entry))
+			else:
+				frappe.get_doc(args).insert()
+
 			count+=1
 			if publish_progress:
-				frappe.publish_progress(count*100/len(set(employees) - set(salary_slips_exists_for)),
-					title = _("Creating Salary Slips..."))
+				frappe.publish_progress(count*100/len(pending),
+					title = _("Creating Salary Slips..."),
+					description = _("Batch {0} of {1}").format(*chunk) if chunk else None)
+	finally:
+		frappe.flags.payroll_prefetch = None
+
+	if failed:
+		frappe.publish_realtime("msgprint", _("Could not create Salary Slips for {0}").format(", ".join(failed)),
+			user=frappe.session.user)
 
 	payroll_entry = frappe.get_doc("Payroll Entry", args.payroll_entry)
+	if chunk and (failed or get_employees_without_salary_slip(payroll_entry, args)):
+		return
+
 	payroll_entry.db_set("salary_slips_created", 1)
 	payroll_entry.notify_update()
 
+def get_employees_without_salary_slip(payroll_entry, args):
+	employees = [d.employee for d in payroll_entry.get_emp_list() or []]
+	if not employees:
+		return []
+
+	salary_slips_exists_for = get_existing_salary_slips(employees, args)
+	return [emp for emp in employees if emp not in salary_slips_exists_for]
+
+def get_payroll_prefetch(employees, args):
+	'''Load the employee, assignment, component and holiday details needed by the salary slips
+	of all the given employees with a few queries, instead of once per salary slip'''
+	prefetch = frappe._dict({
+		"start_date": getdate(args.start_date),
+		"end_date": getdate(args.end_date),
+		"salary_structures": {},
+		"employees": {},
+		"assignments": {},
+		"holiday_lists": {},
+		"holidays": {},
+		"salary_component_abbrs": [d.salary_component_abbr
+			for d in frappe.get_all("Salary Component", fields=["salary_component_abbr"])],
+		"include_holidays_in_total_working_days": cint(frappe.db.get_value("HR Settings", None,
+			"include_holidays_in_total_working_days"))
+	})
+
+	if not employees:
+		return prefetch
+
+	employee_condition = ", ".join(["%s"] * len(employees))
+
+	for d in frappe.db.sql("""select * from `tabEmployee` where name in ({0})"""
+		.format(employee_condition), tuple(employees), as_dict=True):
+		d.doctype = "Employee"
+		prefetch.employees[d.name] = d
+
+		holiday_list = d.holiday_list or frappe.get_cached_value('Company', d.company, "default_holiday_list")
+		if holiday_list:
+			prefetch.holiday_lists[d.name] = holiday_list
+
+	for d in frappe.db.sql("""select * from `tabSalary Structure Assignment` where employee in ({0})
+		order by modified desc""".format(employee_condition), tuple(employees), as_dict=True):
+		d.doctype = "Salary Structure Assignment"
+		prefetch.assignments.setdefault((d.employee, d.salary_structure), d)
+
+	holiday_lists = list(set(prefetch.holiday_lists.values()))
+	if holiday_lists:
+		for d in frappe.db.sql("""select parent, holiday_date from `tabHoliday`
+			where parent in ({0}) and holiday_date between %s and %s"""
+			.format(", ".join(["%s"] * len(holiday_lists))),
+			tuple(holiday_lists + [prefetch.start_date, prefetch.end_date]), as_dict=True):
+			prefetch.holidays.setdefault(d.parent, []).append(getdate(d.holiday_date))
+
+	return prefetch
+
 def get_existing_salary_slips(employees, args):
 	return frappe.db.sql_list("""
 		select distinct employee from `tabSalary Slip`
@@ -5,8 +5,10 @@ import unittest
 import erpnext
 import frappe
 from dateutil.relativedelta import relativedelta
+from frappe.utils import add_days
 from erpnext.accounts.utils import get_fiscal_year, getdate, nowdate
-from erpnext.hr.doctype.payroll_entry.payroll_entry import get_start_end_dates, get_end_date
+from erpnext.hr.doctype.payroll_entry.payroll_entry import get_start_end_dates, get_end_date, \
+		create_salary_slips_for_employees
 from erpnext.hr.doctype.employee.test_employee import make_employee
 from erpnext.hr.doctype.salary_slip.test_salary_slip import get_salary_component_account, \
 		make_earning_salary_component, make_deduction_salary_component
@@ -98,6 +100,95 @@ class TestPayrollEntry(unittest.TestCase):
 			frappe.delete_doc('Salary Slip', name)
 
 
+	def test_salary_slips_with_prefetch(self):
+		company = erpnext.get_default_company()
+		for data in frappe.get_all('Salary Component', fields = ["name"]):
+			if not frappe.db.get_value('Salary Component Account',
+				{'parent': data.name, 'company': company}, 'name'):
+				get_salary_component_account(data.name)
+
+		dates = get_start_end_dates('Monthly', nowdate())
+		holiday_list = make_weekly_holiday_list("Payroll Prefetch Holiday List")
+
+		if not frappe.db.exists("Leave Type", "_Test Payroll Leave Type LWP"):
+			frappe.get_doc(dict(doctype="Leave Type", leave_type_name="_Test Payroll Leave Type LWP",
+				is_lwp=1, include_holiday=0)).insert()
+
+		employees = []
+		for i in range(4):
+			employee = make_employee("test_payroll_prefetch{0}@example.com".format(i))
+			frappe.db.set_value("Employee", employee, {
+				# the last one falls back to the holiday list of the company
+				"holiday_list": holiday_list if i < 3 else None,
+				"relieving_date": None,
+				"status": "Active"
+			})
+			make_salary_structure("_Test Salary Structure", "Monthly", employee)
+			employees.append(employee)
+
+		# leaves without pay over a weekend, and half a working day
+		half_day_date = add_days(dates.start_date, 3)
+		if getdate(half_day_date).weekday() == 6:
+			half_day_date = add_days(half_day_date, 1)
+
+		frappe.db.sql("delete from `tabLeave Application` where employee in %s", (tuple(employees),))
+		for employee, from_date, to_date, half_day in ((employees[0], dates.start_date, add_days(dates.start_date, 8), 0),
+			(employees[1], half_day_date, half_day_date, 1)):
+			frappe.get_doc(dict(doctype="Leave Application", employee=employee, company=company,
+				leave_type="_Test Payroll Leave Type LWP", from_date=from_date, to_date=to_date,
+				half_day=half_day, half_day_date=from_date if half_day else None,
+				status="Approved", posting_date=from_date, docstatus=1)).db_insert()
+
+		payroll_entry = frappe.new_doc("Payroll Entry")
+		payroll_entry.update({
+			"company": company,
+			"start_date": dates.start_date,
+			"end_date": dates.end_date,
+			"payment_account": get_payment_account(),
+			"posting_date": nowdate(),
+			"payroll_frequency": "Monthly"
+		})
+		payroll_entry.save()
+
+		args = frappe._dict({
+			"payroll_frequency": "Monthly",
+			"start_date": dates.start_date,
+			"end_date": dates.end_date,
+			"company": company,
+			"posting_date": nowdate(),
+			"payroll_entry": payroll_entry.name
+		})
+
+		def get_salary_slips():
+			salary_slips = {}
+			for name in frappe.get_all("Salary Slip", filters={"employee": ["in", employees],
+				"start_date": dates.start_date}):
+				ss = frappe.get_doc("Salary Slip", name.name)
+				salary_slips[ss.employee] = (ss.total_working_days, ss.payment_days, ss.leave_without_pay,
+					ss.gross_pay, ss.total_deduction, ss.net_pay,
+					[(d.salary_component, d.amount) for d in ss.earnings + ss.deductions])
+				frappe.delete_doc("Salary Slip", ss.name)
+
+			return salary_slips
+
+		# in chunks, the way a large payroll is enqueued, with the details of each chunk prefetched
+		frappe.db.sql("delete from `tabSalary Slip` where employee in %s", (tuple(employees),))
+		create_salary_slips_for_employees(employees[:2], frappe._dict(args), publish_progress=False, chunk=(1, 2))
+		create_salary_slips_for_employees(employees[2:], frappe._dict(args), publish_progress=False, chunk=(2, 2))
+		prefetched_salary_slips = get_salary_slips()
+
+		# one at a time, without the prefetched details
+		for employee in employees:
+			frappe.get_doc(dict(args, doctype="Salary Slip", employee=employee)).insert()
+		salary_slips = get_salary_slips()
+
+		self.assertEqual(len(salary_slips), len(employees))
+		self.assertEqual(prefetched_salary_slips, salary_slips)
+		self.assertEqual(salary_slips[employees[1]][2], 0.5)
+		self.assertTrue(salary_slips[employees[0]][2] > 1)
+
+		frappe.db.sql("delete from `tabLeave Application` where employee in %s", (tuple(employees),))
+
 def make_payroll_entry(**args):
 	args = frappe._dict(args)
 
@@ -148,3 +239,18 @@ def make_holiday(holiday_list_name):
 		}).insert()
 
 	return holiday_list_name
+
+def make_weekly_holiday_list(holiday_list_name):
+	if not frappe.db.exists('Holiday List', holiday_list_name):
+		current_fiscal_year = get_fiscal_year(nowdate(), as_dict=True)
+		holiday_list = frappe.get_doc({
+			'doctype': 'Holiday List',
+			'holiday_list_name': holiday_list_name,
+			'from_date': current_fiscal_year.year_start_date,
+			'to_date': current_fiscal_year.year_end_date,
+			'weekly_off': 'Sunday'
+		}).insert()
+		holiday_list.get_weekly_off_dates()
+		holiday_list.save()
+
+	return holiday_list_name
@@ -126,7 +126,7 @@ class SalarySlip(TransactionBase):
 			struct = self.check_sal_struct(joining_date, relieving_date)
 
 			if struct:
-				self._salary_structure_doc = frappe.get_doc('Salary Structure', struct)
+				self._salary_structure_doc = get_salary_structure_doc(struct)
 				self.salary_slip_based_on_timesheet = self._salary_structure_doc.salary_slip_based_on_timesheet or 0
 				self.set_time_sheet()
 				self.pull_sal_struct()
@@ -194,7 +194,7 @@ class SalarySlip(TransactionBase):
 
 		holidays = self.get_holidays_for_employee(self.start_date, self.end_date)
 		actual_lwp = self.calculate_lwp(holidays, working_days)
-		if not cint(frappe.db.get_value("HR Settings", None, "include_holidays_in_total_working_days")):
+		if not include_holidays_in_total_working_days():
 			working_days -= len(holidays)
 			if working_days < 0:
 				frappe.throw(_("There are more holidays than working days this month."))
@@ -228,12 +228,18 @@ class SalarySlip(TransactionBase):
 
 		payment_days = date_diff(end_date, start_date) + 1
 
-		if not cint(frappe.db.get_value("HR Settings", None, "include_holidays_in_total_working_days")):
+		if not include_holidays_in_total_working_days():
 			holidays = self.get_holidays_for_employee(start_date, end_date)
 			payment_days -= len(holidays)
 		return payment_days
 
 	def get_holidays_for_employee(self, start_date, end_date):
+		prefetch = frappe.flags.payroll_prefetch
+		if prefetch and self.employee in prefetch.holiday_lists \
+			and prefetch.start_date <= getdate(start_date) and getdate(end_date) <= prefetch.end_date:
+			return [cstr(d) for d in prefetch.holidays.get(prefetch.holiday_lists[self.employee], [])
+				if getdate(start_date) <= d <= getdate(end_date)]
+
 		holiday_list = get_holiday_list_for_employee(self.employee)
 		holidays = frappe.db.sql_list('''select holiday_date from `tabHoliday`
 			where
@@ -251,22 +257,24 @@ class SalarySlip(TransactionBase):
 
 	def calculate_lwp(self, holidays, working_days):
 		lwp = 0
-		holidays = "','".join(holidays)
+		leaves = frappe.db.sql("""
+			select t1.name, t1.half_day, t1.from_date, t1.to_date, t2.include_holiday
+			from `tabLeave Application` t1, `tabLeave Type` t2
+			where t2.name = t1.leave_type
+			and t2.is_lwp = 1
+			and t1.docstatus = 1
+			and t1.employee = %(employee)s
+			and ifnull(t1.salary_slip, '') = ''
+			and t1.from_date <= %(end_date)s and t1.to_date >= %(start_date)s
+			""", {"employee": self.employee, "start_date": self.start_date,
+				"end_date": add_days(self.start_date, working_days - 1)}, as_dict=True)
+
 		for d in range(working_days):
-			dt = add_days(cstr(getdate(self.start_date)), d)
-			leave = frappe.db.sql("""
-				select t1.name, t1.half_day
-				from `tabLeave Application` t1, `tabLeave Type` t2
-				where t2.name = t1.leave_type
-				and t2.is_lwp = 1
-				and t1.docstatus = 1
-				and t1.employee = %(employee)s
-				and CASE WHEN t2.include_holiday != 1 THEN %(dt)s not in ('{0}') and %(dt)s between from_date and to_date and ifnull(t1.salary_slip, '') = ''
-				WHEN t2.include_holiday THEN %(dt)s between from_date and to_date and ifnull(t1.salary_slip, '') = ''
-				END
-				""".format(holidays), {"employee": self.employee, "dt": dt})
+			dt = getdate(add_days(cstr(getdate(self.start_date)), d))
+			leave = [l for l in leaves if l.from_date <= dt <= l.to_date
+				and (l.include_holiday or cstr(dt) not in holidays)]
 			if leave:
-				lwp = cint(leave[0][1]) and (lwp + 0.5) or (lwp + 1)
+				lwp = cint(leave[0].half_day) and (lwp + 0.5) or (lwp + 1)
 		return lwp
 
 	def add_earning_for_hourly_wages(self, doc, salary_component, amount):
@@ -301,7 +309,7 @@ class SalarySlip(TransactionBase):
 
 	def calculate_component_amounts(self):
 		if not getattr(self, '_salary_structure_doc', None):
-			self._salary_structure_doc = frappe.get_doc('Salary Structure', self.salary_structure)
+			self._salary_structure_doc = get_salary_structure_doc(self.salary_structure)
 
 		payroll_period = get_payroll_period(self.start_date, self.end_date, self.company)
 
@@ -322,17 +330,21 @@ class SalarySlip(TransactionBase):
 	def get_data_for_eval(self):
 		'''Returns data for evaluating formula'''
 		data = frappe._dict()
+		prefetch = frappe.flags.payroll_prefetch or frappe._dict()
 
-		data.update(frappe.get_doc("Salary Structure Assignment",
+		assignment = (prefetch.assignments or {}).get((self.employee, self.salary_structure))
+		data.update(assignment or frappe.get_doc("Salary Structure Assignment",
 			{"employee": self.employee, "salary_structure": self.salary_structure}).as_dict())
 
-		data.update(frappe.get_doc("Employee", self.employee).as_dict())
+		data.update((prefetch.employees or {}).get(self.employee)
+			or frappe.get_doc("Employee", self.employee).as_dict())
 		data.update(self.as_dict())
 
 		# set values for components
-		salary_components = frappe.get_all("Salary Component", fields=["salary_component_abbr"])
-		for sc in salary_components:
-			data.setdefault(sc.salary_component_abbr, 0)
+		salary_component_abbrs = prefetch.salary_component_abbrs or \
+			[d.salary_component_abbr for d in frappe.get_all("Salary Component", fields=["salary_component_abbr"])]
+		for abbr in salary_component_abbrs:
+			data.setdefault(abbr, 0)
 
 		for key in ('earnings', 'deductions'):
 			for d in self.get(key):
@@ -344,13 +356,13 @@ class SalarySlip(TransactionBase):
 		try:
 			condition = d.condition.strip() if d.condition else None
 			if condition:
-				if not frappe.safe_eval(condition, self.whitelisted_globals, data):
+				if not safe_eval(condition, self.whitelisted_globals, data):
 					return None
 			amount = d.amount
 			if d.amount_based_on_formula:
 				formula = d.formula.strip() if d.formula else None
 				if formula:
-					amount = flt(frappe.safe_eval(formula, self.whitelisted_globals, data), d.precision("amount"))
+					amount = flt(safe_eval(formula, self.whitelisted_globals, data), d.precision("amount"))
 			if amount:
 				data[d.abbr] = amount
 
@@ -696,7 +708,7 @@ class SalarySlip(TransactionBase):
 		try:
 			condition = condition.strip()
 			if condition:
-				return frappe.safe_eval(condition, self.whitelisted_globals, data)
+				return safe_eval(condition, self.whitelisted_globals, data)
 		except NameError as err:
 			frappe.throw(_("Name error: {0}".format(err)))
 		except SyntaxError as err:
@@ -837,6 +849,46 @@ class SalarySlip(TransactionBase):
 		self.get_leave_details(lwp=lwp)
 		self.calculate_net_pay()
 
+def get_salary_structure_doc(salary_structure):
+	'''Returns the Salary Structure, loaded only once per structure during a payroll run'''
+	prefetch = frappe.flags.payroll_prefetch
+	if not prefetch:
+		return frappe.get_doc('Salary Structure', salary_structure)
+
+	if salary_structure not in prefetch.salary_structures:
+		prefetch.salary_structures[salary_structure] = frappe.get_doc('Salary Structure', salary_structure)
+
+	return prefetch.salary_structures[salary_structure]
+
+def include_holidays_in_total_working_days():
+	prefetch = frappe.flags.payroll_prefetch
+	if prefetch:
+		return prefetch.include_holidays_in_total_working_days
+
+	return cint(frappe.db.get_value("HR Settings", None, "include_holidays_in_total_working_days"))
+
+def safe_eval(code, eval_globals=None, eval_locals=None):
+	'''Same as `frappe.safe_eval`, but each formula or condition is compiled only once
+	and reused for every salary slip'''
+	if code not in compiled_formulas:
+		if '__' in code:
+			frappe.throw(_('Illegal rule {0}. Cannot use "__"').format(frappe.bold(code)))
+
+		compiled_formulas[code] = compile(code, '<string>', 'eval')
+
+	eval_globals = dict(eval_globals or {})
+	eval_globals.update({
+		"__builtins__": {},
+		"int": int,
+		"float": float,
+		"long": int,
+		"round": round
+	})
+
+	return eval(compiled_formulas[code], eval_globals, eval_locals)
+
+compiled_formulas = {}
+
 def unlink_ref_doc_from_salary_slip(ref_no):
 	linked_ss = frappe.db.sql_list("""select name from `tabSalary Slip`
 	where journal_entry=%s and docstatus < 2""", (ref_no))
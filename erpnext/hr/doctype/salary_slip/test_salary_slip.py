@@ -121,6 +121,14 @@ class TestSalarySlip(unittest.TestCase):
 		frappe.db.set_value("Employee", frappe.get_value("Employee",
 			{"employee_name":"test_employee@salary.com"}, "name"), "status", "Active")
 
+	def test_compiled_formula_eval(self):
+		from erpnext.hr.doctype.salary_slip.salary_slip import safe_eval
+
+		self.assertEqual(safe_eval("base * .5", None, {"base": 1000}), 500)
+		self.assertEqual(safe_eval("base * .5", None, {"base": 300}), 150)
+		self.assertRaises(frappe.ValidationError, safe_eval, "().__class__", None, {})
+		self.assertRaises(NameError, safe_eval, "open('x')", None, {})
+
 	def test_employee_salary_slip_read_permission(self):
 		make_employee("test_employee@salary.com")
 
@@ -0,0 +1,8 @@
+from __future__ import unicode_literals
+import frappe
+from erpnext.accounts.doctype.bank_transaction_term.bank_transaction_term import rebuild_bank_transaction_terms
+
+def execute():
+	frappe.reload_doc("accounts", "doctype", "bank_transaction_term")
+
+	rebuild_bank_transaction_terms()
@@ -0,0 +1,8 @@
+from __future__ import unicode_literals
+import frappe
+from erpnext.accounts.doctype.budget_consumption.budget_consumption import rebuild_budget_consumption
+
+def execute():
+	frappe.reload_doc("accounts", "doctype", "budget_consumption")
+
+	rebuild_budget_consumption()
@@ -0,0 +1,9 @@
+from __future__ import unicode_literals
+import frappe
+from erpnext.regional.doctype.gst_tax_line.gst_tax_line import rebuild_gst_tax_lines
+
+def execute():
+	frappe.reload_doc("regional", "doctype", "gst_tax_line")
+
+	# GST returns are read from the tax lines, so they are built before the reports are used
+	rebuild_gst_tax_lines()
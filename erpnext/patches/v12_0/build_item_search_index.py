@@ -0,0 +1,9 @@
+from __future__ import unicode_literals
+import frappe
+
+def execute():
+	frappe.reload_doc("stock", "doctype", "item_search_term")
+
+	# searches scan Items as before till the index is built
+	frappe.enqueue("erpnext.stock.doctype.item_search_term.item_search_term.rebuild_item_search_index",
+		queue="long", timeout=6000)
@@ -39,6 +39,14 @@ class ItemVariantsCacheManager:
 
 		return frappe.cache().hget('optional_attributes', self.item_code)
 
+	def get_item_variants_index(self):
+		val = frappe.cache().hget('item_variants_index', self.item_code)
+
+		if not val:
+			self.build_cache()
+
+		return frappe.cache().hget('item_variants_index', self.item_code)
+
 	def get_ordered_attribute_values(self):
 		val = frappe.cache().get_value('ordered_attribute_values_map')
 		if val: return val
@@ -85,13 +93,17 @@ class ItemVariantsCacheManager:
 				if attribute not in attr_dict:
 					optional_attributes.add(attribute)
 
+		item_variants_index = build_item_variants_index(item_attribute_value_map)
+
 		frappe.cache().hset('attribute_value_item_map', parent_item_code, attribute_value_item_map)
 		frappe.cache().hset('item_attribute_value_map', parent_item_code, item_attribute_value_map)
 		frappe.cache().hset('item_variants_data', parent_item_code, item_variants_data)
 		frappe.cache().hset('optional_attributes', parent_item_code, optional_attributes)
+		frappe.cache().hset('item_variants_index', parent_item_code, item_variants_index)
 
 	def clear_cache(self):
-		keys = ['attribute_value_item_map', 'item_attribute_value_map', 'item_variants_data', 'optional_attributes']
+		keys = ['attribute_value_item_map', 'item_attribute_value_map', 'item_variants_data', 'optional_attributes',
+			'item_variants_index']
 
 		for key in keys:
 			frappe.cache().hdel(key, self.item_code)
@@ -101,6 +113,54 @@ class ItemVariantsCacheManager:
 		enqueue_build_cache(self.item_code)
 
 
+def build_item_variants_index(item_attribute_value_map):
+	'''Build an inverted index of the variants of a template.
+
+	Variants are numbered by their position in the sorted `items` list and every
+	(attribute, value) pair maps to a bitmask of the variants having it, so that
+	filtering on selected attributes is a bitwise AND instead of a scan.
+	'''
+	items = sorted(item_attribute_value_map.keys())
+
+	attribute_value_masks = {}
+	attribute_count_masks = {}
+	for i, item_code in enumerate(items):
+		bit = 1 << i
+		attr_dict = item_attribute_value_map[item_code]
+		for attribute, attribute_value in attr_dict.items():
+			key = (attribute, attribute_value)
+			attribute_value_masks[key] = attribute_value_masks.get(key, 0) | bit
+
+		count = len(attr_dict)
+		attribute_count_masks[count] = attribute_count_masks.get(count, 0) | bit
+
+	return frappe._dict({
+		'items': items,
+		# (attr, value) => bitmask of variants
+		'attribute_value_masks': attribute_value_masks,
+		# number of attributes set on the variant => bitmask of variants
+		'attribute_count_masks': attribute_count_masks
+	})
+
+def get_mask_for_attributes(item_variants_index, selected_attributes):
+	'''Return the bitmask of variants matching all of the selected attributes'''
+	mask = (1 << len(item_variants_index.items)) - 1
+	for attribute, value in selected_attributes.items():
+		mask &= item_variants_index.attribute_value_masks.get((attribute, value), 0)
+		if not mask:
+			break
+
+	return mask
+
+def get_items_from_mask(item_variants_index, mask):
+	items = []
+	while mask:
+		bit = mask & -mask
+		items.append(item_variants_index.items[bit.bit_length() - 1])
+		mask ^= bit
+
+	return items
+
 def build_cache(item_code):
 	frappe.cache().hset('item_cache_build_in_progress', item_code, 1)
 	i = ItemVariantsCacheManager(item_code)
@@ -5,6 +5,8 @@ import frappe, unittest
 from frappe.tests.test_website import set_request, get_html_for_route
 from frappe.website.render import render
 from erpnext.portal.product_configurator.utils import get_products_for_website
+from erpnext.portal.product_configurator.item_variants_cache import (build_item_variants_index,
+	get_mask_for_attributes, get_items_from_mask)
 from erpnext.stock.doctype.item.test_item import make_item_variant
 
 test_dependencies = ["Item"]
@@ -51,6 +53,29 @@ class TestProductConfigurator(unittest.TestCase):
 		self.assertEqual(len(items), 1)
 
 
+	def test_item_variants_index(self):
+		index = build_item_variants_index({
+			'_Test Variant Small Red': {'Test Size': 'Small', 'Test Colour': 'Red'},
+			'_Test Variant Small Blue': {'Test Size': 'Small', 'Test Colour': 'Blue'},
+			'_Test Variant Large Red': {'Test Size': 'Large', 'Test Colour': 'Red'},
+			'_Test Variant Small': {'Test Size': 'Small'}
+		})
+
+		mask = get_mask_for_attributes(index, {'Test Size': 'Small'})
+		self.assertEqual(sorted(get_items_from_mask(index, mask)),
+			['_Test Variant Small', '_Test Variant Small Blue', '_Test Variant Small Red'])
+
+		mask = get_mask_for_attributes(index, {'Test Size': 'Small', 'Test Colour': 'Red'})
+		self.assertEqual(get_items_from_mask(index, mask), ['_Test Variant Small Red'])
+
+		mask = get_mask_for_attributes(index, {'Test Size': 'Large', 'Test Colour': 'Blue'})
+		self.assertEqual(get_items_from_mask(index, mask), [])
+
+		# only the variant without a colour is an exact match for size alone
+		mask = get_mask_for_attributes(index, {'Test Size': 'Small'}) & index.attribute_count_masks[1]
+		self.assertEqual(get_items_from_mask(index, mask), ['_Test Variant Small'])
+
+
 	def create_variant_item(self):
 		if not frappe.db.exists('Item', '_Test Variant Item 1'):
 			frappe.get_doc({
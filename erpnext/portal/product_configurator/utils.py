@@ -1,5 +1,6 @@
 import frappe
-from erpnext.portal.product_configurator.item_variants_cache import ItemVariantsCacheManager
+from erpnext.portal.product_configurator.item_variants_cache import (ItemVariantsCacheManager,
+	get_mask_for_attributes, get_items_from_mask)
 
 def get_field_filter_data():
 	product_settings = get_product_settings()
@@ -97,7 +98,9 @@ def get_products_html_for_website(field_filters=None, attribute_filters=None):
 
 
 def get_item_codes_by_attributes(attribute_filters, template_item_code=None):
-	items = []
+	wheres = []
+	query_values = []
+	attributes = set()
 
 	for attribute, values in attribute_filters.items():
 		attribute_values = values
@@ -107,51 +110,43 @@ def get_item_codes_by_attributes(attribute_filters, template_item_code=None):
 
 		if not attribute_values: continue
 
-		wheres = []
-		query_values = []
+		attributes.add(attribute)
 		for attribute_value in attribute_values:
-			wheres.append('( attribute = %s and attribute_value = %s )')
+			wheres.append('( t1.attribute = %s and t1.attribute_value = %s )')
 			query_values += [attribute, attribute_value]
 
-		attribute_query = ' or '.join(wheres)
+	if not attributes:
+		return []
 
-		if template_item_code:
-			variant_of_query = 'AND t2.variant_of = %s'
-			query_values.append(template_item_code)
-		else:
-			variant_of_query = ''
-
-		query = '''
-			SELECT
-				t1.parent
-			FROM
-				`tabItem Variant Attribute` t1
-			WHERE
-				1 = 1
-				AND (
-					{attribute_query}
-				)
-				AND EXISTS (
-					SELECT
-						1
-					FROM
-						`tabItem` t2
-					WHERE
-						t2.name = t1.parent
-						{variant_of_query}
-				)
-			GROUP BY
-				t1.parent
-			ORDER BY
-				NULL
-		'''.format(attribute_query=attribute_query, variant_of_query=variant_of_query)
-
-		item_codes = set([r[0] for r in frappe.db.sql(query, query_values)])
-		items.append(item_codes)
-
-	res = list(set.intersection(*items))
-
-	return res
+	if template_item_code:
+		variant_of_query = 'AND t2.variant_of = %s'
+		query_values.append(template_item_code)
+	else:
+		variant_of_query = ''
+
+	# a variant matches if it has one of the values for every filtered attribute
+	query_values.append(len(attributes))
+
+	query = '''
+		SELECT
+			t1.parent
+		FROM
+			`tabItem Variant Attribute` t1, `tabItem` t2
+		WHERE
+			t2.name = t1.parent
+			AND (
+				{attribute_query}
+			)
+			{variant_of_query}
+		GROUP BY
+			t1.parent
+		HAVING
+			count(distinct t1.attribute) = %s
+		ORDER BY
+			NULL
+	'''.format(attribute_query=' or '.join(wheres), variant_of_query=variant_of_query)
+
+	return [r[0] for r in frappe.db.sql(query, query_values)]
 
 
 @frappe.whitelist(allow_guest=True)
@@ -195,11 +190,12 @@ def get_next_attribute_and_values(item_code, selected_attributes):
 	selected_attributes = frappe.parse_json(selected_attributes)
 
 	item_cache = ItemVariantsCacheManager(item_code)
-	item_variants_data = item_cache.get_item_variants_data()
+	item_variants_index = item_cache.get_item_variants_index()
 
 	attributes = get_item_attributes(item_code)
 	attribute_list = [a.attribute for a in attributes]
-	filtered_items = get_items_with_selected_attributes(item_code, selected_attributes)
+	filtered_mask = get_mask_for_attributes(item_variants_index, selected_attributes)
+	filtered_items = set(get_items_from_mask(item_variants_index, filtered_mask))
 
 	next_attribute = None
 
@@ -218,19 +214,18 @@ def get_next_attribute_and_values(item_code, selected_attributes):
 			# already selected attribute values are valid options
 			valid_options_for_attributes[a].add(selected_attribute)
 
-	for row in item_variants_data:
-		item_code, attribute, attribute_value = row
-		if item_code in filtered_items and attribute not in selected_attributes and attribute in attribute_list:
+	for (attribute, attribute_value), mask in item_variants_index.attribute_value_masks.items():
+		if attribute not in selected_attributes and attribute in attribute_list and mask & filtered_mask:
 			valid_options_for_attributes[attribute].add(attribute_value)
 
 	optional_attributes = item_cache.get_optional_attributes()
 	exact_match = []
 	# search for exact match if all selected attributes are required attributes
 	if len(selected_attributes.keys()) >= (len(attribute_list) - len(optional_attributes)):
-		item_attribute_value_map = item_cache.get_item_attribute_value_map()
-		for item_code, attr_dict in item_attribute_value_map.items():
-			if item_code in filtered_items and set(attr_dict.keys()) == set(selected_attributes.keys()):
-				exact_match.append(item_code)
+		# filtered items have all the selected attributes, so an exact match is
+		# one that has no other attribute set
+		count_mask = item_variants_index.attribute_count_masks.get(len(selected_attributes), 0)
+		exact_match = get_items_from_mask(item_variants_index, filtered_mask & count_mask)
 
 	filtered_items_count = len(filtered_items)
 
@@ -255,15 +250,10 @@ def get_next_attribute_and_values(item_code, selected_attributes):
 
 
 def get_items_with_selected_attributes(item_code, selected_attributes):
-	item_cache = ItemVariantsCacheManager(item_code)
-	attribute_value_item_map = item_cache.get_attribute_value_item_map()
-
-	items = []
-	for attribute, value in selected_attributes.items():
-		filtered_items = attribute_value_item_map.get((attribute, value), [])
-		items.append(set(filtered_items))
+	item_variants_index = ItemVariantsCacheManager(item_code).get_item_variants_index()
+	mask = get_mask_for_attributes(item_variants_index, selected_attributes)
 
-	return set.intersection(*items)
+	return set(get_items_from_mask(item_variants_index, mask))
 
 
 def get_items_by_fields(field_filters):
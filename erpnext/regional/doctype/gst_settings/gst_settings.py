@@ -8,6 +8,7 @@ from frappe import _
 from frappe.utils import get_url, nowdate, date_diff
 from frappe.model.document import Document
 from frappe.contacts.doctype.contact.contact import get_default_contact
+from erpnext.regional.doctype.gst_tax_line.gst_tax_line import clear_gst_return_cache
 
 class EmailMissing(frappe.ValidationError): pass
 
@@ -19,6 +20,10 @@ class GSTSettings(Document):
 			from tabAddress where country = "India" and ifnull(gstin, '')!='' ''')
 		self.set_onload('data', data)
 
+	def on_update(self):
+		# cached GST returns depend on the accounts and B2C limit set here
+		clear_gst_return_cache()
+
 @frappe.whitelist()
 def send_reminder():
 	frappe.has_permission('GST Settings', throw=True)
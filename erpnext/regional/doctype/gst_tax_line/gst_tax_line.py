@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2019, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import json
+import hashlib
+from frappe.utils import cstr, flt, getdate
+from frappe.model.document import Document
+
+GST_VOUCHER_TYPES = ("Sales Invoice", "Purchase Invoice")
+
+class GSTTaxLine(Document):
+	pass
+
+def on_doctype_update():
+	frappe.db.add_index("GST Tax Line", ["voucher_type", "voucher_no"])
+	frappe.db.add_index("GST Tax Line", ["company", "posting_date"])
+
+def update_gst_tax_lines(doc, method=None):
+	'''Keep the per item tax lines of an invoice in sync with it, lines exist only while it is submitted'''
+	if frappe.get_cached_value("Company", doc.company, "country") != "India":
+		return
+
+	delete_gst_tax_lines(doc.doctype, doc.name)
+	if doc.docstatus == 1:
+		insert_gst_tax_lines(doc, doc.get("taxes"))
+
+	clear_gst_return_cache(doc.posting_date)
+
+def delete_gst_tax_lines(voucher_type, voucher_no):
+	frappe.db.sql("""delete from `tabGST Tax Line`
+		where voucher_type=%s and voucher_no=%s""", (voucher_type, voucher_no))
+
+def get_gst_tax_lines(taxes):
+	'''Returns one line per item and tax row from the `item_wise_tax_detail` of the tax rows,
+	and a line without item for the rows without it, so that their amount is still reported'''
+	lines = []
+	for tax in taxes or []:
+		try:
+			item_wise_tax_detail = json.loads(tax.item_wise_tax_detail or "{}")
+		except ValueError:
+			item_wise_tax_detail = {}
+
+		if not item_wise_tax_detail:
+			item_wise_tax_detail = {None: [0, 0]}
+
+		for item_code, tax_data in item_wise_tax_detail.items():
+			if isinstance(tax_data, list):
+				tax_rate, tax_amount = tax_data[0], tax_data[1]
+			else:
+				tax_rate, tax_amount = tax_data, 0
+
+			lines.append(frappe._dict({
+				"item_code": item_code,
+				"account_head": tax.account_head,
+				"description": tax.description,
+				"tax_rate": flt(tax_rate),
+				"tax_amount": flt(tax_amount),
+				"base_tax_amount_after_discount_amount": flt(tax.base_tax_amount_after_discount_amount)
+			}))
+
+	return lines
+
+def insert_gst_tax_lines(voucher, taxes):
+	lines = get_gst_tax_lines(taxes)
+	if not lines:
+		return
+
+	values = []
+	for d in lines:
+		name = hashlib.md5(frappe.safe_encode("\0".join([voucher.doctype, voucher.name,
+			cstr(d.item_code), cstr(d.account_head), cstr(len(values))]))).hexdigest()
+
+		values.append("({0})".format(", ".join([frappe.db.escape(cstr(value), percent=False) for value in
+			(name, voucher.doctype, voucher.name, voucher.company, getdate(voucher.posting_date),
+				d.item_code, d.account_head, d.description)]
+			+ [cstr(d.tax_rate), cstr(d.tax_amount), cstr(d.base_tax_amount_after_discount_amount)])))
+
+	frappe.db.sql("""insert into `tabGST Tax Line` (name, voucher_type, voucher_no, company,
+		posting_date, item_code, account_head, description, tax_rate, tax_amount,
+		base_tax_amount_after_discount_amount)
+		values {0}""".format(", ".join(values)))
+
+def rebuild_gst_tax_lines(batch_size=500):
+	'''Rebuild the tax lines of all submitted invoices of Indian companies'''
+	frappe.db.sql("delete from `tabGST Tax Line`")
+
+	companies = frappe.get_all("Company", filters={"country": "India"})
+	if not companies:
+		return
+
+	for doctype in GST_VOUCHER_TYPES:
+		tax_doctype = frappe.get_meta(doctype).get_field("taxes").options
+
+		start = 0
+		while True:
+			vouchers = frappe.get_all(doctype, fields=["name", "company", "posting_date"],
+				filters={"docstatus": 1, "company": ["in", [d.name for d in companies]]},
+				order_by="name", start=start, page_length=batch_size)
+			if not vouchers:
+				break
+
+			taxes = {}
+			for d in frappe.get_all(tax_doctype,
+				fields=["parent", "account_head", "description", "item_wise_tax_detail",
+					"base_tax_amount_after_discount_amount"],
+				filters={"parenttype": doctype, "parent": ["in", [v.name for v in vouchers]]},
+				order_by="idx"):
+				taxes.setdefault(d.parent, []).append(d)
+
+			for voucher in vouchers:
+				voucher.doctype = doctype
+				insert_gst_tax_lines(voucher, taxes.get(voucher.name))
+
+			frappe.db.commit()
+			start += batch_size
+
+	clear_gst_return_cache()
+
+def get_gst_return_cache_key(report_name, filters):
+	'''Returns the key the output of a GST return is cached under,
+	only for periods before the accounts frozen date, as those cannot change'''
+	frozen_upto = frappe.db.get_single_value("Accounts Settings", "acc_frozen_upto")
+	if not (frozen_upto and filters.get("to_date")
+		and getdate(filters.get("to_date")) <= getdate(frozen_upto)):
+		return None
+
+	return json.dumps([report_name, filters], sort_keys=True, default=cstr)
+
+def clear_gst_return_cache(posting_date=None):
+	'''Clear cached GST returns, if an entry before the frozen date (or settings) changed'''
+	if posting_date:
+		frozen_upto = frappe.db.get_single_value("Accounts Settings", "acc_frozen_upto")
+		if not frozen_upto or getdate(posting_date) > getdate(frozen_upto):
+			return
+
+	frappe.cache().delete_value("gst_return_cache")
+
+def clear_gst_return_cache_on_change(doc, method=None, *args):
+	'''Clear cached GST returns when a master they are built from changes,
+	like an address and its GSTIN, a party's GST category or an HSN code,
+	or when Accounts Settings change, as the frozen date may have moved'''
+	clear_gst_return_cache()
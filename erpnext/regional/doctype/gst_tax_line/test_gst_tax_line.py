@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2019, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+from __future__ import unicode_literals
+
+import frappe
+import json
+import unittest
+from frappe.utils import flt, nowdate
+from frappe.utils.xlsxutils import handle_html
+from erpnext.regional.india.utils import get_gst_accounts
+from erpnext.regional.doctype.gst_tax_line.gst_tax_line import get_gst_tax_lines, update_gst_tax_lines
+from erpnext.regional.doctype.gstr_3b_report.test_gstr_3b_report import make_company, set_account_heads, make_customers
+from erpnext.regional.report.gstr_1.gstr_1 import Gstr1Report
+from erpnext.regional.report.hsn_wise_summary_of_outward_supplies.hsn_wise_summary_of_outward_supplies import get_items, get_tax_accounts
+from erpnext.accounts.doctype.sales_invoice.test_sales_invoice import create_sales_invoice
+from erpnext.stock.doctype.item.test_item import make_item
+
+test_dependencies = ["Territory", "Customer Group", "Item"]
+
+class TestGSTTaxLine(unittest.TestCase):
+	def test_get_gst_tax_lines(self):
+		taxes = [
+			frappe._dict(account_head="CGST - _TC", description="CGST", base_tax_amount_after_discount_amount=121.5,
+				item_wise_tax_detail=json.dumps({"_Test Item": [9, 90], "_Test Item 2": [9, 45]})),
+			frappe._dict(account_head="SGST - _TC", description="SGST", base_tax_amount_after_discount_amount=81,
+				item_wise_tax_detail=json.dumps({"_Test Item": [9, 90]})),
+			frappe._dict(account_head="Freight - _TC", description="Freight", base_tax_amount_after_discount_amount=10,
+				item_wise_tax_detail=None),
+			frappe._dict(account_head="Cess - _TC", description="Cess", item_wise_tax_detail="{invalid")
+		]
+
+		# rows without item wise detail get a line without item, for their amount
+		lines = get_gst_tax_lines(taxes)
+		self.assertEqual(sorted([(d.account_head, d.item_code or "", d.tax_rate, d.tax_amount,
+			d.base_tax_amount_after_discount_amount) for d in lines]), [
+				("CGST - _TC", "_Test Item", 9, 90, 121.5),
+				("CGST - _TC", "_Test Item 2", 9, 45, 121.5),
+				("Cess - _TC", "", 0, 0, 0),
+				("Freight - _TC", "", 0, 0, 10),
+				("SGST - _TC", "_Test Item", 9, 90, 81)
+			])
+
+	def test_gst_returns_from_tax_lines(self):
+		frappe.set_user("Administrator")
+		make_company()
+		set_account_heads()
+		make_customers()
+
+		if not frappe.db.exists("GST HSN Code", "999800"):
+			frappe.get_doc({"doctype": "GST HSN Code", "hsn_code": "999800"}).insert()
+		make_item("_Test GST Tax Line Item", {"is_stock_item": 0, "gst_hsn_code": "999800"})
+
+		si = create_sales_invoice(company="_Test Company GST", customer="_Test GST Customer",
+			item="_Test GST Tax Line Item", warehouse="Finished Goods - _GST", debit_to="Debtors - _GST",
+			income_account="Sales - _GST", expense_account="Cost of Goods Sold - _GST",
+			cost_center="Main - _GST", do_not_save=1)
+
+		for account_head, description in (("CGST - _GST", "CGST @ 9.0"), ("SGST - _GST", "SGST @ 9.0")):
+			si.append("taxes", {"charge_type": "On Net Total", "account_head": account_head,
+				"cost_center": "Main - _GST", "description": description, "rate": 9})
+		si.append("taxes", {"charge_type": "Actual", "account_head": "IGST - _GST",
+			"cost_center": "Main - _GST", "description": "Round Off Tax", "tax_amount": 10})
+		si.submit()
+
+		# a tax row without item wise detail, like ones added by custom scripts
+		frappe.db.set_value("Sales Taxes and Charges", si.taxes[-1].name, "item_wise_tax_detail", None)
+		update_gst_tax_lines(frappe.get_doc("Sales Invoice", si.name))
+
+		taxes = frappe.get_all("Sales Taxes and Charges", filters={"parent": si.name, "parenttype": "Sales Invoice"},
+			fields=["parent", "account_head", "description", "item_wise_tax_detail",
+				"base_tax_amount_after_discount_amount"], order_by="account_head")
+
+		report = Gstr1Report({"company": "_Test Company GST", "from_date": nowdate(), "to_date": nowdate()})
+		report.gst_accounts = get_gst_accounts("_Test Company GST")
+		report.get_invoice_data()
+		report.get_invoice_items()
+		report.get_items_based_on_tax_rate()
+
+		items_based_on_tax_rate, invoice_cess = get_gstr_1_rates_from_tax_rows(taxes, report.gst_accounts)
+		self.assertEqual(report.items_based_on_tax_rate.get(si.name), items_based_on_tax_rate.get(si.name))
+		self.assertEqual(report.invoice_cess.get(si.name), invoice_cess.get(si.name))
+
+		item_list = [d for d in get_items(frappe._dict({"company": "_Test Company GST"})) if d.parent == si.name]
+		itemised_tax, tax_columns = get_tax_accounts(item_list, [], "INR")
+		expected_itemised_tax, expected_tax_columns = get_hsn_taxes_from_tax_rows(taxes, item_list)
+
+		self.assertEqual(tax_columns, expected_tax_columns)
+		self.assertIn("Round Off Tax", tax_columns)
+		for d in item_list:
+			self.assertEqual(itemised_tax.get(d.name), expected_itemised_tax.get(d.name))
+
+		si.cancel()
+
+def get_gstr_1_rates_from_tax_rows(taxes, gst_accounts):
+	'''GSTR-1 items by rate and cess, as computed from the tax rows before the tax lines'''
+	items_based_on_tax_rate, invoice_cess = {}, {}
+	for tax in taxes:
+		if tax.account_head in gst_accounts.cess_account:
+			invoice_cess.setdefault(tax.parent, tax.base_tax_amount_after_discount_amount)
+			continue
+
+		cgst_or_sgst = tax.account_head in gst_accounts.cgst_account + gst_accounts.sgst_account
+		if not tax.item_wise_tax_detail or not (cgst_or_sgst or tax.account_head in gst_accounts.igst_account):
+			continue
+
+		for item_code, tax_amounts in json.loads(tax.item_wise_tax_detail).items():
+			tax_rate = tax_amounts[0] * 2 if cgst_or_sgst else tax_amounts[0]
+			rate_based_items = items_based_on_tax_rate.setdefault(tax.parent, {}).setdefault(tax_rate, [])
+			if item_code not in rate_based_items:
+				rate_based_items.append(item_code)
+
+	return items_based_on_tax_rate, invoice_cess
+
+def get_hsn_taxes_from_tax_rows(taxes, item_list):
+	'''HSN summary tax columns and amounts per item row, as computed from the tax rows before the tax lines'''
+	itemised_tax, tax_columns = {}, []
+	for tax in sorted(taxes, key=lambda d: d.description):
+		description = handle_html(tax.description)
+		if description not in tax_columns and tax.base_tax_amount_after_discount_amount:
+			tax_columns.append(description)
+
+		for item_code, tax_data in json.loads(tax.item_wise_tax_detail or "{}").items():
+			for d in item_list:
+				if d.parent == tax.parent and d.item_code == item_code and tax_data[1]:
+					itemised_tax.setdefault(d.name, {})[description] = frappe._dict({"tax_amount": flt(tax_data[1], 2)})
+
+	return itemised_tax, sorted(tax_columns)
@@ -25,8 +25,13 @@ frappe.query_reports["DATEV"] = {
 	],
 	onload: function(query_report) {
 		query_report.page.add_inner_button("Download DATEV Export", () => {
-			const filters = JSON.stringify(query_report.get_values());
-			window.open(`/api/method/erpnext.regional.report.datev.datev.download_datev_csv?filters=${filters}`);
+			// prepared in the background, as the ledger of a year can be large
+			frappe.call({
+				method: "erpnext.regional.report.datev.datev.enqueue_datev_export",
+				args: {
+					filters: query_report.get_values()
+				}
+			});
 		});
 	}
 };
@@ -4,15 +4,21 @@ Provide a report and downloadable CSV according to the German DATEV format.
 
 - Query report showing only the columns that contain data, formatted nicely for
   dispay to the user.
-- CSV download functionality `download_datev_csv` that provides a CSV file with
-  all required columns. Used to import the data into the DATEV Software.
+- CSV export `enqueue_datev_export` that prepares a CSV file with all required
+  columns in the background. Used to import the data into the DATEV Software.
 """
 from __future__ import unicode_literals
+import csv
 import json
-from six import string_types
+import six
+from six import string_types, StringIO
 import frappe
 from frappe import _
-import pandas as pd
+from frappe.utils import getdate
+from erpnext.accounts.report.utils import write_report_file
+
+# number of entries read from the ledger at a time, when exporting
+GL_ENTRY_CHUNK_SIZE = 5000
 
 
 def execute(filters=None):
@@ -105,6 +111,12 @@ def get_gl_entries(filters, as_dict):
 	filters -- dict of filters to be passed to the sql query
 	as_dict -- return as list of dicts [0,1]
 	"""
+	conditions = ""
+	if "after_voucher_no" in filters:
+		conditions += " and gl.voucher_no > %(after_voucher_no)s"
+	if filters.get("upto_voucher_no"):
+		conditions += " and gl.voucher_no <= %(upto_voucher_no)s"
+
 	gl_entries = frappe.db.sql("""
 		select
 
@@ -151,13 +163,206 @@ def get_gl_entries(filters, as_dict):
 			on pa.account = acc_against_pa.name
 
 		where gl.company = %(company)s 
-		and DATE(gl.posting_date) >= %(from_date)s
-		and DATE(gl.posting_date) <= %(to_date)s
-		order by 'Belegdatum', gl.voucher_no""", filters, as_dict=as_dict)
+		and gl.posting_date >= %(from_date)s
+		and gl.posting_date <= %(to_date)s
+		{conditions}
+		order by 'Belegdatum', gl.voucher_no""".format(conditions=conditions), filters, as_dict=as_dict)
 
 	return gl_entries
 
 
+def iterate_gl_entries(filters, chunk_size=GL_ENTRY_CHUNK_SIZE):
+	"""
+	Yield the accounting entries in chunks of whole vouchers.
+
+	Each chunk holds the vouchers of about `chunk_size` entries, in the order of
+	`get_gl_entries`, so that ledgers of any size can be exported.
+
+	Arguments:
+	filters -- dict of filters to be passed to the sql query
+	chunk_size -- number of entries to read at a time
+	"""
+	chunk_filters = dict(filters, after_voucher_no="")
+
+	while True:
+		# last voucher of the next chunk
+		upto = frappe.db.sql("""
+			select voucher_no from `tabGL Entry`
+			where company = %(company)s
+			and posting_date >= %(from_date)s
+			and posting_date <= %(to_date)s
+			and voucher_no > %(after_voucher_no)s
+			order by voucher_no
+			limit %(offset)s, 1""", dict(chunk_filters, offset=chunk_size - 1))
+
+		chunk_filters["upto_voucher_no"] = upto[0][0] if upto else None
+
+		gl_entries = get_gl_entries(chunk_filters, as_dict=1)
+		if gl_entries:
+			yield gl_entries
+
+		if not upto:
+			break
+
+		chunk_filters["after_voucher_no"] = upto[0][0]
+
+
+DATEV_COLUMNS = [
+	# All possible columns must tbe listed here, because DATEV requires them to
+	# be present in the CSV.
+	# ---
+	# Umsatz
+	"Umsatz (ohne Soll/Haben-Kz)",
+	"Soll/Haben-Kennzeichen",
+	"WKZ Umsatz",
+	"Kurs",
+	"Basis-Umsatz",
+	"WKZ Basis-Umsatz",
+	# Konto/Gegenkonto
+	"Kontonummer",
+	"Gegenkonto (ohne BU-Schlüssel)",
+	"BU-Schlüssel",
+	# Datum
+	"Belegdatum",
+	# Belegfelder
+	"Belegfeld 1",
+	"Belegfeld 2",
+	# Weitere Felder
+	"Skonto",
+	"Buchungstext",
+	# OPOS-Informationen
+	"Postensperre",
+	"Diverse Adressnummer",
+	"Geschäftspartnerbank",
+	"Sachverhalt",
+	"Zinssperre",
+	# Digitaler Beleg
+	"Beleglink",
+	# Beleginfo
+	"Beleginfo - Art 1",
+	"Beleginfo - Inhalt 1",
+	"Beleginfo - Art 2",
+	"Beleginfo - Inhalt 2",
+	"Beleginfo - Art 3",
+	"Beleginfo - Inhalt 3",
+	"Beleginfo - Art 4",
+	"Beleginfo - Inhalt 4",
+	"Beleginfo - Art 5",
+	"Beleginfo - Inhalt 5",
+	"Beleginfo - Art 6",
+	"Beleginfo - Inhalt 6",
+	"Beleginfo - Art 7",
+	"Beleginfo - Inhalt 7",
+	"Beleginfo - Art 8",
+	"Beleginfo - Inhalt 8",
+	# Kostenrechnung
+	"Kost 1 - Kostenstelle",
+	"Kost 2 - Kostenstelle",
+	"Kost-Menge",
+	# Steuerrechnung
+	"EU-Land u. UStID",
+	"EU-Steuersatz",
+	"Abw. Versteuerungsart",
+	# L+L Sachverhalt
+	"Sachverhalt L+L",
+	"Funktionsergänzung L+L",
+	# Funktion Steuerschlüssel 49
+	"BU 49 Hauptfunktionstyp",
+	"BU 49 Hauptfunktionsnummer",
+	"BU 49 Funktionsergänzung",
+	# Zusatzinformationen
+	"Zusatzinformation - Art 1",
+	"Zusatzinformation - Inhalt 1",
+	"Zusatzinformation - Art 2",
+	"Zusatzinformation - Inhalt 2",
+	"Zusatzinformation - Art 3",
+	"Zusatzinformation - Inhalt 3",
+	"Zusatzinformation - Art 4",
+	"Zusatzinformation - Inhalt 4",
+	"Zusatzinformation - Art 5",
+	"Zusatzinformation - Inhalt 5",
+	"Zusatzinformation - Art 6",
+	"Zusatzinformation - Inhalt 6",
+	"Zusatzinformation - Art 7",
+	"Zusatzinformation - Inhalt 7",
+	"Zusatzinformation - Art 8",
+	"Zusatzinformation - Inhalt 8",
+	"Zusatzinformation - Art 9",
+	"Zusatzinformation - Inhalt 9",
+	"Zusatzinformation - Art 10",
+	"Zusatzinformation - Inhalt 10",
+	"Zusatzinformation - Art 11",
+	"Zusatzinformation - Inhalt 11",
+	"Zusatzinformation - Art 12",
+	"Zusatzinformation - Inhalt 12",
+	"Zusatzinformation - Art 13",
+	"Zusatzinformation - Inhalt 13",
+	"Zusatzinformation - Art 14",
+	"Zusatzinformation - Inhalt 14",
+	"Zusatzinformation - Art 15",
+	"Zusatzinformation - Inhalt 15",
+	"Zusatzinformation - Art 16",
+	"Zusatzinformation - Inhalt 16",
+	"Zusatzinformation - Art 17",
+	"Zusatzinformation - Inhalt 17",
+	"Zusatzinformation - Art 18",
+	"Zusatzinformation - Inhalt 18",
+	"Zusatzinformation - Art 19",
+	"Zusatzinformation - Inhalt 19",
+	"Zusatzinformation - Art 20",
+	"Zusatzinformation - Inhalt 20",
+	# Mengenfelder LuF
+	"Stück",
+	"Gewicht",
+	# Forderungsart
+	"Zahlweise",
+	"Forderungsart",
+	"Veranlagungsjahr",
+	"Zugeordnete Fälligkeit",
+	# Weitere Felder
+	"Skontotyp",
+	# Anzahlungen
+	"Auftragsnummer",
+	"Buchungstyp",
+	"USt-Schlüssel (Anzahlungen)",
+	"EU-Land (Anzahlungen)",
+	"Sachverhalt L+L (Anzahlungen)",
+	"EU-Steuersatz (Anzahlungen)",
+	"Erlöskonto (Anzahlungen)",
+	# Stapelinformationen
+	"Herkunft-Kz",
+	# Technische Identifikation
+	"Buchungs GUID",
+	# Kostenrechnung
+	"Kost-Datum",
+	# OPOS-Informationen
+	"SEPA-Mandatsreferenz",
+	"Skontosperre",
+	# Gesellschafter und Sonderbilanzsachverhalt
+	"Gesellschaftername",
+	"Beteiligtennummer",
+	"Identifikationsnummer",
+	"Zeichnernummer",
+	# OPOS-Informationen
+	"Postensperre bis",
+	# Gesellschafter und Sonderbilanzsachverhalt
+	"Bezeichnung SoBil-Sachverhalt",
+	"Kennzeichen SoBil-Buchung",
+	# Stapelinformationen
+	"Festschreibung",
+	# Datum
+	"Leistungsdatum",
+	"Datum Zuord. Steuerperiode",
+	# OPOS-Informationen
+	"Fälligkeit",
+	# Konto/Gegenkonto
+	"Generalumkehr (GU)",
+	# Steuersatz für Steuerschlüssel
+	"Steuersatz",
+	"Land"
+]
+
+
 def get_datev_csv(data):
 	"""
 	Fill in missing columns and return a CSV in DATEV Format.
@@ -165,194 +370,99 @@ def get_datev_csv(data):
 	Arguments:
 	data -- array of dictionaries
 	"""
-	columns = [
-		# All possible columns must tbe listed here, because DATEV requires them to
-		# be present in the CSV.
-		# ---
-		# Umsatz
-		"Umsatz (ohne Soll/Haben-Kz)",
-		"Soll/Haben-Kennzeichen",
-		"WKZ Umsatz",
-		"Kurs",
-		"Basis-Umsatz",
-		"WKZ Basis-Umsatz",
-		# Konto/Gegenkonto
-		"Kontonummer",
-		"Gegenkonto (ohne BU-Schlüssel)",
-		"BU-Schlüssel",
-		# Datum
-		"Belegdatum",
-		# Belegfelder
-		"Belegfeld 1",
-		"Belegfeld 2",
-		# Weitere Felder
-		"Skonto",
-		"Buchungstext",
-		# OPOS-Informationen
-		"Postensperre",
-		"Diverse Adressnummer",
-		"Geschäftspartnerbank",
-		"Sachverhalt",
-		"Zinssperre",
-		# Digitaler Beleg
-		"Beleglink",
-		# Beleginfo
-		"Beleginfo - Art 1",
-		"Beleginfo - Inhalt 1",
-		"Beleginfo - Art 2",
-		"Beleginfo - Inhalt 2",
-		"Beleginfo - Art 3",
-		"Beleginfo - Inhalt 3",
-		"Beleginfo - Art 4",
-		"Beleginfo - Inhalt 4",
-		"Beleginfo - Art 5",
-		"Beleginfo - Inhalt 5",
-		"Beleginfo - Art 6",
-		"Beleginfo - Inhalt 6",
-		"Beleginfo - Art 7",
-		"Beleginfo - Inhalt 7",
-		"Beleginfo - Art 8",
-		"Beleginfo - Inhalt 8",
-		# Kostenrechnung
-		"Kost 1 - Kostenstelle",
-		"Kost 2 - Kostenstelle",
-		"Kost-Menge",
-		# Steuerrechnung
-		"EU-Land u. UStID",
-		"EU-Steuersatz",
-		"Abw. Versteuerungsart",
-		# L+L Sachverhalt
-		"Sachverhalt L+L",
-		"Funktionsergänzung L+L",
-		# Funktion Steuerschlüssel 49
-		"BU 49 Hauptfunktionstyp",
-		"BU 49 Hauptfunktionsnummer",
-		"BU 49 Funktionsergänzung",
-		# Zusatzinformationen
-		"Zusatzinformation - Art 1",
-		"Zusatzinformation - Inhalt 1",
-		"Zusatzinformation - Art 2",
-		"Zusatzinformation - Inhalt 2",
-		"Zusatzinformation - Art 3",
-		"Zusatzinformation - Inhalt 3",
-		"Zusatzinformation - Art 4",
-		"Zusatzinformation - Inhalt 4",
-		"Zusatzinformation - Art 5",
-		"Zusatzinformation - Inhalt 5",
-		"Zusatzinformation - Art 6",
-		"Zusatzinformation - Inhalt 6",
-		"Zusatzinformation - Art 7",
-		"Zusatzinformation - Inhalt 7",
-		"Zusatzinformation - Art 8",
-		"Zusatzinformation - Inhalt 8",
-		"Zusatzinformation - Art 9",
-		"Zusatzinformation - Inhalt 9",
-		"Zusatzinformation - Art 10",
-		"Zusatzinformation - Inhalt 10",
-		"Zusatzinformation - Art 11",
-		"Zusatzinformation - Inhalt 11",
-		"Zusatzinformation - Art 12",
-		"Zusatzinformation - Inhalt 12",
-		"Zusatzinformation - Art 13",
-		"Zusatzinformation - Inhalt 13",
-		"Zusatzinformation - Art 14",
-		"Zusatzinformation - Inhalt 14",
-		"Zusatzinformation - Art 15",
-		"Zusatzinformation - Inhalt 15",
-		"Zusatzinformation - Art 16",
-		"Zusatzinformation - Inhalt 16",
-		"Zusatzinformation - Art 17",
-		"Zusatzinformation - Inhalt 17",
-		"Zusatzinformation - Art 18",
-		"Zusatzinformation - Inhalt 18",
-		"Zusatzinformation - Art 19",
-		"Zusatzinformation - Inhalt 19",
-		"Zusatzinformation - Art 20",
-		"Zusatzinformation - Inhalt 20",
-		# Mengenfelder LuF
-		"Stück",
-		"Gewicht",
-		# Forderungsart
-		"Zahlweise",
-		"Forderungsart",
-		"Veranlagungsjahr",
-		"Zugeordnete Fälligkeit",
-		# Weitere Felder
-		"Skontotyp",
-		# Anzahlungen
-		"Auftragsnummer",
-		"Buchungstyp",
-		"USt-Schlüssel (Anzahlungen)",
-		"EU-Land (Anzahlungen)",
-		"Sachverhalt L+L (Anzahlungen)",
-		"EU-Steuersatz (Anzahlungen)",
-		"Erlöskonto (Anzahlungen)",
-		# Stapelinformationen
-		"Herkunft-Kz",
-		# Technische Identifikation
-		"Buchungs GUID",
-		# Kostenrechnung
-		"Kost-Datum",
-		# OPOS-Informationen
-		"SEPA-Mandatsreferenz",
-		"Skontosperre",
-		# Gesellschafter und Sonderbilanzsachverhalt
-		"Gesellschaftername",
-		"Beteiligtennummer",
-		"Identifikationsnummer",
-		"Zeichnernummer",
-		# OPOS-Informationen
-		"Postensperre bis",
-		# Gesellschafter und Sonderbilanzsachverhalt
-		"Bezeichnung SoBil-Sachverhalt",
-		"Kennzeichen SoBil-Buchung",
-		# Stapelinformationen
-		"Festschreibung",
-		# Datum
-		"Leistungsdatum",
-		"Datum Zuord. Steuerperiode",
-		# OPOS-Informationen
-		"Fälligkeit",
-		# Konto/Gegenkonto
-		"Generalumkehr (GU)",
-		# Steuersatz für Steuerschlüssel
-		"Steuersatz",
-		"Land"
-	]
+	return get_csv_lines([DATEV_COLUMNS]) + get_csv_lines([get_datev_row(d) for d in data])
+
+
+def get_datev_row(entry):
+	"""
+	Return the values of all DATEV columns for an accounting entry, as text.
 
-	empty_df = pd.DataFrame(columns=columns)
-	data_df = pd.DataFrame.from_records(data)
-
-	result = empty_df.append(data_df)
-	result["Belegdatum"] = pd.to_datetime(result["Belegdatum"])
-
-	return result.to_csv(
-		sep=b';',
-		# European decimal seperator
-		decimal=',',
-		# Windows "ANSI" encoding
-		encoding='latin_1',
-		# format date as DDMM
-		date_format='%d%m',
-		# Windows line terminator
-		line_terminator=b'\r\n',
-		# Do not number rows
-		index=False,
-		# Use all columns defined above
-		columns=columns
+	Arguments:
+	entry -- dict of values by column, as returned by `get_gl_entries`
+	"""
+	row = []
+	for column in DATEV_COLUMNS:
+		value = entry.get(column)
+
+		if value is None:
+			value = ""
+		elif column == "Umsatz (ohne Soll/Haben-Kz)":
+			# European decimal seperator
+			value = repr(float(value)).replace(".", ",")
+		elif column == "Belegdatum":
+			# format date as DDMM
+			value = getdate(value).strftime("%d%m")
+
+		row.append(value)
+
+	return row
+
+
+def get_csv_lines(rows):
+	"""Return the rows as CSV text, separated by semicolons with Windows line terminators."""
+	out = StringIO()
+	writer = csv.writer(out, delimiter=str(";"), lineterminator=str("\r\n"))
+
+	for row in rows:
+		if six.PY2:
+			row = [frappe.safe_encode(value) for value in row]
+		writer.writerow(row)
+
+	return frappe.safe_decode(out.getvalue())
+
+
+def write_datev_csv(filters, write):
+	"""
+	Write the accounting entries in DATEV format, a chunk of entries at a time.
+
+	Arguments:
+	filters -- dict of filters to be passed to the sql query
+	write -- function writing text to the output
+	"""
+	write(get_csv_lines([DATEV_COLUMNS]))
+
+	for gl_entries in iterate_gl_entries(filters):
+		write(get_csv_lines([get_datev_row(d) for d in gl_entries]))
+
+
+def validate_export_permission(filters):
+	"""Only users who can read the ledger of the company may export it."""
+	frappe.has_permission('GL Entry', throw=True)
+	frappe.has_permission('Company', doc=filters.get('company'), throw=True)
+
+
+def get_datev_filename(filters):
+	return 'DATEV_Buchungsstapel_{}-{}_bis_{}'.format(
+		filters.get('company'),
+		filters.get('from_date'),
+		filters.get('to_date')
 	)
 
 
 @frappe.whitelist()
 def download_datev_csv(filters=None):
 	"""
-	Provide accounting entries for download in DATEV format.
-
-	Validate the filters, get the data, produce the CSV file and provide it for
-	download. Can be called like this:
+	Kept for existing callers of
 
 	GET /api/method/erpnext.regional.report.datev.datev.download_datev_csv
 
+	The CSV is no longer built in the request, but prepared in the background
+	by `enqueue_datev_export`.
+
+	Arguments / Params:
+	filters -- dict of filters to be passed to the sql query
+	"""
+	enqueue_datev_export(filters)
+
+
+@frappe.whitelist()
+def enqueue_datev_export(filters=None):
+	"""
+	Prepare the DATEV export of a large ledger in the background.
+
+	The CSV file is attached as a private File and the user is notified with a
+	link to it when done.
+
 	Arguments / Params:
 	filters -- dict of filters to be passed to the sql query
 	"""
@@ -360,14 +470,18 @@ def download_datev_csv(filters=None):
 		filters = json.loads(filters)
 
 	validate_filters(filters)
-	data = get_gl_entries(filters, as_dict=1)
+	validate_export_permission(filters)
 
-	filename = 'DATEV_Buchungsstapel_{}-{}_bis_{}'.format(
-		filters.get('company'),
-		filters.get('from_date'),
-		filters.get('to_date')
-	)
+	frappe.enqueue('erpnext.regional.report.datev.datev.export_datev_csv',
+		queue='long', timeout=6000, filters=filters, user=frappe.session.user)
+
+	frappe.msgprint(_('The DATEV export is being prepared. You will be notified when it is ready.'))
+
+
+def export_datev_csv(filters, user):
+	"""Write the DATEV CSV to a private File and notify the user."""
+	_file = write_report_file(get_datev_filename(filters) + '.csv',
+		lambda write: write_datev_csv(filters, write))
 
-	frappe.response['result'] = get_datev_csv(data)
-	frappe.response['doctype'] = filename
-	frappe.response['type'] = 'csv'
+	frappe.publish_realtime('msgprint', _('DATEV export is ready: {0}').format(
+		'<a href="{0}" target="_blank">{1}</a>'.format(_file.file_url, _file.file_name)), user=user)
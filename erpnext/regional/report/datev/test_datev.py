@@ -0,0 +1,77 @@
+# coding: utf-8
+from __future__ import unicode_literals
+import frappe
+import unittest
+from datetime import date
+from frappe.utils import today, add_days
+from erpnext.regional.report.datev.datev import (DATEV_COLUMNS, get_datev_csv, get_gl_entries,
+	iterate_gl_entries)
+
+class TestDatev(unittest.TestCase):
+	def test_datev_csv(self):
+		entries = [{
+			"Umsatz (ohne Soll/Haben-Kz)": 1190.0,
+			"Soll/Haben-Kennzeichen": "S",
+			"Kontonummer": "10000",
+			"Gegenkonto (ohne BU-Schlüssel)": "8400",
+			"Belegdatum": date(2019, 3, 5),
+			"Buchungstext": "Invoice; shipped",
+			"Beleginfo - Art 1": "Sales Invoice",
+			"Beleginfo - Inhalt 1": "SINV-00001",
+			"Beleginfo - Art 2": None,
+			"Beleginfo - Inhalt 2": None
+		}, {
+			"Umsatz (ohne Soll/Haben-Kz)": 0.5,
+			"Soll/Haben-Kennzeichen": "H",
+			"Kontonummer": "8400",
+			"Gegenkonto (ohne BU-Schlüssel)": None,
+			"Belegdatum": date(2019, 12, 31),
+			"Buchungstext": 'Say "hi"',
+			"Beleginfo - Art 1": "Journal Entry",
+			"Beleginfo - Inhalt 1": "JV-00002",
+			"Beleginfo - Art 2": "Sales Invoice",
+			"Beleginfo - Inhalt 2": "SINV-00001"
+		}]
+
+		# the output of the pandas based export for the same entries
+		expected_rows = [
+			{
+				"Umsatz (ohne Soll/Haben-Kz)": "1190,0",
+				"Soll/Haben-Kennzeichen": "S",
+				"Kontonummer": "10000",
+				"Gegenkonto (ohne BU-Schlüssel)": "8400",
+				"Belegdatum": "0503",
+				"Buchungstext": '"Invoice; shipped"',
+				"Beleginfo - Art 1": "Sales Invoice",
+				"Beleginfo - Inhalt 1": "SINV-00001"
+			}, {
+				"Umsatz (ohne Soll/Haben-Kz)": "0,5",
+				"Soll/Haben-Kennzeichen": "H",
+				"Kontonummer": "8400",
+				"Belegdatum": "3112",
+				"Buchungstext": '"Say ""hi"""',
+				"Beleginfo - Art 1": "Journal Entry",
+				"Beleginfo - Inhalt 1": "JV-00002",
+				"Beleginfo - Art 2": "Sales Invoice",
+				"Beleginfo - Inhalt 2": "SINV-00001"
+			}
+		]
+
+		expected = ";".join(DATEV_COLUMNS) + "\r\n"
+		for row in expected_rows:
+			expected += ";".join([row.get(column, "") for column in DATEV_COLUMNS]) + "\r\n"
+
+		self.assertEqual(get_datev_csv(entries), expected)
+
+	def test_chunks_of_entries(self):
+		filters = frappe._dict({
+			"company": "_Test Company",
+			"from_date": add_days(today(), -365),
+			"to_date": today()
+		})
+
+		entries = []
+		for chunk in iterate_gl_entries(filters, chunk_size=2):
+			entries.extend(chunk)
+
+		self.assertEqual(get_datev_csv(entries), get_datev_csv(get_gl_entries(filters, as_dict=1)))
@@ -8,6 +8,8 @@ import re
 from frappe import _
 from frappe.utils import nowdate
 
+account_list = ["cgst_account", "sgst_account", "igst_account", "cess_account"]
+
 def execute(filters=None):
 	if not filters: filters.setdefault('posting_date', [nowdate(), nowdate()])
 	columns, data = [], []
@@ -43,9 +45,12 @@ def get_data(filters):
 	# Regular expression set to remove all the special characters
 	special_characters = "[$%^*()+\\[\]{};':\"\\|<>.?]"
 
+	item_wise_taxes = get_item_wise_taxes(list(set([row.dn_id for row in data])))
+	gst_accounts = get_gst_accounts(filters) if data else None
+
 	for row in data:
 		set_defaults(row)
-		set_taxes(row, filters)
+		set_taxes(row, item_wise_taxes.get(row.dn_id, {}), gst_accounts)
 		set_address_details(row, special_characters)
 
 		# Eway Bill accepts date as dd/mm/yyyy and not dd-mm-yyyy
@@ -103,14 +108,25 @@ def set_address_details(row, special_characters):
 		row.update({'to_state': state and state.upper() or ''})
 		row.update({'ship_to_state': row.to_state})
 
-def set_taxes(row, filters):
+def get_item_wise_taxes(delivery_notes):
+	'''Returns the parsed item wise tax detail of each tax row, by delivery note and account'''
+	item_wise_taxes = {}
+	if not delivery_notes:
+		return item_wise_taxes
+
 	taxes = frappe.get_list("Sales Taxes and Charges",
 				filters={
-					'parent': row.dn_id
+					'parent': ('in', delivery_notes),
+					'parenttype': 'Delivery Note'
 				},
-				fields=('item_wise_tax_detail', 'account_head'))
+				fields=('parent', 'item_wise_tax_detail', 'account_head'))
+
+	for tax in taxes:
+		item_wise_taxes.setdefault(tax.parent, {})[tax.account_head] = json.loads(tax.item_wise_tax_detail)
+
+	return item_wise_taxes
 
-	account_list = ["cgst_account", "sgst_account", "igst_account", "cess_account"]
+def get_gst_accounts(filters):
 	taxes_list = frappe.get_list("GST Account",
 		filters={
 			"parent": "GST Settings",
@@ -121,15 +137,16 @@ def set_taxes(row, filters):
 	if not taxes_list:
 		frappe.throw(_("Please set GST Accounts in GST Settings"))
 
+	return taxes_list[0]
+
+def set_taxes(row, item_wise_taxes, tax):
 	item_tax_rate = {}
 
-	for tax in taxes:
-		item_wise_tax = json.loads(tax.item_wise_tax_detail)
-		item_tax_rate[tax.account_head] = item_wise_tax.get(row.item_code)
+	for account_head, item_wise_tax in item_wise_taxes.items():
+		item_tax_rate[account_head] = item_wise_tax.get(row.item_code)
 
 	tax_rate = []
 
-	tax = taxes_list[0]
 	for key in account_list:
 		if tax[key] not in item_tax_rate.keys():
 			item_tax_rate[tax[key]] = [0.0, 0.0]
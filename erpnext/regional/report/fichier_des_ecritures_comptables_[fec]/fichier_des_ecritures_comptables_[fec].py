@@ -3,10 +3,16 @@
 
 from __future__ import unicode_literals
 import frappe
+import json
+from six import string_types
 from frappe.utils import format_datetime
 from frappe import _
+from erpnext.accounts.report.utils import write_report_file
 import re
 
+# number of entries read from the ledger at a time, when exporting
+GL_ENTRY_CHUNK_SIZE = 5000
+
 def execute(filters=None):
 	account_details = {}
 	for acc in frappe.db.sql("""select name, is_group from tabAccount""", as_dict=1):
@@ -64,6 +70,8 @@ def get_result(filters):
 
 def get_gl_entries(filters):
 
+	conditions = get_chunk_conditions(filters)
+
 	group_by_condition = "group by voucher_type, voucher_no, account" \
 		if filters.get("group_by_voucher") else "group by gl.name"
 
@@ -96,18 +104,60 @@ def get_gl_entries(filters):
 			left join `tabStudent` stu on gl.party = stu.name
 			left join `tabMember` mem on gl.party = mem.name
 		where gl.company=%(company)s and gl.fiscal_year=%(fiscal_year)s
+		{conditions}
 		{group_by_condition}
 		order by GlPostDate, voucher_no"""\
-		.format(group_by_condition=group_by_condition), filters, as_dict=1)
+		.format(conditions=conditions, group_by_condition=group_by_condition), filters, as_dict=1)
 
 	return gl_entries
 
 
-def get_result_as_list(data, filters):
+def get_chunk_conditions(filters):
+	conditions = ""
+
+	if filters.get("after_posting_date"):
+		conditions += """ and (gl.posting_date > %(after_posting_date)s
+			or (gl.posting_date = %(after_posting_date)s and gl.voucher_no > %(after_voucher_no)s))"""
+
+	if filters.get("upto_posting_date"):
+		conditions += """ and (gl.posting_date < %(upto_posting_date)s
+			or (gl.posting_date = %(upto_posting_date)s and gl.voucher_no <= %(upto_voucher_no)s))"""
+
+	return conditions
+
+
+def iterate_gl_entries(filters, chunk_size=GL_ENTRY_CHUNK_SIZE):
+	"""Yield the entries of `get_gl_entries` in chunks of whole vouchers, in the same order"""
+	chunk_filters = frappe._dict(filters)
+
+	while True:
+		# posting date and last voucher of the next chunk
+		upto = frappe.db.sql("""
+			select posting_date, voucher_no from `tabGL Entry` gl
+			where gl.company=%(company)s and gl.fiscal_year=%(fiscal_year)s
+			{conditions}
+			order by posting_date, voucher_no
+			limit %(offset)s, 1""".format(conditions=get_chunk_conditions(chunk_filters)),
+			dict(chunk_filters, offset=chunk_size - 1))
+
+		chunk_filters.upto_posting_date, chunk_filters.upto_voucher_no = upto[0] if upto else (None, None)
+
+		gl_entries = get_gl_entries(chunk_filters)
+		if gl_entries:
+			yield gl_entries
+
+		if not upto:
+			break
+
+		chunk_filters.after_posting_date, chunk_filters.after_voucher_no = upto[0]
+
+
+def get_result_as_list(data, filters, account_numbers=None):
 	result = []
 
 	company_currency = frappe.get_cached_value('Company',  filters.company,  "default_currency")
-	accounts = frappe.get_all("Account", filters={"Company": filters.company}, fields=["name", "account_number"])
+	if account_numbers is None:
+		account_numbers = get_account_numbers(filters.company)
 
 	for d in data:
 
@@ -120,9 +170,9 @@ def get_result_as_list(data, filters):
 
 		EcritureDate = format_datetime(d.get("GlPostDate"), "yyyyMMdd")
 
-		account_number = [account.account_number for account in accounts if account.name == d.get("account")]
-		if account_number[0] is not None:
-			CompteNum =  account_number[0]
+		account_number = account_numbers.get(d.get("account"))
+		if account_number is not None:
+			CompteNum =  account_number
 		else:
 			frappe.throw(_("Account number for account {0} is not available.<br> Please setup your Chart of Accounts correctly.").format(d.get("account")))
 
@@ -187,3 +237,55 @@ def get_result_as_list(data, filters):
 		result.append(row)
 
 	return result
+
+
+def get_account_numbers(company):
+	return dict(frappe.db.sql("""select name, account_number from tabAccount
+		where company=%s""", company))
+
+
+def write_fec_file(filters, write):
+	"""Write the entries tab separated, a chunk of entries at a time, the same as the export from the report"""
+	write("\t".join([column.split(":")[0] for column in get_columns(filters)]))
+
+	account_numbers = get_account_numbers(filters.company)
+	for gl_entries in iterate_gl_entries(filters):
+		write(get_fec_lines(get_result_as_list(gl_entries, filters, account_numbers)))
+
+
+def get_fec_lines(rows):
+	"""Rows as tab separated lines, each after a newline"""
+	return "".join("\n" + "\t".join(["" if value is None else value for value in row]) for row in rows)
+
+
+@frappe.whitelist()
+def enqueue_fec_export(filters):
+	"""Prepare the FEC export in the background and notify the user with a link to the file"""
+	if isinstance(filters, string_types):
+		filters = json.loads(filters)
+
+	filters = frappe._dict(filters)
+	validate_filters(filters, {})
+
+	frappe.has_permission("GL Entry", throw=True)
+	frappe.has_permission("Company", doc=filters.company, throw=True)
+
+	if not frappe.db.get_value("Company", filters.company, "siren_number"):
+		frappe.throw(_("Please register the SIREN number in the company information file"))
+
+	frappe.enqueue("erpnext.regional.report.fichier_des_ecritures_comptables_[fec].fichier_des_ecritures_comptables_[fec].export_fec_file",
+		queue="long", timeout=6000, filters=filters, user=frappe.session.user)
+
+	frappe.msgprint(_("The FEC export is being prepared. You will be notified when it is ready."))
+
+
+def export_fec_file(filters, user):
+	filters = set_account_currency(frappe._dict(filters))
+
+	file_name = "{0}FEC{1}.txt".format(frappe.db.get_value("Company", filters.company, "siren_number"),
+		format_datetime(frappe.db.get_value("Fiscal Year", filters.fiscal_year, "year_end_date"), "yyyyMMdd"))
+
+	_file = write_report_file(file_name, lambda write: write_fec_file(filters, write))
+
+	frappe.publish_realtime("msgprint", _("FEC export is ready: {0}").format(
+		'<a href="{0}" target="_blank">{1}</a>'.format(_file.file_url, _file.file_name)), user=user)
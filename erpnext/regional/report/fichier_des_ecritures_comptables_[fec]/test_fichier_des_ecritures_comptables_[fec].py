@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+import unittest
+from datetime import date
+
+fec = frappe.get_module("erpnext.regional.report.fichier_des_ecritures_comptables_[fec].fichier_des_ecritures_comptables_[fec]")
+
+class TestFEC(unittest.TestCase):
+	def test_fec_lines(self):
+		filters = frappe._dict({"company": "_Test Company", "fiscal_year": "_Test Fiscal Year 2019"})
+		gl_entries = [frappe._dict({
+			"GlPostDate": date(2019, 3, 5),
+			"account": "Debtors - _TC",
+			"debit": 100.0, "credit": 0.0, "debitCurr": 100.0, "creditCurr": 0.0,
+			"voucher_type": "Sales Invoice",
+			"voucher_no": "ACC-SINV-2019-00001",
+			"account_currency": "INR",
+			"party_type": "Customer",
+			"cusName": "_Test Customer",
+			"customer_name": "_Test Customer",
+			"InvTitle": "_Test Customer"
+		}), frappe._dict({
+			"GlPostDate": date(2019, 3, 6),
+			"account": "Sales - _TC",
+			"debit": 0.0, "credit": 100.0, "debitCurr": 0.0, "creditCurr": 100.0,
+			"voucher_type": "Journal Entry",
+			"voucher_no": "JV00002",
+			"account_currency": "INR"
+		})]
+
+		rows = fec.get_result_as_list(gl_entries, filters,
+			{"Debtors - _TC": "4110", "Sales - _TC": "7010"})
+
+		# what the report used to export from the browser for the same entries
+		expected = ("\nACC\tSales Invoice\tSINV\t20190305\t4110\tDebtors - _TC\t_Test Customer\t_Test Customer"
+			"\tACC-SINV-2019-00001\t20190305\t_Test Customer\t100,00\t0,00\t\t\t20190305\t100,00\tINR"
+			"\nJV\tJournal Entry\t00002\t20190306\t7010\tSales - _TC\t\t"
+			"\tJV00002\t20190306\t\t0,00\t100,00\t\t\t20190306\t100,00\tINR")
+
+		self.assertEqual(fec.get_fec_lines(rows), expected)
+
+	def test_fec_header(self):
+		content = []
+		fec.write_fec_file(frappe._dict({"company": "_Test Company", "fiscal_year": "_Test Fiscal Year 1900",
+			"company_currency": "INR"}), content.append)
+
+		self.assertEqual(content, ["JournalCode\tJournalLib\tEcritureNum\tEcritureDate\tCompteNum\tCompteLib"
+			"\tCompAuxNum\tCompAuxLib\tPieceRef\tPieceDate\tEcritureLib\tDebit\tCredit\tEcritureLet\tDateLet"
+			"\tValidDate\tMontantdevise\tIdevise"])
@@ -9,6 +9,7 @@ from datetime import date
 from six import iteritems
 from erpnext.regional.doctype.gstr_3b_report.gstr_3b_report import get_period
 from erpnext.regional.india.utils import get_gst_accounts
+from erpnext.regional.doctype.gst_tax_line.gst_tax_line import get_gst_return_cache_key
 
 def execute(filters=None):
 	return Gstr1Report(filters).run()
@@ -42,6 +43,14 @@ class Gstr1Report(object):
 
 	def run(self):
 		self.get_columns()
+
+		# returns of frozen periods do not change, so are computed once
+		cache_key = get_gst_return_cache_key(self.doctype, self.filters)
+		if cache_key:
+			data = frappe.cache().hget("gst_return_cache", cache_key)
+			if data is not None:
+				return self.columns, data
+
 		self.gst_accounts = get_gst_accounts(self.filters.company)
 		self.get_invoice_data()
 
@@ -51,6 +60,9 @@ class Gstr1Report(object):
 			self.invoice_fields = [d["fieldname"] for d in self.invoice_columns]
 			self.get_data()
 
+		if cache_key:
+			frappe.cache().hset("gst_return_cache", cache_key, self.data)
+
 		return self.columns, self.data
 
 	def get_data(self):
@@ -198,10 +210,11 @@ class Gstr1Report(object):
 		""" % (self.doctype, ', '.join(['%s']*len(self.invoices))), tuple(self.invoices), as_dict=1)
 
 		for d in items:
-			if d.item_code not in self.invoice_items.get(d.parent, {}):
-				self.invoice_items.setdefault(d.parent, {}).setdefault(d.item_code,
-					sum(i.get('base_net_amount', 0) for i in items
-					    if i.item_code == d.item_code and i.parent == d.parent))
+			invoice_items = self.invoice_items.setdefault(d.parent, {})
+			if d.item_code in invoice_items:
+				invoice_items[d.item_code] += d.get('base_net_amount', 0)
+			else:
+				invoice_items[d.item_code] = d.get('base_net_amount', 0)
 
 				item_tax_rate = {}
 
@@ -213,48 +226,43 @@ class Gstr1Report(object):
 						tax_rate_dict.append(rate)
 
 	def get_items_based_on_tax_rate(self):
+		# tax rows are split into per item lines when the invoices are submitted
 		self.tax_details = frappe.db.sql("""
 			select
-				parent, account_head, item_wise_tax_detail, base_tax_amount_after_discount_amount
-			from `tab%s`
+				voucher_no, account_head, item_code, tax_rate, base_tax_amount_after_discount_amount
+			from `tabGST Tax Line`
 			where
-				parenttype = %s and docstatus = 1
-				and parent in (%s)
+				voucher_type = %s and voucher_no in (%s)
 			order by account_head
-		""" % (self.tax_doctype, '%s', ', '.join(['%s']*len(self.invoices.keys()))),
+		""" % ('%s', ', '.join(['%s']*len(self.invoices.keys()))),
 			tuple([self.doctype] + list(self.invoices.keys())))
 
 		self.items_based_on_tax_rate = {}
 		self.invoice_cess = frappe._dict()
 		unidentified_gst_accounts = []
-		for parent, account, item_wise_tax_detail, tax_amount in self.tax_details:
+		for parent, account, item_code, tax_rate, tax_amount in self.tax_details:
 			if account in self.gst_accounts.cess_account:
+				# every line of a tax row carries the amount of the row, after discount
 				self.invoice_cess.setdefault(parent, tax_amount)
-			else:
-				if item_wise_tax_detail:
-					try:
-						item_wise_tax_detail = json.loads(item_wise_tax_detail)
-						cgst_or_sgst = False
-						if account in self.gst_accounts.cgst_account \
-							or account in self.gst_accounts.sgst_account:
-							cgst_or_sgst = True
-
-						if not (cgst_or_sgst or account in self.gst_accounts.igst_account):
-							if "gst" in account.lower() and account not in unidentified_gst_accounts:
-								unidentified_gst_accounts.append(account)
-							continue
-
-						for item_code, tax_amounts in item_wise_tax_detail.items():
-							tax_rate = tax_amounts[0]
-							if cgst_or_sgst:
-								tax_rate *= 2
-
-							rate_based_dict = self.items_based_on_tax_rate\
-								.setdefault(parent, {}).setdefault(tax_rate, [])
-							if item_code not in rate_based_dict:
-								rate_based_dict.append(item_code)
-					except ValueError:
-						continue
+			elif item_code:
+				cgst_or_sgst = False
+				if account in self.gst_accounts.cgst_account \
+					or account in self.gst_accounts.sgst_account:
+					cgst_or_sgst = True
+
+				if not (cgst_or_sgst or account in self.gst_accounts.igst_account):
+					if "gst" in account.lower() and account not in unidentified_gst_accounts:
+						unidentified_gst_accounts.append(account)
+					continue
+
+				if cgst_or_sgst:
+					tax_rate *= 2
+
+				rate_based_dict = self.items_based_on_tax_rate\
+					.setdefault(parent, {}).setdefault(tax_rate, [])
+				if item_code not in rate_based_dict:
+					rate_based_dict.append(item_code)
+
 		if unidentified_gst_accounts:
 			frappe.msgprint(_("Following accounts might be selected in GST Settings:")
 				+ "<br>" + "<br>".join(unidentified_gst_accounts), alert=True)
@@ -262,7 +270,7 @@ class Gstr1Report(object):
 		# Build itemised tax for export invoices where tax table is blank
 		for invoice, items in iteritems(self.invoice_items):
 			if invoice not in self.items_based_on_tax_rate \
-				and frappe.db.get_value(self.doctype, invoice, "export_type") == "Without Payment of Tax":
+				and self.invoices[invoice].export_type == "Without Payment of Tax":
 					self.items_based_on_tax_rate.setdefault(invoice, {}).setdefault(0, items.keys())
 
 	def get_columns(self):
@@ -121,7 +121,6 @@ def get_items(filters):
 
 def get_tax_accounts(item_list, columns, company_currency,
 		doctype="Sales Invoice", tax_doctype="Sales Taxes and Charges"):
-	import json
 	item_row_map = {}
 	tax_columns = []
 	invoice_item_row = {}
@@ -135,47 +134,43 @@ def get_tax_accounts(item_list, columns, company_currency,
 		invoice_item_row.setdefault(d.parent, []).append(d)
 		item_row_map.setdefault(d.parent, {}).setdefault(d.item_code or d.item_name, []).append(d)
 
+	# tax rows are split into per item lines when the invoices are submitted
 	tax_details = frappe.db.sql("""
 		select
-			parent, description, item_wise_tax_detail,
-			base_tax_amount_after_discount_amount
-		from `tab%s`
+			voucher_no, description, item_code, tax_amount, base_tax_amount_after_discount_amount
+		from `tabGST Tax Line`
 		where
-			parenttype = %s and docstatus = 1
+			voucher_type = %s
 			and (description is not null and description != '')
-			and parent in (%s)
+			and voucher_no in (%s)
 			%s
 		order by description
-	""" % (tax_doctype, '%s', ', '.join(['%s']*len(invoice_item_row)), conditions),
+	""" % ('%s', ', '.join(['%s']*len(invoice_item_row)), conditions),
 		tuple([doctype] + list(invoice_item_row)))
 
-	for parent, description, item_wise_tax_detail, tax_amount in tax_details:
+	items_with_hsn_code = set()
+	item_codes = tuple(set([d[2] for d in tax_details if d[2]]))
+	if item_codes:
+		items_with_hsn_code = set(frappe.db.sql_list("""select name from tabItem
+			where name in %s and ifnull(gst_hsn_code, '') != ''""", (item_codes,)))
+
+	for parent, description, item_code, tax_amount, tax_row_amount in tax_details:
 		description = handle_html(description)
-		if description not in tax_columns and tax_amount:
+		if description not in tax_columns and tax_row_amount:
 			# as description is text editor earlier and markup can break the column convention in reports
 			tax_columns.append(description)
 
-		if item_wise_tax_detail:
-			try:
-				item_wise_tax_detail = json.loads(item_wise_tax_detail)
-
-				for item_code, tax_data in item_wise_tax_detail.items():
-					if not frappe.db.get_value("Item", item_code, "gst_hsn_code"):
-						continue
-					itemised_tax.setdefault(item_code, frappe._dict())
-					if isinstance(tax_data, list):
-						tax_amount = tax_data[1]
-					else:
-						tax_amount = 0
-
-					for d in item_row_map.get(parent, {}).get(item_code, []):
-						item_tax_amount = tax_amount
-						if item_tax_amount:
-							itemised_tax.setdefault(d.name, {})[description] = frappe._dict({
-								"tax_amount": flt(item_tax_amount, tax_amount_precision)
-							})
-			except ValueError:
-				continue
+		if item_code not in items_with_hsn_code:
+			continue
+
+		itemised_tax.setdefault(item_code, frappe._dict())
+
+		for d in item_row_map.get(parent, {}).get(item_code, []):
+			item_tax_amount = tax_amount
+			if item_tax_amount:
+				itemised_tax.setdefault(d.name, {})[description] = frappe._dict({
+					"tax_amount": flt(item_tax_amount, tax_amount_precision)
+				})
 
 	tax_columns.sort()
 	for desc in tax_columns:
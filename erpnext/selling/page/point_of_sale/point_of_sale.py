@@ -40,6 +40,13 @@ def get_items(start, page_length, price_list, item_group, search_value="", pos_p
 
 	result = []
 
+	# closest match from the beginning of the code or name first
+	order_by = "idx desc"
+	if item_code and not (serial_no or batch_no or barcode):
+		order_by = """if(locate({txt}, name), locate({txt}, name), 99999),
+			if(locate({txt}, item_name), locate({txt}, item_name), 99999),
+			idx desc""".format(txt=frappe.db.escape(item_code, percent=False))
+
 	items_data = frappe.db.sql(""" SELECT name as item_code,
 			item_name, image as item_image, idx as idx,is_stock_item
 		FROM
@@ -47,11 +54,12 @@ def get_items(start, page_length, price_list, item_group, search_value="", pos_p
 		WHERE
 			disabled = 0 and has_variants = 0 and is_sales_item = 1
 			and item_group in (select name from `tabItem Group` where lft >= {lft} and rgt <= {rgt})
-			and {condition} order by idx desc limit {start}, {page_length}"""
+			and {condition} order by {order_by} limit {start}, {page_length}"""
 		.format(
 			start=start, page_length=page_length,
 			lft=lft, rgt=rgt,
-			condition=condition
+			condition=condition,
+			order_by=order_by
 		), as_dict=1)
 
 	if items_data:
@@ -130,12 +138,20 @@ def search_serial_or_batch_or_barcode_number(search_value):
 	return {}
 
 def get_conditions(item_code, serial_no, batch_no, barcode):
+	from erpnext.stock.doctype.item_search_term.item_search_term import get_item_search_condition
+
 	if serial_no or batch_no or barcode:
 		return "name = {0}".format(frappe.db.escape(item_code))
 
-	return """(name like {item_code}
+	condition = """(name like {item_code}
 		or item_name like {item_code})""".format(item_code = frappe.db.escape('%' + item_code + '%'))
 
+	index_condition = get_item_search_condition(item_code, fieldname="name")
+	if index_condition:
+		condition = "{0} and {1}".format(index_condition, condition)
+
+	return condition
+
 def get_item_group_condition(pos_profile):
 	cond = "and 1=1"
 	item_groups = get_item_groups(pos_profile)
@@ -6,7 +6,9 @@ import frappe, os, json
 from frappe import _
 from frappe.utils import get_timestamp
 
-from frappe.utils import cint, today, formatdate
+from frappe.utils import cint, cstr, flt, today, formatdate, getdate, add_days, add_years, \
+	get_first_day, get_last_day
+from six import iteritems
 import frappe.defaults
 from frappe.cache_manager import clear_defaults_cache
 
@@ -403,51 +405,136 @@ def install_country_fixtures(company):
 			.format(frappe.scrub(company_doc.country)))(company_doc, False)
 
 def update_company_current_month_sales(company):
-	current_month_year = formatdate(today(), "MM-yyyy")
-
-	results = frappe.db.sql('''
-		SELECT
-			SUM(base_grand_total) AS total,
-			DATE_FORMAT(`posting_date`, '%m-%Y') AS month_year
-		FROM
-			`tabSales Invoice`
-		WHERE
-			DATE_FORMAT(`posting_date`, '%m-%Y') = '{current_month_year}'
+	update_company_month_sales(company, today())
+
+def update_company_month_sales(company, posting_date):
+	'''Update the monthly sales history bucket of the month in which `posting_date` falls,
+	along with the current month total if it is the current month'''
+	month_year = formatdate(posting_date, "MM-yyyy")
+
+	monthly_total = flt(frappe.db.sql('''
+		SELECT SUM(base_grand_total)
+		FROM `tabSales Invoice`
+		WHERE posting_date BETWEEN %s AND %s
 			AND docstatus = 1
-			AND company = {company}
-		GROUP BY
-			month_year
-	'''.format(current_month_year=current_month_year, company=frappe.db.escape(company)),
-		as_dict = True)
+			AND company = %s
+	''', (get_first_day(posting_date), get_last_day(posting_date), company))[0][0])
 
-	monthly_total = results[0]['total'] if len(results) > 0 else 0
+	if load_history(frappe.db.get_value("Company", company, "sales_monthly_history")) is None:
+		update_company_monthly_sales(company)
+	else:
+		# set in place, instead of reading and writing back the whole history under a row lock
+		frappe.db.sql("""update `tabCompany`
+			set sales_monthly_history = JSON_SET(sales_monthly_history, %s, %s)
+			where name = %s""", ('$."{0}"'.format(month_year), monthly_total, company))
+		frappe.clear_document_cache("Company", company)
 
-	frappe.db.set_value("Company", company, "total_monthly_sales", monthly_total)
+	if month_year == formatdate(today(), "MM-yyyy"):
+		frappe.db.set_value("Company", company, "total_monthly_sales", monthly_total, update_modified=False)
 
 def update_company_monthly_sales(company):
 	'''Cache past year monthly sales of every company based on sales invoices'''
 	from frappe.utils.goal import get_monthly_results
-	import json
 	filter_str = "company = {0} and status != 'Draft' and docstatus=1".format(frappe.db.escape(company))
 	month_to_value_dict = get_monthly_results("Sales Invoice", "base_grand_total",
 		"posting_date", filter_str, "sum")
 
-	frappe.db.set_value("Company", company, "sales_monthly_history", json.dumps(month_to_value_dict))
+	frappe.db.set_value("Company", company, "sales_monthly_history", json.dumps(month_to_value_dict),
+		update_modified=False)
 
 def update_transactions_annual_history(company, commit=False):
 	transactions_history = get_all_transactions_annual_history(company)
-	frappe.db.set_value("Company", company, "transactions_annual_history", json.dumps(transactions_history))
+	frappe.db.set_value("Company", company, "transactions_annual_history", json.dumps(transactions_history),
+		update_modified=False)
 
 	if commit:
 		frappe.db.commit()
 
-def cache_companies_monthly_sales_history():
+def update_company_transactions_history(doc, method=None):
+	'''Add a new transaction to, or remove a deleted one from, the day bucket of its company's
+	transactions heatmap'''
+	if not doc.get("company") \
+		or frappe.db.get_single_value('Selling Settings', 'sales_update_frequency') != "Each Transaction":
+		return
+
+	transaction_date = getdate(doc.get("transaction_date") or doc.get("posting_date") or doc.creation)
+	if transaction_date <= add_years(getdate(today()), -1):
+		return
+
+	# incremented in place, so that concurrent transactions do not queue up on the company row
+	# to read and write back the whole history. A history never computed is left as it is,
+	# to be built on the first load of the dashboard
+	frappe.db.sql('''update `tabCompany`
+		set transactions_annual_history = JSON_SET(transactions_annual_history, %(path)s,
+			greatest(ifnull(JSON_EXTRACT(transactions_annual_history, %(path)s), 0) + %(count)s, 0))
+		where name = %(company)s and transactions_annual_history like '{%%'
+	''', {
+		"path": '$."{0}"'.format(cstr(get_timestamp(transaction_date))),
+		"count": -1 if method == "on_trash" else 1,
+		"company": doc.company
+	})
+	frappe.clear_document_cache("Company", doc.company)
+
+def remove_expired_transactions_history(company):
+	'''Drop heatmap buckets older than a year'''
+	date_to_value_dict = load_history(frappe.db.get_value("Company", company, "transactions_annual_history"))
+	if date_to_value_dict is None:
+		return update_transactions_annual_history(company)
+
+	from_timestamp = get_timestamp(add_years(getdate(today()), -1))
+	date_to_value_dict = dict((timestamp, count) for timestamp, count in iteritems(date_to_value_dict)
+		if flt(timestamp) > from_timestamp)
+
+	frappe.db.set_value("Company", company, "transactions_annual_history", json.dumps(date_to_value_dict),
+		update_modified=False)
+
+def cache_companies_monthly_sales_history(rebuild=False):
+	'''Keep the sales history and transactions heatmap of every company up to date.
+
+	When sales are updated on each transaction, month and day buckets are updated as
+	transactions are made, so the full history is only scanned when `rebuild` is set
+	or the history does not exist yet'''
+	update_each_transaction = frappe.db.get_single_value('Selling Settings',
+		'sales_update_frequency') == "Each Transaction"
+
 	companies = [d['name'] for d in frappe.get_list("Company")]
 	for company in companies:
-		update_company_monthly_sales(company)
-		update_transactions_annual_history(company)
+		if rebuild or load_history(frappe.db.get_value("Company", company, "sales_monthly_history")) is None:
+			update_company_monthly_sales(company)
+			update_transactions_annual_history(company)
+		elif update_each_transaction:
+			remove_expired_transactions_history(company)
+		else:
+			update_transactions_annual_history(company)
+
+		# rolls the current month total over at the start of a month
+		update_company_current_month_sales(company)
+
+	if not update_each_transaction:
+		update_modified_sales_months()
+
 	frappe.db.commit()
 
+def rebuild_companies_sales_history():
+	'''Rebuild the sales history and heatmap of every company from its transactions, for the
+	buckets updated in place to not drift from them'''
+	cache_companies_monthly_sales_history(rebuild=True)
+
+def update_modified_sales_months():
+	'''Refresh the month buckets of sales invoices submitted or cancelled since yesterday'''
+	for d in frappe.db.sql('''
+			SELECT DISTINCT company, DATE_FORMAT(posting_date, '%%Y-%%m-01') AS month_start
+			FROM `tabSales Invoice`
+			WHERE modified >= %s AND docstatus > 0
+		''', add_days(today(), -1), as_dict=True):
+		update_company_month_sales(d.company, d.month_start)
+
+def load_history(history):
+	try:
+		return json.loads(history) if history and '{' in history else None
+	except ValueError:
+		return None
+
 @frappe.whitelist()
 def get_children(doctype, parent=None, company=None, is_root=False):
 	if parent == None or parent == "All Companies":
@@ -504,12 +591,12 @@ def get_all_transactions_annual_history(company):
 
 			UNION ALL
 
-			select name, creation as transaction_date, company
+			select name, date(creation) as transaction_date, company
 			from `tabIssue`
 
 			UNION ALL
 
-			select name, creation as transaction_date, company
+			select name, date(creation) as transaction_date, company
 			from `tabProject`
 		) t
 
@@ -534,11 +621,7 @@ def get_timeline_data(doctype, name):
 	date_to_value_dict = {}
 
 	history = frappe.get_cached_value('Company',  name,  "transactions_annual_history")
-
-	try:
-		date_to_value_dict = json.loads(history) if history and '{' in history else None
-	except ValueError:
-		date_to_value_dict = None
+	date_to_value_dict = load_history(history)
 
 	if date_to_value_dict is None:
 		update_transactions_annual_history(name, True)
@@ -6,7 +6,7 @@ import frappe
 import unittest
 import json
 from frappe import _
-from frappe.utils import random_string
+from frappe.utils import random_string, nowdate, add_months, formatdate, flt
 from erpnext.accounts.doctype.account.chart_of_accounts.chart_of_accounts import get_charts_for_country
 
 test_ignore = ["Account", "Cost Center", "Payment Terms Template", "Salary Component"]
@@ -14,6 +14,12 @@ test_dependencies = ["Fiscal Year"]
 test_records = frappe.get_test_records('Company')
 
 class TestCompany(unittest.TestCase):
+	def setUp(self):
+		self.sales_update_frequency = frappe.db.get_single_value("Selling Settings", "sales_update_frequency")
+
+	def tearDown(self):
+		frappe.db.set_value("Selling Settings", None, "sales_update_frequency", self.sales_update_frequency)
+
 	def test_coa_based_on_existing_company(self):
 		company = frappe.new_doc("Company")
 		company.company_name = "COA from Existing Company"
@@ -88,6 +94,55 @@ class TestCompany(unittest.TestCase):
 					self.delete_mode_of_payment(template)
 					frappe.delete_doc("Company", template)
 
+	def test_sales_history_month_bucket(self):
+		from erpnext.accounts.doctype.sales_invoice.test_sales_invoice import create_sales_invoice
+		from erpnext.setup.doctype.company.company import update_company_monthly_sales
+
+		posting_date = add_months(nowdate(), -2)
+		month_year = formatdate(posting_date, "MM-yyyy")
+		update_company_monthly_sales("_Test Company")
+
+		si = create_sales_invoice(posting_date=posting_date, rate=500, do_not_submit=True)
+		frappe.db.set_value("Selling Settings", None, "sales_update_frequency", "Each Transaction")
+		si.submit()
+
+		history = json.loads(frappe.db.get_value("Company", "_Test Company", "sales_monthly_history"))
+		update_company_monthly_sales("_Test Company")
+		rebuilt_history = json.loads(frappe.db.get_value("Company", "_Test Company", "sales_monthly_history"))
+		self.assertEqual(flt(history.get(month_year)), flt(rebuilt_history.get(month_year)))
+
+		si.cancel()
+		history = json.loads(frappe.db.get_value("Company", "_Test Company", "sales_monthly_history"))
+		update_company_monthly_sales("_Test Company")
+		rebuilt_history = json.loads(frappe.db.get_value("Company", "_Test Company", "sales_monthly_history"))
+		self.assertEqual(flt(history.get(month_year)), flt(rebuilt_history.get(month_year)))
+
+	def test_transactions_history_day_bucket(self):
+		from frappe.utils import get_timestamp, cstr
+		from erpnext.setup.doctype.company.company import (update_company_transactions_history,
+			update_transactions_annual_history)
+
+		frappe.db.set_value("Company", "_Test Company", "transactions_annual_history", "{}")
+		transaction = frappe._dict(company="_Test Company", transaction_date=nowdate())
+		timestamp = cstr(get_timestamp(nowdate()))
+
+		frappe.db.set_value("Selling Settings", None, "sales_update_frequency", "Each Transaction")
+		update_company_transactions_history(transaction)
+		update_company_transactions_history(transaction)
+		update_company_transactions_history(transaction)
+
+		# deleted transactions are taken out of their bucket
+		update_company_transactions_history(transaction, "on_trash")
+
+		# left to the daily rebuild when sales are not updated on each transaction
+		frappe.db.set_value("Selling Settings", None, "sales_update_frequency", "Daily")
+		update_company_transactions_history(transaction)
+
+		history = json.loads(frappe.db.get_value("Company", "_Test Company", "transactions_annual_history"))
+		self.assertEqual(history, {timestamp: 2})
+
+		update_transactions_annual_history("_Test Company")
+
 	def delete_mode_of_payment(self, company):
 		frappe.db.sql(""" delete from `tabMode of Payment Account`
 			where company =%s """, (company))
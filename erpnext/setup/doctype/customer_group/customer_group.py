@@ -7,6 +7,8 @@ from frappe import _
 
 
 from frappe.utils.nestedset import NestedSet
+from erpnext.accounts.doctype.tax_rule.tax_rule import clear_tax_rule_cache
+
 class CustomerGroup(NestedSet):
 	nsm_parent_field = 'parent_customer_group'
 
@@ -14,6 +16,14 @@ class CustomerGroup(NestedSet):
 		self.validate_name_with_customer()
 		super(CustomerGroup, self).on_update()
 		self.validate_one_root()
+		clear_tax_rule_cache()
+
+	def on_trash(self):
+		super(CustomerGroup, self).on_trash()
+		clear_tax_rule_cache()
+
+	def after_rename(self, olddn, newdn, merge=False):
+		clear_tax_rule_cache()
 
 	def validate_name_with_customer(self):
 		if frappe.db.exists("Customer", self.name):
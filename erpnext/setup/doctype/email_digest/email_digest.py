@@ -5,12 +5,13 @@ from __future__ import unicode_literals
 import frappe
 from frappe import _
 from frappe.utils import fmt_money, formatdate, format_time, now_datetime, \
-	get_url_to_form, get_url_to_list, flt, get_link_to_report
+	get_url_to_form, get_url_to_list, flt, get_link_to_report, getdate, nowdate
 from datetime import timedelta
 from dateutil.relativedelta import relativedelta
 from frappe.core.doctype.user.user import STANDARD_USERS
 import frappe.desk.notifications
-from erpnext.accounts.utils import get_balance_on, get_count_on, get_fiscal_year
+from erpnext.accounts.utils import get_count_on, get_fiscal_year, FiscalYearError, \
+	get_allow_cost_center_in_entry_of_bs_account
 
 user_specific_content = ["calendar_events", "todo_list"]
 
@@ -22,6 +23,8 @@ class EmailDigest(Document):
 		self.from_date, self.to_date = self.get_from_to_date()
 		self.set_dates()
 		self._accounts = {}
+		self._balances = {}
+		self._readable_accounts = set()
 		self.currency = frappe.db.get_value('Company',  self.company,  "default_currency")
 
 	def get_users(self):
@@ -288,7 +291,7 @@ class EmailDigest(Document):
 
 	def get_income(self):
 		"""Get income for given period"""
-		income, past_income, count = self.get_period_amounts(self.get_roots("income"),'income')
+		income, past_income, count = self.get_period_amounts(self.get_root_type_accounts("income"), 'income')
 
 		income_account = frappe.db.get_all('Account',
 			fields=["name"],
@@ -327,8 +330,8 @@ class EmailDigest(Document):
 		count = 0
 
 		for account in self.get_root_type_accounts(root_type):
-			balance += get_balance_on(account, date = self.future_to_date)
-			count += get_count_on(account, fieldname, date = self.future_to_date)
+			balance += self.get_balance(account, self.future_to_date)
+			count += self.get_balance(account, self.future_to_date, key="count")
 
 		if fieldname == 'income':
 			filters = {
@@ -363,7 +366,7 @@ class EmailDigest(Document):
 		return self.get_type_balance('invoiced_amount', 'Receivable')
 
 	def get_expenses_booked(self):
-		expenses, past_expenses, count = self.get_period_amounts(self.get_roots("expense"), 'expenses_booked')
+		expenses, past_expenses, count = self.get_period_amounts(self.get_root_type_accounts("expense"), 'expenses_booked')
 
 		expense_account = frappe.db.get_all('Account',
 			fields=["name"],
@@ -391,15 +394,43 @@ class EmailDigest(Document):
 
 	def get_period_amounts(self, accounts, fieldname):
 		"""Get amounts for current and past periods"""
-		balance = past_balance = 0.0
-		count = 0
-		for account in accounts:
-			balance += get_incomes_expenses_for_period(account, self.future_from_date, self.future_to_date)
-			past_balance += get_incomes_expenses_for_period(account, self.past_from_date, self.past_to_date)
-			count += get_count_for_period(account, fieldname, self.future_from_date, self.future_to_date)
+		balance = self.get_period_balance(accounts, self.future_from_date, self.future_to_date)
+		past_balance = self.get_period_balance(accounts, self.past_from_date, self.past_to_date)
+		count = self.get_period_balance(accounts, self.future_from_date, self.future_to_date, key="count")
 
 		return balance, past_balance, count
 
+	def get_period_balance(self, accounts, from_date, to_date, key="balance"):
+		"""Get movement of the given ledger accounts between two dates"""
+		def get_total(date):
+			return sum(self.get_balance(account, date, key=key) for account in accounts)
+
+		balance_on_to_date = get_total(to_date)
+		fy_start_date = get_fiscal_year(to_date)[1]
+
+		if from_date == fy_start_date:
+			return balance_on_to_date
+
+		balance_before_from_date = get_total(from_date - timedelta(days=1))
+		if from_date > fy_start_date:
+			return balance_on_to_date - balance_before_from_date
+
+		last_year_closing_balance = get_total(fy_start_date - timedelta(days=1))
+		return balance_on_to_date + (last_year_closing_balance - balance_before_from_date)
+
+	def get_balance(self, account, date, key="balance_in_account_currency"):
+		"""Get balance (or entry count) of a ledger account from the balances of all the accounts
+		of the company, loaded once per date for this digest"""
+		if account not in self._readable_accounts:
+			if not frappe.flags.ignore_account_permission:
+				frappe.has_permission("Account", "read", account, throw=True)
+			self._readable_accounts.add(account)
+
+		if date not in self._balances:
+			self._balances[date] = get_account_balances(self.company, date)
+
+		return flt(self._balances[date].get(account, {}).get(key))
+
 	def get_sales_orders_to_bill(self):
 		"""Get value not billed"""
 
@@ -514,9 +545,14 @@ class EmailDigest(Document):
 		balance = prev_balance = 0.0
 		count = 0
 		for account in accounts:
-			balance += get_balance_on(account, date=self.future_to_date, in_account_currency=False)
-			count += get_count_on(account, fieldname, date=self.future_to_date)
-			prev_balance += get_balance_on(account, date=self.past_to_date, in_account_currency=False)
+			balance += self.get_balance(account, self.future_to_date, key="balance")
+			prev_balance += self.get_balance(account, self.past_to_date, key="balance")
+
+			# outstanding based counts need the per voucher lookup
+			if fieldname in ("invoiced_amount", "payables"):
+				count += get_count_on(account, fieldname, date=self.future_to_date)
+			else:
+				count += self.get_balance(account, self.future_to_date, key="count")
 
 		if fieldname in ("bank_balance","credit_balance"):
 			label = ""
@@ -791,38 +827,38 @@ def send():
 def get_digest_msg(name):
 	return frappe.get_doc("Email Digest", name).get_msg_html()
 
-def get_incomes_expenses_for_period(account, from_date, to_date):
-		"""Get amounts for current and past periods"""
-
-		val = 0.0
-		balance_on_to_date = get_balance_on(account, date = to_date)
-		balance_before_from_date = get_balance_on(account, date = from_date - timedelta(days=1))
-
-		fy_start_date = get_fiscal_year(to_date)[1]
-
-		if from_date == fy_start_date:
-			val = balance_on_to_date
-		elif from_date > fy_start_date:
-			val = balance_on_to_date - balance_before_from_date
+def get_account_balances(company, date):
+	"""Get balances and entry counts of all ledger accounts of a company as on a date,
+	with a single grouped GL query. Balances are the ones of `get_balance_on` and counts
+	the ones of `get_count_on`"""
+	try:
+		year_start_date = get_fiscal_year(date, verbose=0)[1]
+	except FiscalYearError:
+		if getdate(date) > getdate(nowdate()):
+			year_start_date = get_fiscal_year(nowdate(), verbose=1)[1]
 		else:
-			last_year_closing_balance = get_balance_on(account, date=fy_start_date - timedelta(days=1))
-			print(fy_start_date - timedelta(days=1), last_year_closing_balance)
-			val = balance_on_to_date + (last_year_closing_balance - balance_before_from_date)
-
-		return val
-
-def get_count_for_period(account, fieldname, from_date, to_date):
-	count = 0.0
-	count_on_to_date = get_count_on(account, fieldname, to_date)
-	count_before_from_date = get_count_on(account, fieldname, from_date - timedelta(days=1))
-
-	fy_start_date = get_fiscal_year(to_date)[1]
-	if from_date == fy_start_date:
-		count = count_on_to_date
-	elif from_date > fy_start_date:
-		count = count_on_to_date - count_before_from_date
-	else:
-		last_year_closing_count = get_count_on(account, fieldname, fy_start_date - timedelta(days=1))
-		count = count_on_to_date + (last_year_closing_count - count_before_from_date)
-
-	return count
\ No newline at end of file
+			# date older than any existing fiscal year, no balances
+			return {}
+
+	# entries of pl accounts are counted within the fiscal year, and their balance is too,
+	# the balance of all accounts if cost center is maintained for balance sheet accounts
+	in_fiscal_year = "gle.posting_date >= %(year_start_date)s and gle.voucher_type != 'Period Closing Voucher'"
+	count_condition = "(acc.report_type != 'Profit and Loss' or ({0}))".format(in_fiscal_year)
+	balance_condition = in_fiscal_year if get_allow_cost_center_in_entry_of_bs_account() else count_condition
+
+	balances = {}
+	for d in frappe.db.sql("""
+		select
+			gle.account,
+			sum(if({balance_condition}, gle.debit - gle.credit, 0)) as balance,
+			sum(if({balance_condition}, gle.debit_in_account_currency - gle.credit_in_account_currency, 0))
+				as balance_in_account_currency,
+			count(*) as count
+		from `tabGL Entry` gle, `tabAccount` acc
+		where gle.account = acc.name and gle.company = %(company)s
+			and gle.posting_date <= %(date)s and {count_condition}
+		group by gle.account""".format(balance_condition=balance_condition, count_condition=count_condition),
+		{"company": company, "date": date, "year_start_date": year_start_date}, as_dict=1):
+		balances[d.account] = d
+
+	return balances
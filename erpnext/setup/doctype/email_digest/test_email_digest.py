@@ -5,8 +5,26 @@ from __future__ import unicode_literals
 
 import frappe
 import unittest
+from frappe.utils import flt, nowdate
+from erpnext.accounts.utils import get_balance_on, get_count_on
+from erpnext.accounts.doctype.sales_invoice.test_sales_invoice import create_sales_invoice
+from erpnext.setup.doctype.email_digest.email_digest import get_account_balances
 
 # test_records = frappe.get_test_records('Email Digest')
 
 class TestEmailDigest(unittest.TestCase):
-	pass
+	def test_account_balances(self):
+		create_sales_invoice()
+		create_sales_invoice(customer="_Test Customer USD", debit_to="_Test Receivable USD - _TC",
+			currency="USD", conversion_rate=50)
+
+		balances = get_account_balances("_Test Company", nowdate())
+		self.assertTrue(balances)
+
+		for account in frappe.get_all("Account", filters={"company": "_Test Company", "is_group": 0}):
+			d = balances.get(account.name, {})
+			self.assertEqual(flt(d.get("balance_in_account_currency"), 2),
+				flt(get_balance_on(account.name, nowdate()), 2))
+			self.assertEqual(flt(d.get("balance"), 2),
+				flt(get_balance_on(account.name, nowdate(), in_account_currency=False), 2))
+			self.assertEqual(flt(d.get("count")), flt(get_count_on(account.name, "count", nowdate())))
@@ -10,7 +10,7 @@ from frappe.utils.nestedset import NestedSet
 from frappe.website.website_generator import WebsiteGenerator
 from frappe.website.render import clear_cache
 from frappe.website.doctype.website_slideshow.website_slideshow import get_slideshow
-from erpnext.shopping_cart.product_info import set_product_info_for_website
+from erpnext.shopping_cart.product_info import set_product_info_for_items
 from erpnext.utilities.product import get_qty_in_stock
 
 class ItemGroup(NestedSet, WebsiteGenerator):
@@ -115,8 +115,7 @@ def get_product_list_for_group(product_group=None, start=0, limit=10, search=Non
 	data = adjust_qty_for_expired_items(data)
 
 	if cint(frappe.db.get_single_value("Shopping Cart Settings", "enabled")):
-		for item in data:
-			set_product_info_for_website(item)
+		set_product_info_for_items(data)
 
 	return data
 
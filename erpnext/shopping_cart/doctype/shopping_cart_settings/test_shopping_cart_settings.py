@@ -7,6 +7,7 @@ from __future__ import unicode_literals
 import frappe
 import unittest
 from erpnext.shopping_cart.doctype.shopping_cart_settings.shopping_cart_settings import ShoppingCartSetupError
+from erpnext.accounts.doctype.tax_rule.tax_rule import clear_tax_rule_cache
 
 class TestShoppingCartSettings(unittest.TestCase):
 	def setUp(self):
@@ -38,5 +39,6 @@ class TestShoppingCartSettings(unittest.TestCase):
 			self.assertRaises(ShoppingCartSetupError, cart_settings.validate_tax_rule)
 			
 		frappe.db.sql("update `tabTax Rule` set use_for_shopping_cart = 1")
+		clear_tax_rule_cache()
 
 test_dependencies = ["Tax Rule"]
\ No newline at end of file
@@ -7,7 +7,7 @@ import frappe
 from erpnext.shopping_cart.cart import _get_cart_quotation
 from erpnext.shopping_cart.doctype.shopping_cart_settings.shopping_cart_settings \
 	import get_shopping_cart_settings, show_quantity_in_website
-from erpnext.utilities.product import get_price, get_qty_in_stock
+from erpnext.utilities.product import get_price, get_qty_in_stock, get_prices, get_qty_in_stock_for_items
 
 @frappe.whitelist(allow_guest=True)
 def get_product_info_for_website(item_code):
@@ -49,9 +49,60 @@ def get_product_info_for_website(item_code):
 		"cart_settings": cart_settings
 	})
 
-def set_product_info_for_website(item):
+def get_product_info_for_items(item_codes):
+	"""get product price / stock info of a page of items for website, loading
+	the cart, prices, stock and UOMs for all of them together"""
+
+	cart_settings = get_shopping_cart_settings()
+	if not cart_settings.enabled:
+		return {}
+
+	cart_quotation = _get_cart_quotation()
+
+	prices = get_prices(
+		item_codes,
+		cart_quotation.selling_price_list,
+		cart_settings.default_customer_group,
+		cart_settings.company
+	)
+
+	stock_status_map = get_qty_in_stock_for_items(item_codes, "website_warehouse")
+	uoms = dict((d.name, d) for d in frappe.get_all("Item", fields=["name", "stock_uom", "sales_uom"],
+		filters={"name": ["in", item_codes]}))
+	show_stock_qty = show_quantity_in_website()
+
+	out = {}
+	for item_code in item_codes:
+		stock_status = stock_status_map.get(item_code) or frappe._dict()
+		uom = uoms.get(item_code) or frappe._dict()
+
+		product_info = {
+			"price": prices.get(item_code),
+			"stock_qty": stock_status.stock_qty,
+			"in_stock": stock_status.in_stock if stock_status.is_stock_item else 1,
+			"qty": 0,
+			"uom": uom.stock_uom,
+			"show_stock_qty": show_stock_qty,
+			"sales_uom": uom.sales_uom
+		}
+
+		if product_info["price"]:
+			if frappe.session.user != "Guest":
+				item = cart_quotation.get({"item_code": item_code})
+				if item:
+					product_info["qty"] = item[0].qty
+
+		out[item_code] = frappe._dict({
+			"product_info": product_info,
+			"cart_settings": cart_settings
+		})
+
+	return out
+
+def set_product_info_for_website(item, product_info=None):
 	"""set product price uom for website"""
-	product_info = get_product_info_for_website(item.item_code)
+	if product_info is None:
+		product_info = get_product_info_for_website(item.item_code)
 
 	if product_info:
 		item.update(product_info)
@@ -62,4 +113,11 @@ def set_product_info_for_website(item):
 			item["price_sales_uom"] = product_info.get("price").get("formatted_price_sales_uom")
 		else:
 			item["price_stock_uom"] = ""
-			item["price_sales_uom"] = ""
\ No newline at end of file
+			item["price_sales_uom"] = ""
+
+def set_product_info_for_items(items):
+	"""set product price uom for a page of items for website"""
+	product_info = get_product_info_for_items([item.item_code for item in items])
+
+	for item in items:
+		set_product_info_for_website(item, product_info.get(item.item_code) or {})
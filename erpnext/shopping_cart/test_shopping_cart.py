@@ -150,6 +150,19 @@ class TestShoppingCart(unittest.TestCase):
 		quotation.delete()
 
 	# helper functions
+	def test_product_info_for_items(self):
+		from erpnext.shopping_cart.product_info import get_product_info_for_website, get_product_info_for_items
+
+		self.login_as_customer()
+		item_codes = ["_Test Item", "_Test Item 2"]
+
+		# run twice to read prices from cache the second time
+		for i in range(2):
+			product_info = get_product_info_for_items(item_codes)
+			for item_code in item_codes:
+				expected = get_product_info_for_website(item_code).product_info
+				self.assertEqual(product_info[item_code].product_info, expected)
+
 	def enable_shopping_cart(self):
 		settings = frappe.get_doc("Shopping Cart Settings", "Shopping Cart Settings")
 
@@ -11,6 +11,7 @@ import copy
 from erpnext.controllers.item_variant import (ItemVariantExistsError,
 		copy_attributes_to_variant, get_variant, make_variant_item_code, validate_item_variant_attributes)
 from erpnext.setup.doctype.item_group.item_group import (get_parent_item_groups, invalidate_cache_for)
+from erpnext.stock.doctype.item_search_term.item_search_term import update_item_search_terms, delete_item_search_terms
 from frappe import _, msgprint
 from frappe.utils import (cint, cstr, flt, formatdate, get_timestamp, getdate,
 						  now_datetime, random_string, strip)
@@ -580,11 +581,13 @@ class Item(WebsiteGenerator):
 		frappe.db.sql("""update `tabItem Price` set item_name=%s,
 			item_description=%s, brand=%s where item_code=%s""",
 					(self.item_name, self.description, self.brand, self.name))
+		update_item_search_terms(self)
 
 	def on_trash(self):
 		super(Item, self).on_trash()
 		frappe.db.sql("""delete from tabBin where item_code=%s""", self.name)
 		frappe.db.sql("delete from `tabItem Price` where item_code=%s", self.name)
+		delete_item_search_terms(self)
 		for variant_of in frappe.get_all("Item", filters={"variant_of": self.name}):
 			frappe.delete_doc("Item", variant_of.name)
 
@@ -609,6 +612,7 @@ class Item(WebsiteGenerator):
 			clear_cache(self.route)
 
 		frappe.db.set_value("Item", new_name, "item_code", new_name)
+		update_item_search_terms(frappe.get_doc("Item", new_name))
 
 		if merge:
 			self.set_last_purchase_rate(new_name)
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2019, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import hashlib
+from frappe.utils import cint, cstr, strip_html, now_datetime
+from frappe.model.document import Document
+
+class ItemSearchTerm(Document):
+	pass
+
+def on_doctype_update():
+	frappe.db.add_index("Item Search Term", ["term", "item_code"])
+	frappe.db.add_index("Item Search Term", ["item_code"])
+
+def get_terms(text):
+	'''Returns the lower cased trigrams of the given text'''
+	text = cstr(text).lower()
+	return set(text[i:i + 3] for i in range(len(text) - 2))
+
+def get_item_terms(item):
+	terms = set()
+	for value in (item.name, item.item_name, item.item_group, strip_html(cstr(item.description))):
+		terms |= get_terms(value)
+
+	for d in item.get("barcodes") or []:
+		terms |= get_terms(d.barcode)
+
+	return terms
+
+def update_item_search_terms(item, method=None):
+	'''Rebuild the search terms of an Item from its code, name, group, description and barcodes'''
+	delete_item_search_terms(item)
+	insert_search_terms(item.name, get_item_terms(item))
+
+def delete_item_search_terms(item, method=None):
+	frappe.db.sql("delete from `tabItem Search Term` where item_code=%s", item.name)
+
+def insert_search_terms(item_code, terms):
+	if not terms:
+		return
+
+	values = []
+	for term in terms:
+		name = hashlib.md5(frappe.safe_encode(item_code + "\0" + term)).hexdigest()
+		values.append("({0}, {1}, {2})".format(frappe.db.escape(name, percent=False),
+			frappe.db.escape(item_code, percent=False), frappe.db.escape(term, percent=False)))
+
+	frappe.db.sql("""insert into `tabItem Search Term` (name, item_code, term)
+		values {0}""".format(", ".join(values)))
+
+def rebuild_item_search_index(batch_size=1000):
+	'''Rebuild the search terms of all Items, used when the index is set up or needs repair.
+	Searches fall back to scanning Items till the rebuild is complete'''
+	frappe.db.set_global("item_search_index_ready", 0)
+	frappe.db.sql("delete from `tabItem Search Term`")
+
+	update_search_terms_of_items(batch_size=batch_size)
+
+	frappe.db.set_global("item_search_index_ready", 1)
+	frappe.db.commit()
+
+def update_search_terms_of_items(filters=None, batch_size=1000):
+	'''Rebuild the search terms of the Items matching `filters`, a batch at a time'''
+	start = 0
+	while True:
+		items = frappe.get_all("Item", fields=["name", "item_name", "item_group", "description"],
+			filters=filters, order_by="name", start=start, page_length=batch_size)
+		if not items:
+			break
+
+		item_codes = [item.name for item in items]
+		barcodes = {}
+		for d in frappe.get_all("Item Barcode", fields=["parent", "barcode"],
+			filters={"parent": ["in", item_codes], "parenttype": "Item"}):
+			barcodes.setdefault(d.parent, []).append(d)
+
+		frappe.db.sql("delete from `tabItem Search Term` where item_code in %s", (tuple(item_codes),))
+		for item in items:
+			item.barcodes = barcodes.get(item.name)
+			insert_search_terms(item.name, get_item_terms(item))
+
+		frappe.db.commit()
+		start += batch_size
+
+def update_item_group_search_terms(doc, method=None, old_name=None, new_name=None, merge=False):
+	'''The group of Items is renamed in the database, so their terms are rebuilt'''
+	frappe.enqueue("erpnext.stock.doctype.item_search_term.item_search_term.update_search_terms_of_items",
+		queue="long", filters={"item_group": new_name}, now=frappe.flags.in_test)
+
+def update_modified_item_search_terms():
+	'''Rebuild the terms of Items modified since the last run, including the ones
+	changed with `frappe.db.set_value`, which does not run the Item's hooks'''
+	if not cint(frappe.db.get_global("item_search_index_ready")):
+		return
+
+	updated_upto = frappe.db.get_global("item_search_index_updated_upto")
+	now = now_datetime()
+
+	if updated_upto:
+		update_search_terms_of_items(filters={"modified": [">=", updated_upto]})
+
+	frappe.db.set_global("item_search_index_updated_upto", str(now))
+	frappe.db.commit()
+
+def get_item_search_condition(txt, fieldname="tabItem.name"):
+	'''Returns a condition limiting Items to the ones whose indexed fields contain all the
+	trigrams of `txt`, or None if the index cannot be used for this search'''
+	terms = get_terms(txt)
+	if not terms or "%" in txt or "_" in txt \
+		or not cint(frappe.db.get_global("item_search_index_ready")):
+		return None
+
+	return """{fieldname} in (select item_code from `tabItem Search Term`
+		where term in ({terms}) group by item_code having count(*) = {count})""".format(
+			fieldname=fieldname,
+			terms=", ".join([frappe.db.escape(term) for term in terms]),
+			count=len(terms))
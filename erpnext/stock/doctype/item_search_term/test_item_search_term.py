@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2019, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+from __future__ import unicode_literals
+
+import frappe
+import unittest
+from erpnext.controllers.queries import item_query
+from erpnext.stock.doctype.item.test_item import make_item
+from erpnext.stock.doctype.item_search_term.item_search_term import (get_terms,
+	get_item_search_condition, rebuild_item_search_index, update_modified_item_search_terms)
+
+class TestItemSearchTerm(unittest.TestCase):
+	def test_get_terms(self):
+		self.assertEqual(get_terms("Bolt"), set(["bol", "olt"]))
+		self.assertEqual(get_terms("ab"), set())
+
+	def test_item_query_from_index(self):
+		item = make_item("_Test Item Search Index", {"item_name": "Hexagonal Flange Nut"})
+		item.item_name = "Hexagonal Flange Nut"
+		if not item.barcodes:
+			item.append("barcodes", {"barcode": "8901234567000"})
+		item.save()
+
+		rebuild_item_search_index()
+		self.assertTrue(get_item_search_condition("flange"))
+
+		for txt in ("flange", "Hexagon", "4567000", "search ind"):
+			result = [d[0] for d in item_query("Item", txt, "name", 0, 20, {})]
+			self.assertTrue(item.name in result, txt)
+
+		item.item_name = "Square Nut"
+		item.save()
+		result = [d[0] for d in item_query("Item", "flange", "name", 0, 20, {})]
+		self.assertFalse(item.name in result)
+
+		# the whole description is indexed
+		item.description = "Zinc plated. " * 20 + "Serrated underside"
+		item.save()
+		result = [d[0] for d in item_query("Item", "serrated", "name", 0, 20, {})]
+		self.assertTrue(item.name in result)
+
+	def test_item_query_after_set_value(self):
+		item = make_item("_Test Item Search Index", {"item_name": "Hexagonal Flange Nut"})
+		rebuild_item_search_index()
+
+		# changes made without saving the Item are indexed by the hourly job
+		frappe.db.set_global("item_search_index_updated_upto", "2000-01-01 00:00:00")
+		frappe.db.set_value("Item", item.name, "item_name", "Octagonal Cap Nut")
+		update_modified_item_search_terms()
+
+		result = [d[0] for d in item_query("Item", "octagonal", "name", 0, 20, {})]
+		self.assertTrue(item.name in result)
+
+	def test_fallback_for_short_text(self):
+		self.assertEqual(get_item_search_condition("ab"), None)
+		self.assertEqual(get_item_search_condition("50%off"), None)
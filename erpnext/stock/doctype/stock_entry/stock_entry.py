@@ -6,8 +6,8 @@ import frappe, erpnext
 import frappe.defaults
 from frappe import _
 from frappe.utils import cstr, cint, flt, comma_or, getdate, nowdate, formatdate, format_time
-from erpnext.stock.utils import get_incoming_rate
-from erpnext.stock.stock_ledger import get_previous_sle, NegativeStockError, get_valuation_rate
+from erpnext.stock.utils import get_incoming_rate, get_incoming_rates
+from erpnext.stock.stock_ledger import get_previous_sle, get_previous_sles, NegativeStockError, get_valuation_rate
 from erpnext.stock.get_item_details import get_bin_details, get_default_cost_center, get_conversion_factor, get_reserved_qty_for_so
 from erpnext.setup.doctype.item_group.item_group import get_item_group_defaults
 from erpnext.setup.doctype.brand.brand import get_brand_defaults
@@ -351,10 +351,11 @@ class StockEntry(StockController):
 					+ self.work_order + ":" + ", ".join(other_ste), DuplicateEntryForWorkOrderError)
 
 	def set_incoming_rate(self):
+		incoming_rates = self.get_incoming_rates([d for d in self.items if d.s_warehouse])
+
 		for d in self.items:
 			if d.s_warehouse:
-				args = self.get_args_for_incoming_rate(d)
-				d.basic_rate = get_incoming_rate(args)
+				d.basic_rate = incoming_rates.get(d.idx)
 			elif d.allow_zero_valuation_rate and not d.s_warehouse:
 				d.basic_rate = 0.0
 			elif d.t_warehouse and not d.basic_rate:
@@ -364,14 +365,11 @@ class StockEntry(StockController):
 
 	def set_actual_qty(self):
 		allow_negative_stock = cint(frappe.db.get_value("Stock Settings", None, "allow_negative_stock"))
+		previous_sles = get_previous_sles([(d.item_code, d.s_warehouse or d.t_warehouse) for d in self.get('items')],
+			self.posting_date, self.posting_time)
 
 		for d in self.get('items'):
-			previous_sle = get_previous_sle({
-				"item_code": d.item_code,
-				"warehouse": d.s_warehouse or d.t_warehouse,
-				"posting_date": self.posting_date,
-				"posting_time": self.posting_time
-			})
+			previous_sle = previous_sles.get((d.item_code, d.s_warehouse or d.t_warehouse), {})
 
 			# get actual stock at source warehouse
 			d.actual_qty = previous_sle.get("qty_after_transaction") or 0
@@ -415,15 +413,20 @@ class StockEntry(StockController):
 		raw_material_cost = 0.0
 		scrap_material_cost = 0.0
 		fg_basic_rate = 0.0
+		scrap_warehouse = getattr(self, "pro_doc", frappe._dict()).scrap_warehouse
+
+		incoming_rates = self.get_incoming_rates([d for d in self.get('items')
+			if (not d.bom_no and ((not flt(d.basic_rate) and not d.allow_zero_valuation_rate) or d.s_warehouse or force))
+			or (d.bom_no and not flt(d.basic_rate) and not d.allow_zero_valuation_rate
+				and scrap_warehouse == d.t_warehouse)], raise_error_if_no_rate)
 
 		for d in self.get('items'):
 			if d.t_warehouse: fg_basic_rate = flt(d.basic_rate)
-			args = self.get_args_for_incoming_rate(d)
 
 			# get basic rate
 			if not d.bom_no:
 				if (not flt(d.basic_rate) and not d.allow_zero_valuation_rate) or d.s_warehouse or force:
-					basic_rate = flt(get_incoming_rate(args, raise_error_if_no_rate), self.precision("basic_rate", d))
+					basic_rate = flt(incoming_rates.get(d.idx), self.precision("basic_rate", d))
 					if basic_rate > 0:
 						d.basic_rate = basic_rate
 
@@ -434,21 +437,25 @@ class StockEntry(StockController):
 			# get scrap items basic rate
 			if d.bom_no:
 				if not flt(d.basic_rate) and not d.allow_zero_valuation_rate and \
-					getattr(self, "pro_doc", frappe._dict()).scrap_warehouse == d.t_warehouse:
-					basic_rate = flt(get_incoming_rate(args, raise_error_if_no_rate),
-						self.precision("basic_rate", d))
+					scrap_warehouse == d.t_warehouse:
+					basic_rate = flt(incoming_rates.get(d.idx), self.precision("basic_rate", d))
 					if basic_rate > 0:
 						d.basic_rate = basic_rate
 					d.basic_amount = flt(flt(d.transfer_qty) * flt(d.basic_rate), d.precision("basic_amount"))
 
-				if getattr(self, "pro_doc", frappe._dict()).scrap_warehouse == d.t_warehouse:
-
+				if scrap_warehouse == d.t_warehouse:
 					scrap_material_cost += flt(d.basic_amount)
 
 		number_of_fg_items = len([t.t_warehouse for t in self.get("items") if t.t_warehouse])
 		if (fg_basic_rate == 0.0 and number_of_fg_items == 1) or update_finished_item_rate:
 			self.set_basic_rate_for_finished_goods(raw_material_cost, scrap_material_cost)
 
+	def get_incoming_rates(self, items, raise_error_if_no_rate=True):
+		"""Incoming rates of the given rows, fetched together, by row idx"""
+		incoming_rates = get_incoming_rates([self.get_args_for_incoming_rate(d) for d in items],
+			raise_error_if_no_rate)
+		return dict(zip([d.idx for d in items], incoming_rates))
+
 	def get_args_for_incoming_rate(self, item):
 		return frappe._dict({
 			"item_code": item.item_code,
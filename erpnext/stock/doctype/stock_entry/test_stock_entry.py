@@ -8,7 +8,8 @@ from frappe.utils import flt, nowdate, nowtime
 from erpnext.stock.doctype.serial_no.serial_no import *
 from erpnext import set_perpetual_inventory
 from erpnext.stock.doctype.stock_ledger_entry.stock_ledger_entry import StockFreezeError
-from erpnext.stock.stock_ledger import get_previous_sle
+from erpnext.stock.stock_ledger import get_previous_sle, get_previous_sles
+from erpnext.stock.utils import get_incoming_rate, get_incoming_rates
 from frappe.permissions import add_user_permission, remove_user_permission
 from erpnext.stock.doctype.stock_reconciliation.test_stock_reconciliation import create_stock_reconciliation
 from erpnext.stock.doctype.item.test_item import set_item_variant_settings, make_item_variant, create_item
@@ -73,6 +74,29 @@ class TestStockEntry(unittest.TestCase):
 
 		frappe.db.set_default("allow_negative_stock", 0)
 
+	def test_bulk_previous_sle_and_incoming_rate(self):
+		warehouse = "_Test Warehouse - _TC"
+		make_stock_entry(item_code="_Test Item", target=warehouse, qty=5, basic_rate=100)
+		make_stock_entry(item_code="_Test Item 2", target=warehouse, qty=5, basic_rate=200)
+
+		args_list = [frappe._dict({
+			"item_code": item_code,
+			"warehouse": warehouse,
+			"posting_date": nowdate(),
+			"posting_time": nowtime(),
+			"qty": -2,
+			"company": "_Test Company"
+		}) for item_code in ("_Test Item", "_Test Item 2")]
+
+		previous_sles = get_previous_sles([(d.item_code, d.warehouse) for d in args_list],
+			nowdate(), nowtime())
+		incoming_rates = get_incoming_rates(args_list)
+
+		for args, incoming_rate in zip(args_list, incoming_rates):
+			previous_sle = get_previous_sle(frappe._dict(args))
+			self.assertEqual(previous_sles[(args.item_code, warehouse)].name, previous_sle.name)
+			self.assertEqual(incoming_rate, get_incoming_rate(frappe._dict(args)))
+
 	def test_auto_material_request(self):
 		make_item_variant()
 		self._test_auto_material_request("_Test Item")
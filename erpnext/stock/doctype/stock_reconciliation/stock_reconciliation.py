@@ -161,15 +161,13 @@ class StockReconciliation(StockController):
 	def update_stock_ledger(self):
 		"""	find difference between current and expected entries
 			and create stock ledger entries based on the difference"""
-		from erpnext.stock.stock_ledger import get_previous_sle
+		from erpnext.stock.stock_ledger import get_previous_sles
+
+		previous_sles = get_previous_sles([(row.item_code, row.warehouse) for row in self.items],
+			self.posting_date, self.posting_time)
 
 		for row in self.items:
-			previous_sle = get_previous_sle({
-				"item_code": row.item_code,
-				"warehouse": row.warehouse,
-				"posting_date": self.posting_date,
-				"posting_time": self.posting_time
-			})
+			previous_sle = previous_sles.get((row.item_code, row.warehouse), {})
 			if previous_sle:
 				if row.qty in ("", None):
 					row.qty = previous_sle.get("qty_after_transaction", 0)
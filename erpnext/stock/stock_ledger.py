@@ -412,6 +412,32 @@ def get_previous_sle(args, for_update=False):
 	sle = get_stock_ledger_entries(args, "<=", "desc", "limit 1", for_update=for_update)
 	return sle and sle[0] or {}
 
+def get_previous_sles(items, posting_date, posting_time, batch_size=500):
+	"""
+		get the last sle on or before the posting time of each (item_code, warehouse) pair,
+		like get_previous_sle, in one query per batch of pairs. Returns a dict keyed by the pairs,
+		pairs without stock ledger entries are left out
+	"""
+	items = list(set(items))
+	previous_sles = {}
+
+	for i in range(0, len(items), batch_size):
+		values = []
+		for item_code, warehouse in items[i:i + batch_size]:
+			values.extend([item_code, warehouse, posting_date or "1900-01-01", posting_time or "00:00"])
+
+		# each pair is looked up by its own index seek, union all just saves the round trips
+		for sle in frappe.db.sql(" union all ".join(["""(select *, timestamp(posting_date, posting_time) as "timestamp"
+			from `tabStock Ledger Entry`
+			where item_code = %s and warehouse = %s
+				and ifnull(is_cancelled, 'No')='No'
+				and timestamp(posting_date, posting_time) <= timestamp(%s, %s)
+			order by timestamp(posting_date, posting_time) desc, creation desc
+			limit 1)"""] * (len(values) // 4)), tuple(values), as_dict=1):
+			previous_sles[(sle.item_code, sle.warehouse)] = sle
+
+	return previous_sles
+
 def get_stock_ledger_entries(previous_sle, operator=None, order="desc", limit=None, for_update=False, debug=False):
 	"""get stock ledger entries filtered by specific posting datetime conditions"""
 	conditions = " and timestamp(posting_date, posting_time) {0} timestamp(%(posting_date)s, %(posting_time)s)".format(operator)
@@ -151,16 +151,41 @@ def update_bin(args, allow_negative_stock=False, via_landed_cost_voucher=False):
 @frappe.whitelist()
 def get_incoming_rate(args, raise_error_if_no_rate=True):
 	"""Get Incoming Rate based on valuation method"""
-	from erpnext.stock.stock_ledger import get_previous_sle, get_valuation_rate
+	from erpnext.stock.stock_ledger import get_previous_sle
 	if isinstance(args, string_types):
 		args = json.loads(args)
 
+	if (args.get("serial_no") or "").strip():
+		return get_incoming_rate_from_sle(args)
+
+	return get_incoming_rate_from_sle(args, get_previous_sle(args),
+		get_valuation_method(args.get("item_code")))
+
+def get_incoming_rates(args_list, raise_error_if_no_rate=True):
+	"""Get Incoming Rates of many rows with the same posting date and time, like get_incoming_rate,
+	with the previous stock ledger entries and valuation methods of all the rows fetched at once"""
+	from erpnext.stock.stock_ledger import get_previous_sles
+	if not args_list:
+		return []
+
+	rows = [args for args in args_list if not (args.get("serial_no") or "").strip()]
+	previous_sles = get_previous_sles([(args.get("item_code"), args.get("warehouse")) for args in rows],
+		args_list[0].get("posting_date"), args_list[0].get("posting_time"))
+	valuation_methods = get_valuation_methods([args.get("item_code") for args in rows])
+
+	return [get_incoming_rate_from_sle(args,
+		previous_sles.get((args.get("item_code"), args.get("warehouse")), {}),
+		valuation_methods.get(args.get("item_code"))) for args in args_list]
+
+def get_incoming_rate_from_sle(args, previous_sle=None, valuation_method=None):
+	"""Incoming Rate from the stock queue or valuation rate of the previous stock ledger entry,
+	or the average purchase rate of the serial nos"""
+	from erpnext.stock.stock_ledger import get_valuation_rate
+
 	in_rate = 0
 	if (args.get("serial_no") or "").strip():
 		in_rate = get_avg_purchase_rate(args.get("serial_no"))
 	else:
-		valuation_method = get_valuation_method(args.get("item_code"))
-		previous_sle = get_previous_sle(args)
 		if valuation_method == 'FIFO':
 			if previous_sle:
 				previous_stock_queue = json.loads(previous_sle.get('stock_queue', '[]') or '[]')
@@ -192,6 +217,15 @@ def get_valuation_method(item_code):
 		val_method = frappe.db.get_value("Stock Settings", None, "valuation_method") or "FIFO"
 	return val_method
 
+def get_valuation_methods(item_codes):
+	"""get valuation methods of many items, by item code"""
+	if not item_codes:
+		return {}
+
+	default_method = frappe.db.get_value("Stock Settings", None, "valuation_method") or "FIFO"
+	return dict((d.name, d.valuation_method or default_method) for d in frappe.get_all("Item",
+		filters={"name": ["in", list(set(item_codes))]}, fields=["name", "valuation_method"]))
+
 def get_fifo_rate(previous_stock_queue, qty):
 	"""get FIFO (average) Rate from Queue"""
 	if qty >= 0:
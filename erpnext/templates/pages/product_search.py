@@ -5,7 +5,7 @@ from __future__ import unicode_literals
 import frappe
 from frappe.utils import cstr, nowdate, cint
 from erpnext.setup.doctype.item_group.item_group import get_item_for_list_in_html
-from erpnext.shopping_cart.product_info import set_product_info_for_website
+from erpnext.shopping_cart.product_info import set_product_info_for_items
 
 no_cache = 1
 
@@ -43,8 +43,7 @@ def get_product_list(search=None, start=0, limit=12):
 		"today": nowdate()
 	}, as_dict=1)
 
-	for item in data:
-		set_product_info_for_website(item)
+	set_product_info_for_items(data)
 
 	return [get_item_for_list_in_html(r) for r in data]
 
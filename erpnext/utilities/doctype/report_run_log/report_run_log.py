@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2019, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import os
+import re
+import time
+import traceback
+from six import string_types
+from frappe.model.document import Document
+
+# queries recorded per log, the slowest ones are kept
+MAX_LOGGED_QUERIES = 200
+
+class ReportRunLog(Document):
+	pass
+
+@frappe.whitelist()
+def run(*args, **kwargs):
+	'''Runs a query report like `frappe.desk.query_report.run`, profiled
+	if enabled by `profile_reports` in site config (1 for all reports, or a list of names)'''
+	from frappe.desk import query_report
+
+	report_name = kwargs.get("report_name") or (args[0] if args else None)
+	if not is_profiling_enabled(report_name):
+		return frappe.call(query_report.run, *args, **kwargs)
+
+	with ReportProfiler(report_name, kwargs.get("filters")):
+		return frappe.call(query_report.run, *args, **kwargs)
+
+def is_profiling_enabled(report_name):
+	profile_reports = frappe.conf.get("profile_reports")
+	if isinstance(profile_reports, (list, tuple)):
+		return report_name in profile_reports
+
+	return bool(profile_reports)
+
+class ReportProfiler(object):
+	'''Records the queries run in a block, with their duration, row count and call site,
+	and saves them with the time spent in Python in a Report Run Log'''
+	def __init__(self, report_name, filters=None):
+		self.report_name = report_name
+		self.filters = filters
+		self.queries = {}
+		self.log = None
+
+	def __enter__(self):
+		# methods of `frappe.db` run queries with `self.sql`, so they are profiled too
+		self.db = frappe.local.db
+		self.db_sql = self.db.sql
+		self.db.sql = self.sql
+		self.start = time.time()
+		return self
+
+	def __exit__(self, exc_type, exc_value, tb):
+		total_time = time.time() - self.start
+		del self.db.sql
+
+		if not exc_type:
+			self.log = self.make_log(total_time)
+
+	def sql(self, query, *args, **kwargs):
+		start = time.time()
+		result = self.db_sql(query, *args, **kwargs)
+		duration = time.time() - start
+
+		key = (re.sub(r"\s+", " ", frappe.as_unicode(query)).strip(), get_call_site())
+		entry = self.queries.setdefault(key, frappe._dict(calls=0, duration=0, row_count=0))
+		entry.calls += 1
+		entry.duration += duration
+		entry.row_count += len(result) if isinstance(result, (list, tuple)) else 0
+
+		return result
+
+	def make_log(self, total_time):
+		sql_time = sum(d.duration for d in self.queries.values())
+
+		log = frappe.get_doc({
+			"doctype": "Report Run Log",
+			"report_name": self.report_name,
+			"user": frappe.session.user,
+			"filters": self.filters if isinstance(self.filters, string_types)
+				else frappe.as_json(self.filters),
+			"total_time": total_time,
+			"sql_time": sql_time,
+			"python_time": total_time - sql_time,
+			"query_count": sum(d.calls for d in self.queries.values())
+		})
+
+		queries = sorted(self.queries.items(), key=lambda d: d[1].duration, reverse=True)
+		for (query, call_site), d in queries[:MAX_LOGGED_QUERIES]:
+			log.append("queries", {
+				"query": query,
+				"call_site": call_site,
+				"calls": d.calls,
+				"duration": d.duration,
+				"row_count": d.row_count
+			})
+
+		log.insert(ignore_permissions=True)
+		return log
+
+def get_call_site():
+	'''Returns the innermost app frame outside frappe's database layer, as `path:line in function`'''
+	for filename, lineno, function, text in reversed(traceback.extract_stack()):
+		if filename == __file__.replace(".pyc", ".py") or os.sep + "frappe" + os.sep in filename:
+			continue
+
+		return "{0}:{1} in {2}".format(get_app_path(filename), lineno, function)
+
+	return ""
+
+def get_app_path(filename):
+	parts = filename.split(os.sep)
+	if "apps" in parts:
+		parts = parts[parts.index("apps") + 1:]
+
+	return os.sep.join(parts)
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2019, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+from __future__ import unicode_literals
+
+import frappe
+import unittest
+from erpnext.utilities.doctype.report_run_log.report_run_log import ReportProfiler
+
+class TestReportRunLog(unittest.TestCase):
+	def test_profile_queries(self):
+		with ReportProfiler("General Ledger", {"company": "_Test Company"}) as profiler:
+			for company in ("_Test Company", "_Test Company 1"):
+				frappe.db.get_value("Company", company, "default_currency")
+			frappe.db.sql("select name from tabCompany")
+
+		log = profiler.log
+		self.assertEqual(log.report_name, "General Ledger")
+		self.assertEqual(log.query_count, 3)
+		self.assertTrue(log.total_time >= log.sql_time)
+
+		# the same query from the same line is logged once, with its number of calls
+		get_value = [d for d in log.queries if d.calls == 2]
+		self.assertEqual(len(get_value), 1)
+		self.assertTrue("test_report_run_log.py" in get_value[0].call_site)
+
+		# queries are not profiled outside the block
+		self.assertFalse("sql" in frappe.local.db.__dict__)
@@ -33,6 +33,75 @@ def get_qty_in_stock(item_code, item_warehouse_field, warehouse=None):
 	return frappe._dict({"in_stock": in_stock, "stock_qty": stock_qty, "is_stock_item": is_stock_item})
 
 
+def get_qty_in_stock_for_items(item_codes, item_warehouse_field):
+	'''Returns stock status of many items, like `get_qty_in_stock`, with warehouses, bins
+	and expired batches fetched for all of them together'''
+	out = {}
+	if not item_codes:
+		return out
+
+	items = frappe.get_all("Item", fields=["name", "variant_of", "is_stock_item", item_warehouse_field],
+		filters={"name": ["in", item_codes]})
+
+	template_item_codes = [d.variant_of for d in items if d.variant_of and not d.get(item_warehouse_field)]
+	template_warehouses = {}
+	if template_item_codes:
+		template_warehouses = dict((d.name, d.get(item_warehouse_field)) for d in frappe.get_all("Item",
+			fields=["name", item_warehouse_field], filters={"name": ["in", template_item_codes]}))
+
+	warehouses = {}
+	for d in items:
+		warehouse = d.get(item_warehouse_field)
+		if not warehouse and d.variant_of and d.variant_of != d.name:
+			warehouse = template_warehouses.get(d.variant_of)
+
+		if warehouse:
+			warehouses[d.name] = warehouse
+
+	stock_qty_map = {}
+	if warehouses:
+		for item_code, warehouse, qty in frappe.db.sql("""
+			select S.item_code, S.warehouse, GREATEST(S.actual_qty - S.reserved_qty - S.reserved_qty_for_production - S.reserved_qty_for_sub_contract, 0) / IFNULL(C.conversion_factor, 1)
+			from tabBin S
+			inner join `tabItem` I on S.item_code = I.Item_code
+			left join `tabUOM Conversion Detail` C on I.sales_uom = C.uom and C.parent = I.Item_code
+			where S.item_code in ({0})""".format(", ".join(["%s"] * len(warehouses))), tuple(warehouses)):
+			if warehouses.get(item_code) == warehouse:
+				stock_qty_map[item_code] = [[qty]]
+
+	expired_batch_qty = get_expired_batch_qty(list(stock_qty_map), warehouses)
+
+	for d in items:
+		in_stock, stock_qty = 0, ''
+		if d.name in warehouses:
+			stock_qty = ()
+
+		if d.name in stock_qty_map:
+			stock_qty = stock_qty_map[d.name]
+			stock_qty[0][0] = max(0, stock_qty[0][0] - expired_batch_qty.get(d.name, 0))
+			in_stock = stock_qty[0][0] > 0 and 1 or 0
+
+		out[d.name] = frappe._dict({"in_stock": in_stock, "stock_qty": stock_qty, "is_stock_item": d.is_stock_item})
+
+	return out
+
+def get_expired_batch_qty(item_codes, warehouses):
+	'''Returns qty of expired batches of the items in their warehouse'''
+	out = {}
+	if not item_codes:
+		return out
+
+	for item_code, warehouse, qty in frappe.db.sql("""select sle.item_code, sle.warehouse, sum(sle.actual_qty)
+		from `tabStock Ledger Entry` sle, `tabBatch` b
+		where sle.batch_no = b.name and b.item in ({0})
+			and b.expiry_date is not null and b.expiry_date <= %s
+		group by sle.item_code, sle.warehouse, sle.batch_no""".format(", ".join(["%s"] * len(item_codes))),
+		tuple(item_codes + [nowdate()])):
+		if warehouses.get(item_code) == warehouse:
+			out[item_code] = out.get(item_code, 0) + flt(qty)
+
+	return out
+
 def adjust_qty_for_expired_items(item_code, stock_qty, warehouse):
 	batches = frappe.get_all('Batch', filters=[{'item': item_code}], fields=['expiry_date', 'name'])
 	expired_batches = get_expired_batches(batches)
@@ -79,48 +148,101 @@ def get_price(item_code, price_list, customer_group, company, qty=1):
 				filters={"price_list": price_list, "item_code": template_item_code})
 
 		if price:
-			pricing_rule = get_pricing_rule_for_item(frappe._dict({
-				"item_code": item_code,
-				"qty": qty,
-				"transaction_type": "selling",
-				"price_list": price_list,
-				"customer_group": customer_group,
-				"company": company,
-				"conversion_rate": 1,
-				"for_shopping_cart": True,
-				"currency": frappe.db.get_value("Price List", price_list, "currency")
-			}))
-
-			if pricing_rule:
-				if pricing_rule.pricing_rule_for == "Discount Percentage":
-					price[0].price_list_rate = flt(price[0].price_list_rate * (1.0 - (flt(pricing_rule.discount_percentage) / 100.0)))
-
-				if pricing_rule.pricing_rule_for == "Rate":
-					price[0].price_list_rate = pricing_rule.price_list_rate
-
-			price_obj = price[0]
-			if price_obj:
-				price_obj["formatted_price"] = fmt_money(price_obj["price_list_rate"], currency=price_obj["currency"])
-
-				price_obj["currency_symbol"] = not cint(frappe.db.get_default("hide_currency_symbol")) \
-					and (frappe.db.get_value("Currency", price_obj.currency, "symbol", cache=True) or price_obj.currency) \
-					or ""
-
-				uom_conversion_factor = frappe.db.sql("""select	C.conversion_factor
-					from `tabUOM Conversion Detail` C
-					inner join `tabItem` I on C.parent = I.name and C.uom = I.sales_uom
-					where I.name = %s""", item_code)
-
-				uom_conversion_factor = uom_conversion_factor[0][0] if uom_conversion_factor else 1
-				price_obj["formatted_price_sales_uom"] = fmt_money(price_obj["price_list_rate"] * uom_conversion_factor, currency=price_obj["currency"])
-
-				if not price_obj["price_list_rate"]:
-					price_obj["price_list_rate"] = 0
-
-				if not price_obj["currency"]:
-					price_obj["currency"] = ""
-
-				if not price_obj["formatted_price"]:
-					price_obj["formatted_price"] = ""
-
-			return price_obj
+			uom_conversion_factor = frappe.db.sql("""select	C.conversion_factor
+				from `tabUOM Conversion Detail` C
+				inner join `tabItem` I on C.parent = I.name and C.uom = I.sales_uom
+				where I.name = %s""", item_code)
+
+			uom_conversion_factor = uom_conversion_factor[0][0] if uom_conversion_factor else 1
+
+			return set_price_details(item_code, price[0], price_list, customer_group, company, qty,
+				uom_conversion_factor)
+
+def get_prices(item_codes, price_list, customer_group, company, qty=1):
+	'''Returns prices of many items, like `get_price`, with Item Prices and UOM conversion factors
+	fetched for all of them together. Prices are cached for a short while per price list'''
+	out = {}
+	if not (price_list and item_codes):
+		return out
+
+	cache = frappe.cache()
+	cache_key = "website_price:{0}:{1}:{2}:{3}:{{0}}".format(price_list, customer_group, company, qty)
+
+	for item_code in item_codes:
+		price = cache.get_value(cache_key.format(item_code))
+		if price is not None:
+			out[item_code] = price or None
+
+	item_codes = [item_code for item_code in item_codes if item_code not in out]
+	if not item_codes:
+		return out
+
+	items = frappe.get_all("Item", fields=["name", "variant_of"], filters={"name": ["in", item_codes]})
+	template_item_codes = dict((d.name, d.variant_of) for d in items)
+
+	item_prices = {}
+	for d in frappe.get_all("Item Price", fields=["item_code", "price_list_rate", "currency"],
+		filters={"price_list": price_list,
+			"item_code": ["in", list(set(item_codes + [d.variant_of for d in items if d.variant_of]))]}):
+		item_prices.setdefault(d.item_code, frappe._dict({
+			"price_list_rate": d.price_list_rate,
+			"currency": d.currency
+		}))
+
+	uom_conversion_factors = dict(frappe.db.sql("""select I.name, C.conversion_factor
+		from `tabUOM Conversion Detail` C
+		inner join `tabItem` I on C.parent = I.name and C.uom = I.sales_uom
+		where I.name in ({0})""".format(", ".join(["%s"] * len(item_codes))), tuple(item_codes)))
+
+	for item_code in item_codes:
+		price = item_prices.get(item_code) or item_prices.get(template_item_codes.get(item_code))
+		if price:
+			price = set_price_details(item_code, frappe._dict(price), price_list, customer_group, company,
+				qty, uom_conversion_factors.get(item_code) or 1)
+
+		out[item_code] = price
+		# items without price are cached too, as an empty dict
+		cache.set_value(cache_key.format(item_code), price or {}, expires_in_sec=120)
+
+	return out
+
+def set_price_details(item_code, price_obj, price_list, customer_group, company, qty, uom_conversion_factor):
+	'''Apply the pricing rule to the Item Price and set the formatted prices'''
+	pricing_rule = get_pricing_rule_for_item(frappe._dict({
+		"item_code": item_code,
+		"qty": qty,
+		"transaction_type": "selling",
+		"price_list": price_list,
+		"customer_group": customer_group,
+		"company": company,
+		"conversion_rate": 1,
+		"for_shopping_cart": True,
+		"currency": frappe.db.get_value("Price List", price_list, "currency", cache=True)
+	}))
+
+	if pricing_rule:
+		if pricing_rule.pricing_rule_for == "Discount Percentage":
+			price_obj.price_list_rate = flt(price_obj.price_list_rate * (1.0 - (flt(pricing_rule.discount_percentage) / 100.0)))
+
+		if pricing_rule.pricing_rule_for == "Rate":
+			price_obj.price_list_rate = pricing_rule.price_list_rate
+
+	if price_obj:
+		price_obj["formatted_price"] = fmt_money(price_obj["price_list_rate"], currency=price_obj["currency"])
+
+		price_obj["currency_symbol"] = not cint(frappe.db.get_default("hide_currency_symbol")) \
+			and (frappe.db.get_value("Currency", price_obj.currency, "symbol", cache=True) or price_obj.currency) \
+			or ""
+
+		price_obj["formatted_price_sales_uom"] = fmt_money(price_obj["price_list_rate"] * uom_conversion_factor, currency=price_obj["currency"])
+
+		if not price_obj["price_list_rate"]:
+			price_obj["price_list_rate"] = 0
+
+		if not price_obj["currency"]:
+			price_obj["currency"] = ""
+
+		if not price_obj["formatted_price"]:
+			price_obj["formatted_price"] = ""
+
+	return price_obj